@@ -1,33 +1,16 @@
+import hashlib
+import time
+from collections import OrderedDict
+
 import jwt
-from jwt import PyJWKClient
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
+from app import jwks
 from app.config import settings
 
 bearer_scheme = HTTPBearer()
 
-_jwks_client: PyJWKClient | None = None
-
-
-def _get_jwks_client() -> PyJWKClient:
-    """Lazy init so health check can run without JWKS configured."""
-    global _jwks_client
-    if _jwks_client is None:
-        url = settings.jwks_url
-        if not url:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail="JWKS URL not configured (set SUPABASE_URL or SUPABASE_JWKS_URL)",
-            )
-        _jwks_client = PyJWKClient(
-            url,
-            cache_keys=True,
-            lifespan=3600,
-            headers={"apikey": settings.service_role_key} if settings.service_role_key else None,
-        )
-    return _jwks_client
-
 
 class CurrentUser:
     """Represents a verified Supabase user extracted from the JWT."""
@@ -38,21 +21,100 @@ class CurrentUser:
         self.role = role
 
 
+# Verified tokens: sha256(token) -> (expires_at epoch, CurrentUser). Repeat requests
+# with the same access token skip the signature check. Entries never outlive the
+# token's exp and are dropped when the JWKS key ids change.
+_token_cache: "OrderedDict[str, tuple[float, CurrentUser]]" = OrderedDict()
+_token_cache_version = 0  # jwks.key_set_version() the entries were verified against
+_token_cache_stats = {"hits": 0, "misses": 0}
+
+
+def _token_cache_get(key: str) -> CurrentUser | None:
+    entry = _token_cache.get(key)
+    if entry is None:
+        return None
+    if entry[0] <= time.time():
+        del _token_cache[key]
+        return None
+    _token_cache.move_to_end(key)
+    return entry[1]
+
+
+def _token_cache_put(key: str, user: CurrentUser, exp) -> None:
+    expires_at = time.time() + settings.auth_token_cache_ttl_seconds
+    if isinstance(exp, (int, float)):
+        expires_at = min(expires_at, float(exp))
+    _token_cache[key] = (expires_at, user)
+    _token_cache.move_to_end(key)
+    while len(_token_cache) > settings.auth_token_cache_max_entries:
+        _token_cache.popitem(last=False)
+
+
+def _sync_token_cache() -> None:
+    """Clear cached tokens when the JWKS key set has rotated."""
+    global _token_cache_version
+    version = jwks.key_set_version()
+    if version != _token_cache_version:
+        _token_cache.clear()
+        _token_cache_version = version
+
+
+def peek_verified_user(token: str) -> CurrentUser | None:
+    """CurrentUser for a token this worker has already verified, else None (no counters)."""
+    entry = _token_cache.get(hashlib.sha256(token.encode()).hexdigest())
+    if entry is None or entry[0] <= time.time() or jwks.key_set_version() != _token_cache_version:
+        return None
+    return entry[1]
+
+
+def clear_token_cache() -> None:
+    _token_cache.clear()
+
+
+def token_cache_stats() -> dict:
+    return {**_token_cache_stats, "entries": len(_token_cache)}
+
+
+async def _charge_rate_limit(request: Request, user: CurrentUser) -> None:
+    """Per-user rate limit for tokens RateLimitMiddleware could not attribute before routing."""
+    limiter = getattr(request.state, "rate_limiter", None)
+    if limiter is not None:
+        await limiter.charge_user(request.scope["state"], user.id)
+
+
 async def get_current_user(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
 ) -> CurrentUser:
     """
     FastAPI dependency that:
     1. Extracts the Bearer token from the Authorization header
-    2. Resolves the signing key via JWKS (cached, handles rotation)
-    3. Verifies the JWT signature + claims locally (no network call per request)
-    4. Returns a CurrentUser with user_id, email, role
+    2. Returns the user already verified for this request (batch operations), or the
+       cached CurrentUser if this token was verified recently
+    3. Resolves the signing key via the async JWKS key manager (cached, handles rotation)
+    4. Verifies the JWT signature + claims locally (no network call per request)
+    5. Charges the user's rate-limit bucket if RateLimitMiddleware could not (429)
+    6. Returns a CurrentUser with user_id, email, role (also set as request.state.user)
     """
     token = credentials.credentials
+    verified = getattr(request.state, "user", None)
+    if verified is not None and getattr(request.state, "bearer_token", None) == token:
+        return verified  # already verified for this request (batch operations)
+    cache_key = hashlib.sha256(token.encode()).hexdigest()
+    caching = settings.auth_token_cache_max_entries > 0
+    if caching:
+        _sync_token_cache()
+        cached = _token_cache_get(cache_key)
+        if cached is not None:
+            _token_cache_stats["hits"] += 1
+            request.state.user = cached
+            await _charge_rate_limit(request, cached)
+            return cached
+        _token_cache_stats["misses"] += 1
 
     try:
-        client = _get_jwks_client()
-        signing_key = client.get_signing_key_from_jwt(token)
+        kid = jwt.get_unverified_header(token).get("kid")
+        signing_key = await jwks.get_signing_key(kid)
         decode_options: dict = {"algorithms": ["ES256"], "audience": settings.jwt_audience}
         if settings.jwt_issuer:
             decode_options["issuer"] = settings.jwt_issuer
@@ -82,8 +144,14 @@ async def get_current_user(
             detail="Token missing subject",
         )
 
-    return CurrentUser(
+    user = CurrentUser(
         id=user_id,
         email=payload.get("email"),
         role=payload.get("role"),
     )
+    if caching:
+        _sync_token_cache()
+        _token_cache_put(cache_key, user, payload.get("exp"))
+    request.state.user = user
+    await _charge_rate_limit(request, user)
+    return user
@@ -0,0 +1,47 @@
+"""
+Conditional JSON responses (ETag / If-None-Match).
+
+The ETag is a hash of the exact response body, so it changes whenever anything in
+the body does (fields, updated_at, tags, row set) and differs between JSON and
+MessagePack. A request whose If-None-Match matches gets 304 Not Modified with no body.
+"""
+
+import hashlib
+from typing import NamedTuple
+
+import orjson
+from fastapi import Request, Response, status
+
+from app.encoding import MSGPACK, packb, representation
+
+CACHE_CONTROL = "private, no-cache"  # browsers may keep it, but must revalidate
+
+
+class Rendered(NamedTuple):
+    body: bytes
+    etag: str
+    media_type: str
+
+
+def render(value) -> Rendered:
+    """Serialize like the default response class (negotiated JSON or MessagePack) and compute the strong ETag."""
+    media_type = representation()
+    body = packb(value) if media_type == MSGPACK else orjson.dumps(value)
+    return Rendered(body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"', media_type)
+
+
+def _matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def respond(request: Request, rendered: Rendered) -> Response:
+    headers = {"ETag": rendered.etag, "Cache-Control": CACHE_CONTROL}
+    if _matches(request.headers.get("if-none-match"), rendered.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(rendered.body, media_type=rendered.media_type, headers=headers)
@@ -14,9 +14,63 @@ class Settings(BaseSettings):
     supabase_service_role_key: str = ""
     supabase_jwks_url: str = ""  # optional; if empty, derived from supabase_url
 
+    # PostgREST connection pool (one shared client per worker)
+    supabase_pool_max_connections: int = 20
+    supabase_pool_max_keepalive: int = 10
+    supabase_pool_keepalive_expiry_seconds: float = 30.0
+    supabase_timeout_seconds: float = 10.0
+    supabase_connect_timeout_seconds: float = 5.0
+
     # JWT verification (JWKS)
     jwt_audience: str = "authenticated"
     jwt_issuer: str = ""  # optional; if set, issuer claim is validated
+    jwks_refresh_seconds: float = 600.0  # background refresh interval
+    jwks_min_refetch_seconds: float = 30.0  # floor between unknown-kid refetches
+    jwks_timeout_seconds: float = 5.0
+
+    # Verified-token cache (per worker); entries never outlive the token's exp
+    auth_token_cache_max_entries: int = 10000  # 0 disables
+    auth_token_cache_ttl_seconds: float = 300.0
+
+    # In-process search index for q (per worker; keep off with more than one worker)
+    search_index_enabled: bool = False
+    search_index_max_mb: int = 64
+    search_index_max_candidates: int = 120  # ids go back to PostgREST in the query string
+
+    # Per-user list_items/list_tags response cache (per worker; short TTL with several workers)
+    read_cache_enabled: bool = False
+    read_cache_ttl_seconds: float = 30.0
+    read_cache_max_mb: int = 32
+
+    # Typeahead (GET /api/suggest) per-user cache
+    suggest_cache_ttl_seconds: float = 15.0
+    suggest_cache_max_entries: int = 5000
+
+    # Background imports (POST /api/imports)
+    import_workers: int = 2  # worker tasks per process
+    import_spool_dir: str = ""  # default: <tmp>/buddhira-imports
+    import_max_bytes: int = 200 * 1024 * 1024
+
+    # Rate limiting (token buckets: burst up to the limit, limit per window sustained)
+    rate_limit_window_seconds: float = 60.0
+    rate_limit_per_ip: int = 120
+    rate_limit_per_user: int = 120
+    rate_limit_max_keys: int = 100_000  # per worker; least recently seen keys evicted first
+    rate_limit_backend: str = "memory"  # memory (per worker) | shared (per host) | redis
+    rate_limit_shared_path: str = ""  # default: /dev/shm/buddhira-ratelimit
+    rate_limit_shared_slots: int = 65536
+    rate_limit_redis_url: str = ""
+
+    # Response compression (gzip, or brotli when installed) above this body size
+    compression_min_bytes: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 6  # below 6, brotli output is larger than gzip level 6 on item lists
+
+    # Prometheus /metrics (workers share counts through snapshot files in metrics_dir)
+    metrics_dir: str = ""  # default: <tmp>/buddhira-metrics
+    metrics_flush_seconds: float = 5.0
+    metrics_token: str = ""  # if set, /metrics requires Authorization: Bearer <token>
+    metrics_group: str = ""  # workers counted together; default: gunicorn master pid, else own pid
 
     # CORS — production must set to your frontend origin(s), e.g. Vercel domain(s)
     cors_origins: str = ""
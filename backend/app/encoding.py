@@ -0,0 +1,215 @@
+"""
+Response encoding: MessagePack negotiation and gzip/brotli compression.
+
+- Clients that prefer `application/msgpack` in Accept get MessagePack. The middleware
+  only negotiates: it records the representation for the request (a context variable),
+  and NegotiatedResponse (the app's default response class) and conditional.render
+  serialize the route's data straight to it, never through JSON. ETags hash the body
+  that is sent, so each representation has its own and conditional reads still
+  answer 304.
+- Bodies of at least COMPRESSION_MIN_BYTES are compressed with brotli (if the
+  `brotli` package is installed) or gzip, per Accept-Encoding. Streamed responses
+  (export) are compressed chunk by chunk. When a coding is negotiated, the ETag of
+  a compressible response is weak whether or not it was big enough to compress, and
+  so is the ETag of a 304, so it matches the 200 the client cached.
+  Responses that already set Content-Encoding (export?gzip=true) are left alone.
+"""
+
+import zlib
+from contextvars import ContextVar
+
+import msgpack
+from fastapi.responses import ORJSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+COMPRESSIBLE_TYPES = (JSON, "application/x-ndjson", MSGPACK, "text/")
+
+_representation: ContextVar[str] = ContextVar("representation", default=JSON)
+
+
+def _header(headers, name: bytes) -> str | None:
+    for key, value in headers:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _qualities(value: str | None) -> dict[str, float]:
+    """Parse an Accept / Accept-Encoding header into {token: q}."""
+    result: dict[str, float] = {}
+    for part in (value or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, raw = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(raw)
+                except ValueError:
+                    q = 0.0
+        result[token] = max(q, result.get(token, 0.0))
+    return result
+
+
+def _wants_msgpack(accept: str | None) -> bool:
+    if not accept or "msgpack" not in accept:
+        return False
+    q = _qualities(accept)
+    wanted = max(q.get(MSGPACK, 0.0), q.get("application/x-msgpack", 0.0))
+    return wanted > 0 and wanted >= q.get("application/json", 0.0)
+
+
+def negotiate(accept: str | None) -> str:
+    """Choose JSON or MessagePack from an Accept header for responses rendered in this context."""
+    media_type = MSGPACK if _wants_msgpack(accept) else JSON
+    _representation.set(media_type)
+    return media_type
+
+
+def representation() -> str:
+    """Media type negotiated for the current request (JSON outside a request)."""
+    return _representation.get()
+
+
+def _msgpack_default(value):
+    # Types orjson writes natively: datetime/date/time (ISO 8601), UUID
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def packb(value) -> bytes:
+    return msgpack.packb(value, use_bin_type=True, default=_msgpack_default)
+
+
+class NegotiatedResponse(ORJSONResponse):
+    """orjson, or MessagePack when the request negotiated it (see negotiate)."""
+
+    def render(self, content) -> bytes:
+        if _representation.get() == MSGPACK:
+            self.media_type = MSGPACK
+            return packb(content)
+        return super().render(content)
+
+
+def _pick_coding(accept_encoding: str | None) -> str | None:
+    if not accept_encoding:
+        return None
+    q = _qualities(accept_encoding)
+    if brotli is not None and q.get("br", 0.0) > 0:
+        return "br"
+    if q.get("gzip", 0.0) > 0:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    def __init__(self, coding: str):
+        if coding == "br":
+            self._brotli = brotli.Compressor(quality=settings.compression_brotli_quality)
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(settings.compression_gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._brotli.process(data) if self._brotli else self._zlib.compress(data)
+
+    def finish(self) -> bytes:
+        return self._brotli.finish() if self._brotli else self._zlib.flush()
+
+
+def _with_vary(headers: list[tuple[bytes, bytes]], *names: str) -> list[tuple[bytes, bytes]]:
+    existing = _header(headers, b"vary")
+    values = [v.strip() for v in existing.split(",")] if existing else []
+    values += [n for n in names if n.lower() not in {v.lower() for v in values}]
+    headers = [(k, v) for k, v in headers if k.lower() != b"vary"]
+    headers.append((b"vary", ", ".join(values).encode("latin-1")))
+    return headers
+
+
+def _replace(headers: list[tuple[bytes, bytes]], name: bytes, value: str | None) -> list[tuple[bytes, bytes]]:
+    headers = [(k, v) for k, v in headers if k.lower() != name]
+    if value is not None:
+        headers.append((name, value.encode("latin-1")))
+    return headers
+
+
+class ResponseEncodingMiddleware:
+    """Negotiate JSON or MessagePack and compress responses (see module docstring)."""
+
+    def __init__(self, app: ASGIApp, minimum_size: int | None = None):
+        self.app = app
+        self.minimum_size = settings.compression_min_bytes if minimum_size is None else minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        negotiate(_header(scope["headers"], b"accept"))
+        coding = _pick_coding(_header(scope["headers"], b"accept-encoding"))
+
+        start: Message | None = None
+        compressor: _Compressor | None = None
+
+        async def send_encoded(message: Message) -> None:
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                start = message  # held until the first body chunk decides the encoding
+                return
+            if message["type"] == "http.response.body" and compressor is not None:
+                body = compressor.compress(message.get("body", b""))  # streaming, already started
+                if not message.get("more_body", False):
+                    body += compressor.finish()
+                if body or not message.get("more_body", False):
+                    await send({**message, "body": body})
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            headers = list(start.get("headers", ()))
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            content_type = (_header(headers, b"content-type") or "").lower()
+            if content_type.startswith((JSON, MSGPACK)) or start["status"] == 304:
+                headers = _with_vary(headers, "Accept")
+
+            compressible = content_type.startswith(COMPRESSIBLE_TYPES)
+            if compressible or start["status"] == 304:
+                headers = _with_vary(headers, "Accept-Encoding")
+            if (
+                coding is not None
+                and compressible
+                and _header(headers, b"content-encoding") is None
+                and (more_body or (body and len(body) >= self.minimum_size))
+            ):
+                compressor = _Compressor(coding)
+                body = compressor.compress(body)
+                if not more_body:
+                    body += compressor.finish()
+                    compressor = None
+                headers = _replace(headers, b"content-encoding", coding)
+                headers = _replace(headers, b"content-length", None if more_body else str(len(body)))
+            elif body and not more_body:
+                headers = _replace(headers, b"content-length", str(len(body)))
+            if coding is not None and (compressible or start["status"] == 304):
+                etag = _header(headers, b"etag")  # same validator whether or not this body was compressed
+                if etag and not etag.startswith("W/"):
+                    headers = _replace(headers, b"etag", "W/" + etag)
+
+            await send({**start, "headers": headers})
+            start = None
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_encoded)
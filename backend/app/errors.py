@@ -7,6 +7,8 @@ from fastapi import Request, status
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 
+from app.encoding import NegotiatedResponse
+
 # HTTPException is used in handler registration in main.py
 
 
@@ -31,22 +33,27 @@ def detail_message(exc: Exception) -> str:
     return str(exc) or "An error occurred"
 
 
+def error_body(detail: str, code: str | None = None, request_id: str | None = None) -> dict:
+    """The single error format: { detail, code?, request_id? }."""
+    body: dict = {"detail": detail}
+    if code:
+        body["code"] = code
+    if request_id:
+        body["request_id"] = request_id
+    return body
+
+
 def error_response(
     status_code: int,
     detail: str,
     code: str | None = None,
     request_id: str | None = None,
 ) -> JSONResponse:
-    """Return JSON in a single format: { detail, code?, request_id? }."""
-    body: dict = {"detail": detail}
-    if code:
-        body["code"] = code
-    if request_id:
-        body["request_id"] = request_id
-    return JSONResponse(status_code=status_code, content=body)
+    """Return JSON (or negotiated MessagePack) in a single format: { detail, code?, request_id? }."""
+    return NegotiatedResponse(status_code=status_code, content=error_body(detail, code, request_id))
 
 
-def _code_for_status(status_code: int, exc: Exception) -> str | None:
+def code_for_status(status_code: int, exc: Exception) -> str | None:
     """Default API error codes for consistent debugging."""
     explicit = getattr(exc, "code", None)
     if explicit:
@@ -69,7 +76,7 @@ async def http_exception_handler(request: Request, exc: Exception) -> JSONRespon
     # Starlette HTTPBearer returns 403 when Authorization is missing; treat as 401
     if status_code == status.HTTP_403_FORBIDDEN and "not authenticated" in detail.lower():
         status_code = status.HTTP_401_UNAUTHORIZED
-    code = _code_for_status(status_code, exc)
+    code = code_for_status(status_code, exc)
     request_id = getattr(getattr(request, "state", None), "request_id", None)
     return error_response(status_code, detail, code, request_id=request_id)
 
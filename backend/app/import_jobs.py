@@ -0,0 +1,278 @@
+"""
+Background import jobs for large NDJSON uploads (POST /api/imports).
+
+The upload is spooled to disk, a job row is created and its id is queued for an
+in-process worker pool (IMPORT_WORKERS tasks per process, so concurrency is bounded).
+Workers import the file in chunks through items_service.import_batch and record
+progress after every committed chunk.
+
+Item ids are derived from (job id, line number), so re-running a chunk after a crash
+inserts nothing twice. A chunk that fails is retried with backoff; if it keeps
+failing the job goes back to "queued" (spool kept) and is requeued after
+IMPORT_REQUEUE_SECONDS, up to MAX_JOB_REQUEUES times. On startup, unfinished jobs
+whose spool file is on this host are resumed from committed_rows; an flock on the
+spool file keeps two gunicorn workers from running the same job. File IO runs in
+a thread so the event loop keeps serving requests.
+"""
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import uuid
+from collections.abc import AsyncIterator
+from datetime import datetime, timezone
+
+from pydantic import ValidationError
+
+from app.config import settings
+from app.repositories import import_jobs as jobs_repo
+from app.items_service import IMPORT_CHUNK_SIZE, ImportItem, import_batch
+
+logger = logging.getLogger("buddhira")
+
+MAX_JOB_ERRORS = 100  # per-row errors kept on the job row (error_count keeps counting)
+CHUNK_ATTEMPTS = 5  # per chunk, with backoff 1s, 2s, 4s, 8s
+MAX_JOB_REQUEUES = 5  # per process, after a chunk exhausted its attempts
+IMPORT_REQUEUE_SECONDS = 60.0
+READ_BATCH_BYTES = 1024 * 1024  # spool lines read per thread hop
+
+_queue: asyncio.Queue[str] | None = None
+_workers: list[asyncio.Task] = []
+_requeues: dict[str, int] = {}
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _spool_dir() -> str:
+    return settings.import_spool_dir or os.path.join(tempfile.gettempdir(), "buddhira-imports")
+
+
+def _spool_path(job_id: str) -> str:
+    return os.path.join(_spool_dir(), f"{job_id}.ndjson")
+
+
+def discard(job_id: str) -> None:
+    """Delete a job's spool file (if any)."""
+    try:
+        os.remove(_spool_path(job_id))
+    except FileNotFoundError:
+        pass
+
+
+async def spool_upload(job_id: str, chunks: AsyncIterator[bytes]) -> int:
+    """
+    Write the streamed body to the job's spool file. Returns the number of lines
+    (the job's total_rows; progress is tracked by line), or 0 for a blank body.
+    """
+    os.makedirs(_spool_dir(), exist_ok=True)
+    size = 0
+    lines = 0
+    has_data = False
+    last = b"\n"
+    f = await asyncio.to_thread(open, _spool_path(job_id), "wb")
+    with f:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            size += len(chunk)
+            if size > settings.import_max_bytes:
+                f.close()
+                discard(job_id)
+                raise UploadTooLarge()
+            await asyncio.to_thread(f.write, chunk)
+            lines += chunk.count(b"\n")
+            has_data = has_data or bool(chunk.strip())
+            last = chunk[-1:]
+    if not has_data:
+        return 0
+    return lines + (last != b"\n")
+
+
+async def submit(job_id: str, user_id: str, total_rows: int) -> dict:
+    """Create the job row for a spooled upload and queue it."""
+    if _queue is None:
+        discard(job_id)
+        raise RuntimeError("Import workers are not running")
+    job = await jobs_repo.create({
+        "id": job_id,
+        "user_id": user_id,
+        "status": "queued",
+        "total_rows": total_rows,
+    })
+    _queue.put_nowait(job_id)
+    return job or {"id": job_id, "user_id": user_id, "status": "queued", "total_rows": total_rows}
+
+
+def _parse_line(raw: bytes) -> tuple[ImportItem | None, str | None]:
+    try:
+        return ImportItem.model_validate(json.loads(raw)), None
+    except json.JSONDecodeError as exc:
+        return None, f"Invalid JSON: {exc.msg}"
+    except ValidationError as exc:
+        parts = []
+        for e in exc.errors():
+            loc = ".".join(str(x) for x in e.get("loc", []))
+            parts.append(f"{loc}: {e['msg']}" if loc else e["msg"])
+        return None, " ".join(parts)
+
+
+def _add_error(progress: dict, line: int, detail: str) -> None:
+    if len(progress["errors"]) < MAX_JOB_ERRORS:
+        progress["errors"].append({"line": line, "detail": detail})
+
+
+def _requeue_later(job_id: str) -> None:
+    if _queue is not None:
+        _queue.put_nowait(job_id)
+
+
+async def _run(job_id: str) -> None:
+    try:
+        f = await asyncio.to_thread(open, _spool_path(job_id), "rb")
+    except FileNotFoundError:
+        return  # spooled on another host, or already finished
+    with f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)  # non-blocking: never waits
+        except BlockingIOError:
+            return  # another worker process owns this job
+        job = await jobs_repo.get(job_id)
+        if job is None or job["status"] in ("completed", "failed"):
+            discard(job_id)
+            return
+
+        user_id = job["user_id"]
+        job_uuid = uuid.UUID(job_id)
+        progress = {
+            "committed_rows": job["committed_rows"],
+            "imported_count": job["imported_count"],
+            "attached_tag_links": job["attached_tag_links"],
+            "error_count": job["error_count"],
+            "errors": list(job.get("errors") or []),
+        }
+        await jobs_repo.update(job_id, {"status": "running", "started_at": job.get("started_at") or _now()})
+
+        items: list[ImportItem] = []
+        ids: list[str] = []
+        # Parse errors of the uncommitted lines: a resumed job parses those lines again
+        line_errors: list[dict] = []
+
+        async def commit(through_line: int) -> None:
+            for attempt in range(1, CHUNK_ATTEMPTS + 1):
+                try:
+                    imported, links = await import_batch(user_id, items, ids) if items else (0, 0)
+                    committed = {
+                        "committed_rows": through_line,
+                        "imported_count": progress["imported_count"] + imported,
+                        "attached_tag_links": progress["attached_tag_links"] + links,
+                        "error_count": progress["error_count"] + len(line_errors),
+                        "errors": (progress["errors"] + line_errors)[:MAX_JOB_ERRORS],
+                    }
+                    await jobs_repo.update(job_id, committed)
+                    progress.update(committed)
+                    break
+                except Exception as exc:
+                    # Rows that did go in are skipped on retry (per-line ids)
+                    logger.warning(
+                        "Import job %s chunk through line %s failed (attempt %s): %s",
+                        job_id, through_line, attempt, exc,
+                    )
+                    _add_error(progress, through_line, f"Chunk failed (attempt {attempt}/{CHUNK_ATTEMPTS}): {exc}")
+                    if attempt == CHUNK_ATTEMPTS:
+                        raise
+                    await asyncio.sleep(2 ** (attempt - 1))
+            items.clear()
+            ids.clear()
+            line_errors.clear()
+
+        line_no = 0
+        try:
+            while batch := await asyncio.to_thread(f.readlines, READ_BATCH_BYTES):
+                for raw in batch:
+                    line_no += 1
+                    if line_no <= progress["committed_rows"] or not raw.strip():
+                        continue
+                    item, error = _parse_line(raw)
+                    if item is None:
+                        line_errors.append({"line": line_no, "detail": error})
+                    else:
+                        items.append(item)
+                        # Stable per-line id: retried chunks skip rows already inserted
+                        ids.append(str(uuid.uuid5(job_uuid, str(line_no))))
+                    if len(items) + len(line_errors) >= IMPORT_CHUNK_SIZE:
+                        await commit(line_no)
+            await commit(line_no)
+        except asyncio.CancelledError:
+            raise  # shutdown: job stays "running" and resumes on next start
+        except Exception as exc:
+            requeues = _requeues.get(job_id, 0)
+            if requeues < MAX_JOB_REQUEUES:
+                # Keep the spool and resume from committed_rows after a pause
+                logger.exception("Import job %s stalled at line %s; requeued", job_id, line_no)
+                _requeues[job_id] = requeues + 1
+                await _save_quietly(job_id, {**progress, "status": "queued", "failure": str(exc)})
+                asyncio.get_running_loop().call_later(IMPORT_REQUEUE_SECONDS, _requeue_later, job_id)
+                return
+            logger.exception("Import job %s failed at line %s", job_id, line_no)
+            await _save_quietly(job_id, {**progress, "status": "failed", "failure": str(exc), "finished_at": _now()})
+            _requeues.pop(job_id, None)
+            discard(job_id)
+            return
+
+        await jobs_repo.update(job_id, {"status": "completed", "failure": None, "finished_at": _now()})
+        _requeues.pop(job_id, None)
+        discard(job_id)
+        logger.info("Import job %s completed: %s rows", job_id, progress["committed_rows"])
+
+
+async def _save_quietly(job_id: str, fields: dict) -> None:
+    """Best-effort job update on the failure path (the database may be what failed)."""
+    try:
+        await jobs_repo.update(job_id, fields)
+    except Exception:
+        logger.exception("Could not update import job %s", job_id)
+
+
+async def _worker() -> None:
+    assert _queue is not None
+    while True:
+        job_id = await _queue.get()
+        try:
+            await _run(job_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Import job %s crashed", job_id)
+        finally:
+            _queue.task_done()
+
+
+async def start() -> None:
+    """Start the worker pool and requeue unfinished jobs spooled on this host."""
+    global _queue
+    _queue = asyncio.Queue()
+    _workers.extend(asyncio.create_task(_worker()) for _ in range(max(1, settings.import_workers)))
+    try:
+        for job in await jobs_repo.list_unfinished():
+            if os.path.exists(_spool_path(job["id"])):
+                _queue.put_nowait(job["id"])
+    except Exception:
+        logger.exception("Could not load unfinished import jobs")
+
+
+async def stop() -> None:
+    global _queue
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _queue = None
@@ -0,0 +1,119 @@
+"""
+Item rules shared by the HTTP routes and background jobs: field types and limits,
+archive rules, tag-name normalization and the batched import.
+"""
+
+import uuid
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+from app import read_cache, search_index
+from app.repositories import item_tags as item_tags_repo
+from app.repositories import items as items_repo
+from app.repositories import tags as tags_repo
+
+ItemType = Literal["note", "link", "snippet"]
+ItemState = Literal["inbox", "active", "archive"]
+
+MAX_TITLE = 500
+MAX_CONTENT = 50_000
+MAX_URL = 2_048
+MAX_WHY = 1_000
+IMPORT_CHUNK_SIZE = 500
+
+
+class ImportItem(BaseModel):
+    type: ItemType
+    title: str | None = Field(None, max_length=MAX_TITLE)
+    content: str | None = Field(None, max_length=MAX_CONTENT)
+    url: str | None = Field(None, max_length=MAX_URL)
+    state: ItemState = "inbox"
+    why_this_matters: str | None = Field(None, max_length=MAX_WHY)
+    is_pinned: bool = False
+    is_archived: bool = False
+    tags: list[str] = Field(default_factory=list)
+
+
+def enforce_archive_rules(data: dict) -> dict:
+    """Keep state and is_archived in sync."""
+    is_archived = data.get("is_archived")
+    state = data.get("state")
+
+    if is_archived is True:
+        data["state"] = "archive"
+    elif state == "archive":
+        data["is_archived"] = True
+    elif state is not None and state != "archive":
+        data["is_archived"] = False
+
+    return data
+
+
+def normalized_tag(name: str) -> str:
+    return name.strip().lower()
+
+
+def _chunks(rows: list, size: int):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+async def import_batch(
+    user_id: str,
+    items: list[ImportItem],
+    ids: list[str] | None = None,
+) -> tuple[int, int]:
+    """
+    Batched import: one upsert for all distinct new tags, one insert per chunk of
+    items, one upsert per chunk of item_tag links. Item ids are generated here (or
+    passed in, for idempotent background-job retries) so links can be built without
+    reading the inserted rows back. Returns (imported_count, attached_tag_links).
+    """
+    rows: list[dict] = []
+    row_tags: list[list[str]] = []
+    for i, item in enumerate(items):
+        row = {
+            "id": ids[i] if ids else str(uuid.uuid4()),
+            "user_id": user_id,
+            "type": item.type,
+            "title": item.title,
+            "content": item.content,
+            "url": item.url,
+            "state": item.state,
+            "why_this_matters": item.why_this_matters,
+            "is_pinned": item.is_pinned,
+            "is_archived": item.is_archived,
+        }
+        rows.append(enforce_archive_rules(row))
+        names = (normalized_tag(t) for t in item.tags)
+        row_tags.append(list(dict.fromkeys(n for n in names if n)))
+
+    try:
+        # 1. Tags: resolve every distinct name once, bulk-create the missing ones
+        tag_map: dict[str, str] = {t["name"]: t["id"] for t in await tags_repo.list_names(user_id)}
+        missing = list(dict.fromkeys(n for names in row_tags for n in names if n not in tag_map))
+        for chunk in _chunks(missing, IMPORT_CHUNK_SIZE):
+            tag_map.update({t["name"]: t["id"] for t in await tags_repo.upsert_many(user_id, chunk)})
+
+        # 2. Items, 3. links — chunk by chunk so a failure leaves earlier chunks committed
+        imported_count = 0
+        attached_tag_links = 0
+        for chunk, chunk_tags in zip(_chunks(rows, IMPORT_CHUNK_SIZE), _chunks(row_tags, IMPORT_CHUNK_SIZE)):
+            imported_count += await items_repo.insert_many(user_id, chunk)
+
+            links = [
+                {"item_id": row["id"], "tag_id": tag_map[name]}
+                for row, names in zip(chunk, chunk_tags)
+                for name in names
+                if name in tag_map
+            ]
+            for link_chunk in _chunks(links, IMPORT_CHUNK_SIZE * 2):
+                attached_tag_links += await item_tags_repo.attach_many(link_chunk)
+
+            for row, names in zip(chunk, chunk_tags):
+                search_index.on_upsert(user_id, row)
+    finally:
+        read_cache.bump(user_id)  # even after a failed chunk: earlier chunks are committed
+
+    return imported_count, attached_tag_links
@@ -0,0 +1,136 @@
+"""
+Async JWKS key manager for JWT verification.
+
+Keys are fetched with httpx (never blocking the event loop), prefetched at startup
+and refreshed in the background every JWKS_REFRESH_SECONDS. A token with an unknown
+kid triggers at most one fetch at a time — concurrent lookups await the same fetch —
+and no more than one per JWKS_MIN_REFETCH_SECONDS. If the endpoint is unavailable,
+the last good key set keeps being served.
+"""
+
+import asyncio
+import logging
+import time
+
+import httpx
+from fastapi import HTTPException, status
+from jwt import PyJWK, PyJWKSet
+from jwt.exceptions import PyJWKClientConnectionError, PyJWKClientError
+
+from app.config import settings
+
+logger = logging.getLogger("buddhira")
+
+_keys: dict[str, PyJWK] = {}
+_version = 0  # bumped whenever the set of key ids changes
+_fetched_at = 0.0  # monotonic time of the last fetch attempt
+_inflight: asyncio.Task | None = None
+_refresh_task: asyncio.Task | None = None
+_stats = {"hits": 0, "misses": 0, "fetches": 0, "fetch_failures": 0}
+
+
+def key_set_version() -> int:
+    return _version
+
+
+def stats() -> dict:
+    return {**_stats, "keys": len(_keys)}
+
+
+def _url() -> str:
+    url = settings.jwks_url
+    if not url:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="JWKS URL not configured (set SUPABASE_URL or SUPABASE_JWKS_URL)",
+        )
+    return url
+
+
+async def _fetch() -> None:
+    global _keys, _version
+    headers = {"apikey": settings.service_role_key} if settings.service_role_key else None
+    _stats["fetches"] += 1
+    try:
+        async with httpx.AsyncClient(timeout=settings.jwks_timeout_seconds) as client:
+            response = await client.get(_url(), headers=headers)
+            response.raise_for_status()
+            data = response.json()
+    except (httpx.HTTPError, ValueError) as exc:
+        _stats["fetch_failures"] += 1
+        raise PyJWKClientConnectionError(f'Fail to fetch data from the url, err: "{exc}"') from exc
+    if not isinstance(data, dict):
+        raise PyJWKClientError("The JWKS endpoint did not return a JSON object")
+
+    keys = {
+        key.key_id: key
+        for key in PyJWKSet.from_dict(data).keys
+        if key.public_key_use in ("sig", None) and key.key_id
+    }
+    if not keys:
+        raise PyJWKClientError("The JWKS endpoint did not contain any signing keys")
+    if keys.keys() != _keys.keys():
+        _version += 1
+    _keys = keys
+
+
+async def refresh() -> None:
+    """Fetch the key set; concurrent callers share one in-flight fetch."""
+    global _inflight, _fetched_at
+    if _inflight is None or _inflight.done():
+        _fetched_at = time.monotonic()
+        _inflight = asyncio.create_task(_fetch())
+    await asyncio.shield(_inflight)
+
+
+async def get_signing_key(kid: str | None) -> PyJWK:
+    """Key for kid; refetches (rate-limited) when kid is not in the current set."""
+    key = _keys.get(kid) if kid else None
+    if key is not None:
+        _stats["hits"] += 1
+        return key
+    _stats["misses"] += 1
+    fetching = _inflight is not None and not _inflight.done()
+    if fetching or not _keys or time.monotonic() - _fetched_at >= settings.jwks_min_refetch_seconds:
+        try:
+            await refresh()
+        except (PyJWKClientError, HTTPException):
+            if not _keys:
+                raise
+            logger.warning("JWKS refresh failed; serving last good key set", exc_info=True)
+        key = _keys.get(kid) if kid else None
+        if key is not None:
+            return key
+    raise PyJWKClientError(f'Unable to find a signing key that matches: "{kid}"')
+
+
+async def _refresh_loop() -> None:
+    while True:
+        # Retry sooner while there is no key set yet
+        await asyncio.sleep(settings.jwks_refresh_seconds if _keys else settings.jwks_min_refetch_seconds)
+        try:
+            await refresh()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("JWKS background refresh failed; keeping last good key set", exc_info=True)
+
+
+async def start() -> None:
+    """Prefetch keys (best effort) and start the background refresh. Called from the lifespan."""
+    global _refresh_task
+    if not settings.jwks_url or _refresh_task is not None:
+        return
+    try:
+        await refresh()
+    except Exception:
+        logger.warning("JWKS prefetch failed; will retry in the background", exc_info=True)
+    _refresh_task = asyncio.create_task(_refresh_loop())
+
+
+async def stop() -> None:
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        await asyncio.gather(_refresh_task, return_exceptions=True)
+        _refresh_task = None
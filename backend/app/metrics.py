@@ -0,0 +1,406 @@
+"""
+Prometheus metrics (text exposition format 0.0.4), served at /metrics.
+
+Recording is per worker and lock-free: every update is a dict lookup and an integer
+add on the event loop thread, so the request path never waits on another worker.
+Each worker writes a snapshot of its counters to METRICS_DIR every
+METRICS_FLUSH_SECONDS (and on shutdown). /metrics flushes the serving worker's
+snapshot and then sums the snapshot files only (file IO runs in a thread, off
+the event loop), so any worker answers for all of
+them (at most one flush interval behind for the others) and every input only
+grows: a scrape never sees live values that a later scrape, served by another
+worker, would read back from an older file. In-flight and worker gauges only
+count live workers.
+
+Counters of exited workers keep counting. A starting worker folds the snapshots
+of dead workers into one retired file per group and deletes them, so the
+directory does not grow with every recycled worker. The retired file lists the
+snapshots it absorbed, and readers skip those, so a fold racing a scrape neither
+drops nor double-counts them.
+
+Snapshots are grouped by server: METRICS_GROUP if set, else the gunicorn master's
+pid in a gunicorn worker, else this process's pid (plain uvicorn, --reload), since
+the parent of a lone process is a shell, a reloader or PID 1. Workers that gunicorn
+did not fork (uvicorn --workers) need METRICS_GROUP to be counted together. Files
+of a numeric group whose process has exited are dropped at start, so a restart
+starts from zero; a named group keeps counting across restarts.
+
+Cache hit ratios are read from the caches' own stats() at snapshot time.
+"""
+
+import asyncio
+import fcntl
+import glob
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+from bisect import bisect_left
+
+import httpx
+import orjson
+
+from app.config import settings
+
+logger = logging.getLogger("buddhira")
+
+# Upper bounds in seconds (le); the last bucket is +Inf
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UPSTREAM_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_OPERATIONS = {"GET": "select", "HEAD": "select", "POST": "insert", "PATCH": "update", "DELETE": "delete"}
+
+# (method, route, status) -> [bucket counts..., +Inf count], and the matching sums
+_requests: dict[tuple[str, str, str], list[int]] = {}
+_request_seconds: dict[tuple[str, str, str], float] = {}
+# (table, operation) -> bucket counts / sum
+_postgrest: dict[tuple[str, str], list[int]] = {}
+_postgrest_seconds: dict[tuple[str, str], float] = {}
+_rate_limited: dict[str, int] = {}
+_in_flight = 0
+
+# Set in start(), in the worker process (not at import: gunicorn may preload the app)
+_group: str | None = None
+_snapshot_name = ""
+_flush_task: asyncio.Task | None = None
+
+
+def _observe(counts: dict, sums: dict, key: tuple, buckets: tuple, seconds: float) -> None:
+    row = counts.get(key)
+    if row is None:
+        row = counts[key] = [0] * (len(buckets) + 1)
+        sums[key] = 0.0
+    row[bisect_left(buckets, seconds)] += 1
+    sums[key] += seconds
+
+
+def request_started() -> None:
+    global _in_flight
+    _in_flight += 1
+
+
+def request_finished(method: str, route: str, status: int, seconds: float) -> None:
+    """Called once per HTTP request; route is the matched path template."""
+    global _in_flight
+    _in_flight -= 1
+    _observe(_requests, _request_seconds, (method, route, str(status)), LATENCY_BUCKETS, seconds)
+
+
+def rate_limited(bucket: str) -> None:
+    """A request rejected with 429; bucket is "ip" or "user"."""
+    _rate_limited[bucket] = _rate_limited.get(bucket, 0) + 1
+
+
+def _postgrest_labels(request: httpx.Request) -> tuple[str, str]:
+    _, _, resource = request.url.path.partition("/rest/v1/")
+    if resource.startswith("rpc/"):
+        return resource[4:], "rpc"
+    operation = _OPERATIONS.get(request.method, request.method.lower())
+    if operation == "insert" and "resolution=" in request.headers.get("prefer", ""):
+        operation = "upsert"
+    return resource or "unknown", operation
+
+
+async def postgrest_request_started(request: httpx.Request) -> None:
+    """httpx request hook on the PostgREST session."""
+    request.extensions["buddhira_started"] = time.perf_counter()
+
+
+async def postgrest_response(response: httpx.Response) -> None:
+    """httpx response hook: latency to response headers, per table and operation."""
+    started = response.request.extensions.get("buddhira_started")
+    if started is not None:
+        _observe(
+            _postgrest, _postgrest_seconds, _postgrest_labels(response.request),
+            UPSTREAM_BUCKETS, time.perf_counter() - started,
+        )
+
+
+def _cache_counts() -> dict[str, tuple[int, int]]:
+    """(hits, misses) per cache. Imported here: these modules import the repositories."""
+    from app import auth, jwks, read_cache, search_index
+
+    token, keys, reads, search = auth.token_cache_stats(), jwks.stats(), read_cache.stats(), search_index.stats()
+    return {
+        "auth_token": (token["hits"], token["misses"]),
+        "jwks": (keys["hits"], keys["misses"]),
+        "read_cache": (reads["hits"], reads["misses"]),
+        "search_index": (search["hits"], search["fallbacks"]),
+    }
+
+
+def snapshot() -> dict:
+    """This worker's values, JSON-serializable."""
+    return {
+        "pid": os.getpid(),
+        "requests": [[*k, v, _request_seconds[k]] for k, v in _requests.items()],
+        "postgrest": [[*k, v, _postgrest_seconds[k]] for k, v in _postgrest.items()],
+        "rate_limited": _rate_limited,
+        "caches": _cache_counts(),
+        "in_flight": _in_flight,
+    }
+
+
+def _dir() -> str:
+    return settings.metrics_dir or os.path.join(tempfile.gettempdir(), "buddhira-metrics")
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _group_id() -> str:
+    if settings.metrics_group:
+        return settings.metrics_group.replace("-", "_")  # "-" separates the file name fields
+    if "gunicorn.arbiter" in sys.modules:  # forked from the gunicorn master
+        return str(os.getppid())
+    return str(os.getpid())
+
+
+def _retired_name() -> str:
+    return f"{_group}-retired.json"
+
+
+def _write(name: str, data: dict) -> None:
+    path = os.path.join(_dir(), name)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(orjson.dumps(data))
+    os.replace(tmp, path)  # atomic: readers see the old file or the new one
+
+
+def _read(path: str) -> dict | None:
+    try:
+        with open(path, "rb") as fh:
+            return orjson.loads(fh.read())
+    except (OSError, ValueError):
+        return None  # removed or replaced while reading
+
+
+async def flush() -> None:
+    """Write this worker's snapshot (atomic rename). The snapshot is taken on the loop, written in a thread."""
+    await asyncio.to_thread(_write, _snapshot_name, snapshot())
+
+
+def _snapshots(current: dict) -> list[dict]:
+    """This group's snapshot files, after writing this worker's `current` one. Blocking file IO."""
+    if _group is None:
+        return [current]
+    try:
+        _write(_snapshot_name, current)
+        own = None
+    except OSError:
+        logger.exception("Could not write metrics snapshot")
+        own = current
+    retired_name = _retired_name()
+    found = []
+    for path in glob.glob(os.path.join(_dir(), f"{_group}-*.json")):
+        name = os.path.basename(path)
+        if name == retired_name or (own is not None and name == _snapshot_name):
+            continue
+        data = _read(path)
+        if data is not None:
+            found.append((name, data))
+    # Read after the others: a file that vanished above was folded into this one
+    retired = _read(os.path.join(_dir(), retired_name))
+    folded = set(retired["folded"]) if retired else set()
+    result = [data for name, data in found if name not in folded]
+    if retired:
+        result.append(retired)
+    if own is not None:
+        result.append(own)
+    return result
+
+
+def _retire_dead() -> None:
+    """Fold this group's snapshots of exited workers into its retired file."""
+    with open(os.path.join(_dir(), "fold.lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)  # workers starting together fold one at a time
+        retired_name = _retired_name()
+        dead = []
+        for path in glob.glob(os.path.join(_dir(), f"{_group}-*.json")):
+            name = os.path.basename(path)
+            pid = name.split("-")[1]
+            if name not in (_snapshot_name, retired_name) and pid.isdigit() and not _alive(int(pid)):
+                dead.append((name, path))
+        if not dead:
+            return
+        retired = _read(os.path.join(_dir(), retired_name))
+        snapshots = [data for data in (_read(path) for _, path in dead) if data is not None]
+        if retired:
+            snapshots.append(retired)
+        requests, postgrest, rejected, caches = _combine(snapshots)
+        _write(retired_name, {
+            "pid": None,
+            "retired": True,
+            "folded": [*(retired["folded"] if retired else ()), *(name for name, _ in dead)],
+            "requests": _rows(requests),
+            "postgrest": _rows(postgrest),
+            "rate_limited": rejected,
+            "caches": caches,
+            "in_flight": 0,
+        })
+        for _, path in dead:
+            os.remove(path)
+
+
+async def _flush_loop() -> None:
+    while True:
+        await asyncio.sleep(settings.metrics_flush_seconds)
+        try:
+            await flush()
+        except OSError:
+            logger.exception("Could not write metrics snapshot")
+
+
+def _prepare_dir() -> None:
+    """Create METRICS_DIR and drop the files of exited pid groups."""
+    os.makedirs(_dir(), exist_ok=True)
+    for path in glob.glob(os.path.join(_dir(), "*.json")):
+        group = os.path.basename(path).split("-", 1)[0]
+        if group.isdigit() and group != _group and not _alive(int(group)):
+            os.remove(path)
+
+
+async def start() -> None:
+    """Create METRICS_DIR, drop exited groups' snapshots, retire dead workers', start flushing."""
+    global _flush_task, _group, _snapshot_name
+    if _flush_task is not None:
+        return
+    _group = _group_id()
+    _snapshot_name = f"{_group}-{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+    try:
+        await asyncio.to_thread(_prepare_dir)
+        await flush()
+        await asyncio.to_thread(_retire_dead)
+    except OSError:
+        logger.exception("Could not prepare metrics dir %s", _dir())
+    _flush_task = asyncio.create_task(_flush_loop())
+
+
+async def stop() -> None:
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        await asyncio.gather(_flush_task, return_exceptions=True)
+        _flush_task = None
+    if _group is None:
+        return
+    try:
+        await flush()  # keep this worker's counts after it exits
+    except OSError:
+        logger.exception("Could not write metrics snapshot")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: str) -> str:
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _merge_histograms(rows: list[list], width: int) -> dict[tuple, tuple[list[int], float]]:
+    merged: dict[tuple, tuple[list[int], float]] = {}
+    for *key, counts, total in rows:
+        key = tuple(key)
+        if key not in merged:
+            merged[key] = ([0] * width, 0.0)
+        acc, acc_sum = merged[key]
+        for i, c in enumerate(counts[:width]):
+            acc[i] += c
+        merged[key] = (acc, acc_sum + total)
+    return merged
+
+
+def _histogram_lines(name: str, help_text: str, names: tuple[str, ...], buckets: tuple, merged: dict) -> list[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    bounds = [_number(b) for b in buckets] + ["+Inf"]
+    for key in sorted(merged):
+        counts, total = merged[key]
+        labels = dict(zip(names, key))
+        cumulative = 0
+        for bound, count in zip(bounds, counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+        lines.append(f"{name}_sum{_labels(**labels)} {_number(total)}")
+        lines.append(f"{name}_count{_labels(**labels)} {cumulative}")
+    return lines
+
+
+def _rows(merged: dict) -> list[list]:
+    return [[*key, counts, total] for key, (counts, total) in merged.items()]
+
+
+def _combine(snapshots: list[dict]) -> tuple[dict, dict, dict[str, int], dict[str, list[int]]]:
+    """Sum counters and histograms: (requests, postgrest, rate_limited, caches)."""
+    requests = _merge_histograms([r for s in snapshots for r in s["requests"]], len(LATENCY_BUCKETS) + 1)
+    postgrest = _merge_histograms([r for s in snapshots for r in s["postgrest"]], len(UPSTREAM_BUCKETS) + 1)
+    rejected: dict[str, int] = {}
+    caches: dict[str, list[int]] = {}
+    for s in snapshots:
+        for bucket, count in s["rate_limited"].items():
+            rejected[bucket] = rejected.get(bucket, 0) + count
+        for cache, (hits, misses) in s["caches"].items():
+            acc = caches.setdefault(cache, [0, 0])
+            acc[0] += hits
+            acc[1] += misses
+    return requests, postgrest, rejected, caches
+
+
+async def render() -> str:
+    """All workers' metrics in Prometheus text format."""
+    snapshots = await asyncio.to_thread(_snapshots, snapshot())
+    requests, postgrest, rejected, caches = _combine(snapshots)
+    live = [s for s in snapshots if not s.get("retired") and (s["pid"] == os.getpid() or _alive(s["pid"]))]
+
+    lines = _histogram_lines(
+        "buddhira_http_request_duration_seconds",
+        "Request latency by method, route template and status (_count is the request count).",
+        ("method", "route", "status"), LATENCY_BUCKETS, requests,
+    )
+    lines += [
+        "# HELP buddhira_http_requests_in_flight Requests being served right now.",
+        "# TYPE buddhira_http_requests_in_flight gauge",
+        f"buddhira_http_requests_in_flight {sum(s['in_flight'] for s in live)}",
+        "# HELP buddhira_workers Workers reporting metrics.",
+        "# TYPE buddhira_workers gauge",
+        f"buddhira_workers {len(live)}",
+        "# HELP buddhira_rate_limited_total Requests rejected with 429, by the bucket that was empty.",
+        "# TYPE buddhira_rate_limited_total counter",
+    ]
+    lines += [f"buddhira_rate_limited_total{_labels(bucket=b)} {rejected.get(b, 0)}" for b in ("ip", "user")]
+    lines += _histogram_lines(
+        "buddhira_postgrest_request_duration_seconds",
+        "PostgREST call latency (to response headers) by table and operation.",
+        ("table", "operation"), UPSTREAM_BUCKETS, postgrest,
+    )
+    lines += [
+        "# HELP buddhira_cache_requests_total Cache lookups by result.",
+        "# TYPE buddhira_cache_requests_total counter",
+    ]
+    for cache in sorted(caches):
+        hits, misses = caches[cache]
+        lines.append(f"buddhira_cache_requests_total{_labels(cache=cache, result='hit')} {hits}")
+        lines.append(f"buddhira_cache_requests_total{_labels(cache=cache, result='miss')} {misses}")
+    lines += [
+        "# HELP buddhira_cache_hit_ratio Hits / lookups since start (NaN before the first lookup).",
+        "# TYPE buddhira_cache_hit_ratio gauge",
+    ]
+    for cache in sorted(caches):
+        hits, misses = caches[cache]
+        ratio = _number(round(hits / (hits + misses), 4)) if hits + misses else "NaN"
+        lines.append(f"buddhira_cache_hit_ratio{_labels(cache=cache)} {ratio}")
+    return "\n".join(lines) + "\n"
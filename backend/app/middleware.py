@@ -1,105 +1,221 @@
 """
-Request logging and rate limiting middleware.
+Request logging, metrics and rate limiting middleware (pure ASGI).
+
+The bearer token is read from the Authorization header once, in
+RequestLoggingMiddleware, and shared through request state (`bearer_token`);
+get_current_user stores the verified user there (`user`) for the log line.
+RateLimitMiddleware puts itself in request state (`rate_limiter`) so handlers
+can charge more tokens to the same buckets (see RateLimitMiddleware.charge).
 """
 
+import asyncio
 import logging
+import math
 import time
 import uuid
-from collections import defaultdict
-from typing import Callable
 
-import jwt
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
+from fastapi import HTTPException, status
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app import metrics
+from app.auth import peek_verified_user
+from app.config import settings
+from app.rate_limit import MemoryRateLimitStore, RateLimitResult, create_store
 
 logger = logging.getLogger("buddhira")
 
-# Rate limit: (window_seconds, max_requests)
-RATE_LIMIT_WINDOW = 60
-RATE_LIMIT_MAX = 120  # per IP per minute
+SKIP_RATE_LIMIT_PATHS = ("/health", "/", "/metrics")
+
+_RATE_LIMITED_BODY = b'{"detail":"Too many requests","code":"rate_limited"}'
+_RATE_LIMITED_START = [
+    (b"content-type", b"application/json"),
+    (b"content-length", str(len(_RATE_LIMITED_BODY)).encode()),
+]
+
+
+def _header(scope: Scope, name: bytes) -> str | None:
+    """First value of a request header (name in lower case)."""
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
 
 
-def _user_id_from_request(request: Request) -> str | None:
-    """Extract user id from Bearer token for logging only (no verification)."""
-    auth = request.headers.get("Authorization")
+def _bearer_token(scope: Scope) -> str | None:
+    auth = _header(scope, b"authorization")
     if not auth or not auth.startswith("Bearer "):
         return None
-    token = auth[7:].strip()
-    if not token:
-        return None
-    try:
-        payload = jwt.decode(token, options={"verify_signature": False})
-        return payload.get("sub")
-    except Exception:
-        return None
+    return auth[7:].strip() or None
 
 
-def _client_ip(request: Request) -> str:
+def _client_ip(scope: Scope) -> str:
     """Client IP for rate limiting (respect X-Forwarded-For if set)."""
-    forwarded = request.headers.get("X-Forwarded-For")
+    forwarded = _header(scope, b"x-forwarded-for")
     if forwarded:
         return forwarded.split(",")[0].strip()
-    return request.client.host if request.client else "unknown"
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class RequestLoggingMiddleware:
+    """Log every request (route, user_id, status, latency_ms) and record it in app.metrics."""
 
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    """Log every request: route, user_id, status, latency_ms."""
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
         start = time.perf_counter()
-        request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
-        request.state.request_id = request_id
-        user_id = _user_id_from_request(request) or "anon"
-        path = request.url.path or ""
-        method = request.method or ""
-
-        response = await call_next(request)
-        response.headers["X-Request-ID"] = request_id
-        latency_ms = round((time.perf_counter() - start) * 1000)
-        logger.info(
-            "request_id=%s path=%s method=%s user_id=%s status=%s latency_ms=%s",
-            request_id,
-            path,
-            method,
-            user_id,
-            response.status_code,
-            latency_ms,
-        )
-        return response
-
-
-class RateLimitMiddleware(BaseHTTPMiddleware):
+        request_id = _header(scope, b"x-request-id") or uuid.uuid4().hex
+        state = scope.setdefault("state", {})
+        state["request_id"] = request_id
+        state["bearer_token"] = _bearer_token(scope)
+        status_code = 500
+        metrics.request_started()
+
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [*message.get("headers", ()), (b"x-request-id", request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            metrics.request_finished(
+                scope.get("method", ""), getattr(route, "path", "unmatched"), status_code, elapsed
+            )
+            user = state.get("user")
+            logger.info(
+                "request_id=%s path=%s method=%s user_id=%s status=%s latency_ms=%s",
+                request_id,
+                scope.get("path", ""),
+                scope.get("method", ""),
+                user.id if user is not None else "anon",
+                status_code,
+                round(elapsed * 1000),
+            )
+
+
+def _rate_limit_headers(result: RateLimitResult) -> list[tuple[bytes, bytes]]:
+    headers = [
+        (b"x-ratelimit-limit", str(result.limit).encode()),
+        (b"x-ratelimit-remaining", str(result.remaining).encode()),
+        (b"x-ratelimit-reset", str(math.ceil(result.reset_after)).encode()),
+    ]
+    if not result.allowed:
+        headers.append((b"retry-after", str(max(1, math.ceil(result.retry_after))).encode()))
+    return headers
+
+
+class RateLimitMiddleware:
     """
-    In-memory rate limit per IP. Returns 429 when exceeded.
-    Skip rate limit for /health and / (so load balancers keep working).
+    Rate limit per IP and per user (JWT sub), against the store chosen by
+    RATE_LIMIT_BACKEND. The user bucket is charged here for tokens this worker has
+    already verified, so those are turned away before routing; any other request
+    is charged by get_current_user once its token is verified (charge_user), so
+    the per-user limit holds with the token cache cold or disabled. Returns 429
+    with Retry-After when either bucket is empty; every limited response carries
+    X-RateLimit-* for the tighter of the two, including tokens charged later.
+    Skip rate limit for /health, / and /metrics (so load balancers and scrapers keep working).
     """
 
-    def __init__(self, app, window_seconds: int = RATE_LIMIT_WINDOW, max_requests: int = RATE_LIMIT_MAX):
-        super().__init__(app)
-        self.window = window_seconds
-        self.max_requests = max_requests
-        self._counts: dict[str, list[float]] = defaultdict(list)
-
-    def _clean_old(self, key: str, now: float) -> None:
-        cutoff = now - self.window
-        self._counts[key] = [t for t in self._counts[key] if t > cutoff]
-
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        path = request.url.path or ""
-        if path in ("/health", "/"):
-            return await call_next(request)
-
-        ip = _client_ip(request)
-        now = time.perf_counter()
-        self._clean_old(ip, now)
-
-        if len(self._counts[ip]) >= self.max_requests:
-            return Response(
-                content='{"detail":"Too many requests","code":"rate_limited"}',
-                status_code=429,
-                media_type="application/json",
-            )
-        self._counts[ip].append(now)
-
-        return await call_next(request)
+    def __init__(
+        self,
+        app: ASGIApp,
+        window_seconds: float | None = None,
+        max_requests: int | None = None,
+        max_user_requests: int | None = None,
+        store=None,
+    ):
+        self.app = app
+        self.window = window_seconds or settings.rate_limit_window_seconds
+        self.max_requests = max_requests or settings.rate_limit_per_ip
+        self.max_user_requests = max_user_requests or settings.rate_limit_per_user
+        self.store = store or create_store()
+        self._sweeper: asyncio.Task | None = None
+
+    async def _sweep(self) -> None:
+        while True:
+            await asyncio.sleep(self.window)
+            evicted = self.store.evict_idle(self.window)
+            if evicted:
+                logger.debug("rate_limit evicted=%s keys=%s", evicted, len(self.store))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope.get("path") in SKIP_RATE_LIMIT_PATHS:
+            await self.app(scope, receive, send)
+            return
+        if isinstance(self.store, MemoryRateLimitStore) and (self._sweeper is None or self._sweeper.done()):
+            self._sweeper = asyncio.create_task(self._sweep())
+
+        client_ip = _client_ip(scope)
+        result = await self.store.hit(f"ip:{client_ip}", self.max_requests, self.window)
+        bucket = "ip"
+        state = scope.setdefault("state", {})
+        user = None
+        if result.allowed:
+            token = state["bearer_token"] if "bearer_token" in state else _bearer_token(scope)
+            user = peek_verified_user(token) if token else None
+            if user is not None:
+                user_result = await self.store.hit(f"user:{user.id}", self.max_user_requests, self.window)
+                if not user_result.allowed or user_result.remaining < result.remaining:
+                    result, bucket = user_result, "user"
+
+        if not result.allowed:
+            metrics.rate_limited(bucket)
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": _RATE_LIMITED_START + _rate_limit_headers(result),
+            })
+            await send({"type": "http.response.body", "body": _RATE_LIMITED_BODY})
+            return
+
+        state["rate_limiter"] = self
+        state["rate_limit"] = result
+        state["rate_limit_ip"] = client_ip
+        state["rate_limit_user"] = user.id if user is not None else None
+
+        async def send_with_limits(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *_rate_limit_headers(state["rate_limit"])]
+            await send(message)
+
+        await self.app(scope, receive, send_with_limits)
+
+    async def charge(self, state: dict, cost: int) -> None:
+        """
+        Take `cost` more tokens from the ip and user buckets of a request this
+        middleware has already let through (state is its request state), e.g. one
+        per batch operation after the first. Each bucket gives all of them or none;
+        raises HTTPException 429 when either cannot (the response gets that
+        bucket's X-RateLimit-* and Retry-After).
+        """
+        await self._charge(state, "ip", f"ip:{state['rate_limit_ip']}", self.max_requests, cost)
+        if state["rate_limit_user"] is not None:
+            await self._charge(state, "user", f"user:{state['rate_limit_user']}", self.max_user_requests, cost)
+
+    async def charge_user(self, state: dict, user_id: str) -> None:
+        """
+        Take this request's token from user_id's bucket unless __call__ already did
+        (called by get_current_user after verifying the token). 429 like charge().
+        """
+        if state["rate_limit_user"] == user_id:
+            return
+        state["rate_limit_user"] = user_id
+        await self._charge(state, "user", f"user:{user_id}", self.max_user_requests, 1)
+
+    async def _charge(self, state: dict, bucket: str, key: str, limit: int, cost: int) -> None:
+        result = await self.store.hit(key, limit, self.window, cost)
+        if not result.allowed or result.remaining < state["rate_limit"].remaining:
+            state["rate_limit"] = result
+        if not result.allowed:
+            metrics.rate_limited(bucket)
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many requests")
@@ -0,0 +1,280 @@
+"""
+Rate-limit stores for RateLimitMiddleware (token buckets).
+
+A bucket holds up to `limit` tokens and refills at limit/window per second, so it
+allows bursts of `limit` and `limit` requests per window sustained. A check takes
+`cost` tokens (1 per request; a batch takes one per operation) or none, and is a
+single atomic read-modify-write:
+
+- memory: per worker process (default; each gunicorn worker counts separately)
+- shared: a fixed-size table in a memory-mapped file under an flock, shared by all
+  workers on one host
+- redis: a Lua script on a Redis-protocol server (one round trip), shared by all
+  hosts; needs the `redis` package
+"""
+
+import asyncio
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from app.config import settings
+
+logger = logging.getLogger("buddhira")
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float  # seconds until the bucket is full again
+    retry_after: float  # seconds until the next request is allowed (0 when allowed)
+
+
+def _take(
+    tokens: float | None, updated_at: float, limit: int, window: float, now: float, cost: int = 1
+) -> tuple[float, RateLimitResult]:
+    """Refill a bucket to `now` and take `cost` tokens if it has them. Returns (tokens left, result)."""
+    rate = limit / window
+    if tokens is None:
+        tokens = float(limit)
+    else:
+        tokens = min(float(limit), tokens + max(0.0, now - updated_at) * rate)
+    allowed = tokens >= cost
+    if allowed:
+        tokens -= cost
+    return tokens, _result(allowed, tokens, limit, window, cost)
+
+
+def _result(allowed: bool, tokens: float, limit: int, window: float, cost: int = 1) -> RateLimitResult:
+    rate = limit / window
+    return RateLimitResult(
+        allowed=allowed,
+        limit=limit,
+        remaining=int(tokens),
+        reset_after=(limit - tokens) / rate,
+        retry_after=0.0 if allowed else (cost - tokens) / rate,
+    )
+
+
+class MemoryRateLimitStore:
+    """
+    Buckets in process memory: O(1) per request, one small entry per key. Keys are
+    kept in LRU order, capped at max_keys, and idle keys are swept by evict_idle.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list[float]]" = OrderedDict()  # key -> [tokens, updated_at]
+
+    async def hit(self, key: str, limit: int, window: float, cost: int = 1) -> RateLimitResult:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens, result = _take(None, now, limit, window, now, cost)
+            self._buckets[key] = [tokens, now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            bucket[0], result = _take(bucket[0], bucket[1], limit, window, now, cost)
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+        return result
+
+    def evict_idle(self, window: float) -> int:
+        """Drop keys untouched for a full window (their bucket has refilled)."""
+        cutoff = time.monotonic() - window
+        evicted = 0
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if bucket[1] > cutoff:
+                break
+            del self._buckets[key]
+            evicted += 1
+        return evicted
+
+    async def close(self) -> None:
+        pass
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class SharedMemoryRateLimitStore:
+    """
+    Open-addressing table of (key hash, tokens, updated_at) slots in a memory-mapped
+    file, so every worker process on the host sees the same buckets. Each check
+    holds an exclusive flock for a few microseconds; a worker that finds it taken
+    yields to its event loop and retries instead of blocking. Memory is fixed: when
+    a key's probe window is full, the least recently updated slot is reused.
+    """
+
+    _SLOT = struct.Struct("<Qdd")
+    _PROBES = 8
+
+    def __init__(self, path: str, slots: int = 65536):
+        self.slots = slots
+        size = slots * self._SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._mm = mmap.mmap(self._fd, size)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        # 0 marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+    async def _lock(self) -> None:
+        delay = 0.0
+        while True:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                await asyncio.sleep(delay)
+                delay = min(0.001, delay * 2 or 0.0001)
+
+    async def hit(self, key: str, limit: int, window: float, cost: int = 1) -> RateLimitResult:
+        h = self._hash(key)
+        slot_size = self._SLOT.size
+        await self._lock()
+        now = time.monotonic()  # system-wide clock on Linux, so comparable across workers
+        try:
+            target = None
+            current: float | None = None
+            updated_at = now
+            oldest = None
+            for i in range(self._PROBES):
+                offset = ((h + i) % self.slots) * slot_size
+                slot_hash, tokens, slot_updated = self._SLOT.unpack_from(self._mm, offset)
+                if slot_hash == h:
+                    target, current, updated_at = offset, tokens, slot_updated
+                    break
+                if slot_hash == 0:
+                    target = offset
+                    break
+                if oldest is None or slot_updated < oldest[1]:
+                    oldest = (offset, slot_updated)
+            if target is None:
+                target = oldest[0]
+            tokens, result = _take(current, updated_at, limit, window, now, cost)
+            self._SLOT.pack_into(self._mm, target, h, tokens, now)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return result
+
+    def evict_idle(self, window: float) -> int:
+        return 0  # fixed size; stale slots are reused
+
+    async def close(self) -> None:
+        self._mm.close()
+        os.close(self._fd)
+
+
+# KEYS[1] bucket; ARGV limit, window, cost. Uses the server clock so all hosts agree.
+_REDIS_TOKEN_BUCKET = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local rate = limit / window
+local b = redis.call('HMGET', KEYS[1], 't', 'u')
+local tokens = tonumber(b[1])
+if tokens == nil then
+  tokens = limit
+else
+  tokens = math.min(limit, tokens + math.max(0, now - tonumber(b[2])) * rate)
+end
+local allowed = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 't', tostring(tokens), 'u', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(window * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisRateLimitStore:
+    """
+    Buckets in Redis (or any server speaking the Redis protocol with Lua), checked
+    by one EVALSHA per request. Keys expire after a window of inactivity. If the
+    server is unreachable, requests are allowed and a warning is logged.
+    """
+
+    def __init__(self, url: str, prefix: str = "buddhira:rl:", client=None):
+        self.prefix = prefix
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError as exc:
+                raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the redis package") from exc
+            client = redis.Redis.from_url(url)
+        self._redis = client
+        self._script = self._redis.register_script(_REDIS_TOKEN_BUCKET)
+
+    async def hit(self, key: str, limit: int, window: float, cost: int = 1) -> RateLimitResult:
+        try:
+            allowed, tokens = await self._script(keys=[self.prefix + key], args=[limit, window, cost])
+        except Exception:
+            logger.warning("rate_limit redis unavailable; allowing request", exc_info=True)
+            return _result(True, float(limit), limit, window)
+        return _result(bool(allowed), float(tokens), limit, window, cost)
+
+    def evict_idle(self, window: float) -> int:
+        return 0  # keys expire in Redis
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def _default_shared_path() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "buddhira-ratelimit")
+
+
+_open_stores: list = []
+
+
+def create_store():
+    """
+    Store for RATE_LIMIT_BACKEND (memory, shared or redis). Created in the worker
+    (by RateLimitMiddleware on its first request), never in a preloading master:
+    the flock of the shared store must not be inherited across fork.
+    """
+    backend = settings.rate_limit_backend
+    if backend == "shared":
+        store = SharedMemoryRateLimitStore(
+            settings.rate_limit_shared_path or _default_shared_path(),
+            settings.rate_limit_shared_slots,
+        )
+    elif backend == "redis":
+        if not settings.rate_limit_redis_url:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires RATE_LIMIT_REDIS_URL")
+        store = RedisRateLimitStore(settings.rate_limit_redis_url)
+    elif backend == "memory":
+        store = MemoryRateLimitStore(settings.rate_limit_max_keys)
+    else:
+        raise RuntimeError(f"Unknown RATE_LIMIT_BACKEND: {backend}")
+    _open_stores.append(store)
+    return store
+
+
+async def close_stores() -> None:
+    """Close stores created by create_store (Redis pool, mmap and fd). Called from the lifespan."""
+    while _open_stores:
+        store = _open_stores.pop()
+        try:
+            await store.close()
+        except Exception:
+            logger.exception("Could not close rate-limit store")
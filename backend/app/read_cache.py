@@ -0,0 +1,143 @@
+"""
+Per-user response cache for list_items and list_tags.
+
+Entries are keyed by (user id, endpoint, normalized query parameters, negotiated
+representation) and stamped
+with the user's write version. Every item, tag, item_tag, bulk and import write
+calls bump(user_id), so stale entries are never served after a write, however
+they were keyed. Entries hold the rendered body and its ETag, so a hit is served
+without re-serializing. LRU eviction under READ_CACHE_MAX_MB, plus
+READ_CACHE_TTL_SECONDS.
+
+Enabled with READ_CACHE_ENABLED=true. Per worker, like the search index: a write
+served by another worker is only seen here once the TTL expires, so keep the TTL
+short (or the cache off) when running more than one worker.
+
+Versions come from one monotonic clock, so a dropped version is never reused. A
+user's version is kept while they have cached entries, and otherwise only while a
+read of theirs may be in flight: version() gives such a user a fresh pending
+version that their writes move on and their put() must match. Pending versions
+sit in a small LRU map, so a write only invalidates its own user's reads and
+memory stays bounded (a read whose pending version was evicted just isn't cached).
+"""
+
+import time
+from collections import OrderedDict
+
+from app.conditional import Rendered
+from app.config import settings
+from app.encoding import representation
+
+MAX_PENDING_USERS = 10_000
+
+_clock = 0
+_versions: dict[str, int] = {}  # only users with cached entries
+_pending: "OrderedDict[str, int]" = OrderedDict()  # users without entries, by last read
+_user_entries: dict[str, int] = {}
+# (user_id, key, media type) -> (expires_at, version, rendered response)
+_entries: "OrderedDict[tuple[str, tuple, str], tuple[float, int, Rendered]]" = OrderedDict()
+_bytes = 0
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def enabled() -> bool:
+    return settings.read_cache_enabled
+
+
+def _tick() -> int:
+    global _clock
+    _clock += 1
+    return _clock
+
+
+def version(user_id: str) -> int:
+    """The user's current version; call before the query and pass it to put()."""
+    if not enabled():
+        return 0
+    current = _versions.get(user_id)
+    if current is not None:
+        return current
+    current = _pending.get(user_id)
+    if current is None:
+        current = _pending[user_id] = _tick()
+        if len(_pending) > MAX_PENDING_USERS:
+            _pending.popitem(last=False)
+    else:
+        _pending.move_to_end(user_id)
+    return current
+
+
+def bump(user_id: str) -> None:
+    """Record a write by user_id; all of their cached responses and in-flight reads become stale."""
+    if user_id in _versions:
+        _versions[user_id] = _tick()
+    elif user_id in _pending:
+        _pending[user_id] = _tick()
+
+
+def _size(rendered: Rendered) -> int:
+    return len(rendered.body) + 200  # body + entry overhead
+
+
+def _drop(entry_key: tuple[str, tuple, str]) -> None:
+    global _bytes
+    _bytes -= _size(_entries.pop(entry_key)[2])
+    user_id = entry_key[0]
+    remaining = _user_entries[user_id] - 1
+    if remaining:
+        _user_entries[user_id] = remaining
+    else:
+        del _user_entries[user_id]
+        del _versions[user_id]  # reads still in flight at this version will not match again
+
+
+def get(user_id: str, key: tuple) -> Rendered | None:
+    if not enabled():
+        return None
+    entry_key = (user_id, key, representation())
+    entry = _entries.get(entry_key)
+    if entry is None or entry[0] <= time.monotonic() or entry[1] != _versions.get(user_id):
+        if entry is not None:
+            _drop(entry_key)
+        _stats["misses"] += 1
+        return None
+    _entries.move_to_end(entry_key)
+    _stats["hits"] += 1
+    return entry[2]
+
+
+def put(user_id: str, key: tuple, rendered: Rendered, at_version: int) -> None:
+    """
+    Cache a response computed from data read at at_version (call version() before the
+    query), so a write that lands mid-query leaves nothing stale behind.
+    """
+    global _bytes
+    if not enabled() or at_version != _versions.get(user_id, _pending.get(user_id)):
+        return
+    entry_key = (user_id, key, rendered.media_type)
+    if entry_key in _entries:
+        _drop(entry_key)
+    size = _size(rendered)
+    cap = settings.read_cache_max_mb * 1024 * 1024
+    if size > cap:
+        return
+    _entries[entry_key] = (time.monotonic() + settings.read_cache_ttl_seconds, at_version, rendered)
+    _versions[user_id] = at_version  # pinned while the user has entries
+    _pending.pop(user_id, None)
+    _user_entries[user_id] = _user_entries.get(user_id, 0) + 1
+    _bytes += size
+    while _bytes > cap:
+        _drop(next(iter(_entries)))
+        _stats["evictions"] += 1
+
+
+def stats() -> dict:
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "hit_ratio": round(_stats["hits"] / lookups, 4) if lookups else None,
+        "entries": len(_entries),
+        "users": len(_versions),
+        "pending_users": len(_pending),
+        "bytes": _bytes,
+    }
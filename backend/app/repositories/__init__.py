@@ -0,0 +1,6 @@
+"""
+Async data access for items, tags and item_tags.
+
+Routers call these functions instead of building PostgREST queries inline.
+Every call is awaited on the shared pooled client; nothing here blocks the event loop.
+"""
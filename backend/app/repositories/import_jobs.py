@@ -0,0 +1,36 @@
+"""
+Background import job rows (progress, counts, per-row errors).
+"""
+
+from app.supabase_client import get_supabase
+
+
+async def create(job: dict) -> dict | None:
+    response = await get_supabase().table("import_jobs").insert(job).execute()
+    return response.data[0] if response.data else None
+
+
+async def get(job_id: str, user_id: str | None = None) -> dict | None:
+    """Fetch a job; scoped to user_id when given."""
+    query = get_supabase().table("import_jobs").select("*").eq("id", job_id)
+    if user_id is not None:
+        query = query.eq("user_id", user_id)
+    response = await query.execute()
+    return response.data[0] if response.data else None
+
+
+async def update(job_id: str, fields: dict) -> None:
+    await get_supabase().table("import_jobs").update(fields).eq("id", job_id).execute()
+
+
+async def list_unfinished() -> list[dict]:
+    """Queued or running jobs, oldest first (resume candidates after a restart)."""
+    response = await (
+        get_supabase()
+        .table("import_jobs")
+        .select("*")
+        .in_("status", ["queued", "running"])
+        .order("created_at")
+        .execute()
+    )
+    return response.data or []
@@ -0,0 +1,89 @@
+"""
+Item ↔ Tag link data access.
+
+The *_owned functions enforce ownership inside the statement itself (user-scoped
+embed or RPC), so the happy path is one round trip. attach_many is for callers
+that already know both rows belong to the user (e.g. import); bulk_apply checks
+ownership of many items and tags at once.
+"""
+
+from app.supabase_client import get_supabase
+
+
+async def list_for_item(item_id: str, user_id: str) -> list[dict] | None:
+    """Tags on a user's item; None when the item is missing or not owned."""
+    response = await (
+        get_supabase()
+        .table("items")
+        .select("id, item_tags(tag_id, tags(id, name))")
+        .eq("id", item_id)
+        .eq("user_id", user_id)
+        .execute()
+    )
+    if not response.data:
+        return None
+    return response.data[0].get("item_tags") or []
+
+
+async def attach_many(links: list[dict]) -> int:
+    """
+    Insert {item_id, tag_id} links in one statement (attach_item_tags RPC); existing
+    links are left as is. Returns how many of the links exist afterwards, including
+    ones an earlier attempt at the same chunk created.
+    """
+    if not links:
+        return 0
+    response = await get_supabase().rpc("attach_item_tags", {"p_links": links}).execute()
+    return response.data or 0
+
+
+async def attach_owned(user_id: str, item_id: str, tag_id: str) -> dict | None:
+    """Link only if both item and tag belong to user_id; None otherwise."""
+    response = await (
+        get_supabase()
+        .rpc("attach_item_tag", {"p_user_id": user_id, "p_item_id": item_id, "p_tag_id": tag_id})
+        .execute()
+    )
+    return response.data[0] if response.data else None
+
+
+async def detach_owned(user_id: str, item_id: str, tag_id: str) -> bool:
+    """Unlink only if the item belongs to user_id; False if nothing was removed."""
+    response = await (
+        get_supabase()
+        .rpc("detach_item_tag", {"p_user_id": user_id, "p_item_id": item_id, "p_tag_id": tag_id})
+        .execute()
+    )
+    return bool(response.data)
+
+
+async def bulk_apply(
+    user_id: str,
+    item_ids: list[str],
+    *,
+    add_tag_ids: list[str],
+    add_tag_names: list[str],
+    remove_tag_ids: list[str],
+    remove_tag_names: list[str],
+) -> dict:
+    """
+    Add and remove tags across items in one transaction (bulk_item_tags RPC): one
+    ownership query, missing tags created, one upsert and one delete. Writes nothing
+    and returns missing_*/forbidden_* id lists when any referenced row is not owned.
+    """
+    response = await (
+        get_supabase()
+        .rpc(
+            "bulk_item_tags",
+            {
+                "p_user_id": user_id,
+                "p_item_ids": item_ids,
+                "p_add_tag_ids": add_tag_ids,
+                "p_add_tag_names": add_tag_names,
+                "p_remove_tag_ids": remove_tag_ids,
+                "p_remove_tag_names": remove_tag_names,
+            },
+        )
+        .execute()
+    )
+    return response.data or {}
@@ -0,0 +1,317 @@
+"""
+Items data access. All queries are scoped by user_id.
+"""
+
+import re
+from collections.abc import AsyncIterator
+
+from app.supabase_client import get_supabase
+
+ITEM_COLUMNS = (
+    "id", "user_id", "type", "title", "content", "url", "state", "why_this_matters",
+    "is_pinned", "is_archived", "created_at", "updated_at",
+)
+ITEM_WITH_TAGS = "*, item_tags(tag_id, tags(id, name))"
+# List rows without content/why_this_matters: content_excerpt is a computed column
+# (first 200 characters, migration 009) and tags come back as names only.
+ITEM_SUMMARY = (
+    "id, user_id, type, title, url, state, is_pinned, is_archived, created_at, updated_at, "
+    "content_excerpt, item_tags(tags(name))"
+)
+
+# Sort key per sort mode (all descending); id breaks ties so keyset pages are stable.
+KEYSET_COLUMNS: dict[str, tuple[str, ...]] = {
+    "smart": ("is_pinned", "created_at", "id"),
+    "created_desc": ("created_at", "id"),
+    "updated_desc": ("updated_at", "id"),
+}
+
+
+def _order(query, sort: str):
+    for column in KEYSET_COLUMNS.get(sort, KEYSET_COLUMNS["smart"]):
+        query = query.order(column, desc=True)
+    return query
+
+
+def ilike_term(q: str) -> str:
+    """Substring term for ilike filters: LIKE wildcards and PostgREST syntax removed."""
+    return re.sub(r"[%_\\(),.]", "", q).strip()
+
+
+def _page_after(
+    user_id: str,
+    sort: str,
+    after: list,
+    limit: int,
+    *,
+    filters: dict | None = None,
+    q: str | None = None,
+    item_ids: list[str] | None = None,
+    tag_names: list[str] | None = None,
+    match_all: bool = False,
+):
+    """
+    items_page RPC (migration 013): up to `limit` rows strictly after the keyset
+    position `after`, compared as one row value so the database seeks the sort index.
+    Filters go in as parameters: they must apply before the limit, not on its result.
+    """
+    pinned, at, item_id = after if sort == "smart" else (None, *after)
+    filters = filters or {}
+    params = {
+        "p_user_id": user_id,
+        "p_sort": sort,
+        "p_after_pinned": pinned,
+        "p_after_at": at,
+        "p_after_id": item_id,
+        "p_limit": limit,
+        "p_type": filters.get("type"),
+        "p_state": filters.get("state"),
+        "p_is_pinned": filters.get("is_pinned"),
+        "p_is_archived": filters.get("is_archived"),
+        "p_q": (ilike_term(q) or None) if q else None,
+        "p_tag_names": tag_names,
+        "p_match_all": match_all,
+        "p_ids": item_ids,
+    }
+    return get_supabase().rpc("items_page", params)
+
+
+async def get_owner(item_id: str) -> str | None:
+    """Return the item's user_id, or None if the item does not exist."""
+    row = await get_supabase().table("items").select("id, user_id").eq("id", item_id).execute()
+    return row.data[0]["user_id"] if row.data else None
+
+
+async def list_items(
+    user_id: str,
+    *,
+    filters: dict,
+    q: str | None = None,
+    item_ids: list[str] | None = None,
+    tag_names: list[str] | None = None,
+    match_all: bool = False,
+    sort: str = "smart",
+    limit: int = 50,
+    offset: int = 0,
+    after: list | None = None,
+    select: str = ITEM_WITH_TAGS,
+) -> list[dict]:
+    """
+    List items with equality filters, optional substring search, id restriction and tag filter.
+    Tag names are resolved, joined and intersected in the database (items_with_tags RPC),
+    so the filter costs no extra round trips however many items carry the tag.
+    `after` is a keyset position (values of KEYSET_COLUMNS[sort]): the page starts right
+    after that row (items_page RPC), so every page costs the same index seek regardless
+    of depth. `offset` is ignored then.
+    `select` is the PostgREST projection (ITEM_WITH_TAGS, ITEM_SUMMARY or sparse fields).
+    """
+    if after is not None:
+        query = _page_after(
+            user_id, sort, after, limit,
+            filters=filters, q=q, item_ids=item_ids, tag_names=tag_names, match_all=match_all,
+        ).select(select)
+        response = await _order(query, sort).execute()
+        return response.data or []
+
+    sb = get_supabase()
+    if tag_names:
+        source = sb.rpc(
+            "items_with_tags",
+            {"p_user_id": user_id, "p_tag_names": tag_names, "p_match_all": match_all},
+        )
+    else:
+        source = sb.table("items")
+    query = source.select(select).eq("user_id", user_id)
+    for column, value in filters.items():
+        query = query.eq(column, value)
+
+    if q:
+        safe_q = ilike_term(q)
+        if safe_q:
+            query = query.or_(f"title.ilike.%{safe_q}%,content.ilike.%{safe_q}%")
+
+    if item_ids is not None:
+        query = query.in_("id", item_ids)
+
+    response = await _order(query, sort).range(offset, offset + limit - 1).execute()
+    return response.data or []
+
+
+async def iter_search_documents(user_id: str, page_size: int = 1000) -> AsyncIterator[dict]:
+    """Yield every item's id, title and content, paged by id (keyset)."""
+    last_id: str | None = None
+    while True:
+        query = (
+            get_supabase()
+            .table("items")
+            .select("id, title, content")
+            .eq("user_id", user_id)
+        )
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        response = await query.order("id").limit(page_size).execute()
+        rows = response.data or []
+        for row in rows:
+            yield row
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]["id"]
+
+
+async def iter_export_pages(user_id: str, page_size: int = 500) -> AsyncIterator[list[dict]]:
+    """Yield all of a user's items (with tags), newest first, one keyset page at a time."""
+    columns = KEYSET_COLUMNS["created_desc"]
+    after: list | None = None
+    while True:
+        if after is None:
+            query = get_supabase().table("items").select(ITEM_WITH_TAGS).eq("user_id", user_id).limit(page_size)
+        else:
+            query = _page_after(user_id, "created_desc", after, page_size).select(ITEM_WITH_TAGS)
+        response = await _order(query, "created_desc").execute()
+        rows = response.data or []
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        after = [rows[-1][c] for c in columns]
+
+
+async def get(item_id: str, user_id: str) -> dict | None:
+    """User-scoped fetch; None when the item is missing or not owned."""
+    response = await (
+        get_supabase()
+        .table("items")
+        .select(ITEM_WITH_TAGS)
+        .eq("id", item_id)
+        .eq("user_id", user_id)
+        .execute()
+    )
+    return response.data[0] if response.data else None
+
+
+async def insert(row: dict) -> dict | None:
+    response = await get_supabase().table("items").insert(row).execute()
+    return response.data[0] if response.data else None
+
+
+async def insert_many(user_id: str, rows: list[dict]) -> int:
+    """
+    Insert a batch for user_id in one statement (import_items RPC; all rows or none).
+    Rows carry their own ids and rows whose id already exists are skipped, so retrying
+    a chunk is safe. Returns how many of the rows are stored afterwards, including
+    ones an earlier attempt at the same chunk inserted.
+    """
+    response = await get_supabase().rpc("import_items", {"p_user_id": user_id, "p_items": rows}).execute()
+    return response.data or 0
+
+
+async def update(item_id: str, user_id: str, updates: dict) -> dict | None:
+    """User-scoped update; None when the item is missing or not owned."""
+    response = await (
+        get_supabase().table("items").update(updates).eq("id", item_id).eq("user_id", user_id).execute()
+    )
+    return response.data[0] if response.data else None
+
+
+async def delete(item_id: str, user_id: str) -> bool:
+    """User-scoped delete; False when the item is missing or not owned."""
+    response = await (
+        get_supabase().table("items").delete().eq("id", item_id).eq("user_id", user_id).execute()
+    )
+    return bool(response.data)
+
+
+async def bulk_update(ids: list[str], user_id: str, updates: dict) -> list[dict]:
+    response = await (
+        get_supabase().table("items").update(updates).in_("id", ids).eq("user_id", user_id).execute()
+    )
+    return response.data or []
+
+
+async def bulk_delete(ids: list[str], user_id: str) -> list[dict]:
+    response = await (
+        get_supabase().table("items").delete().in_("id", ids).eq("user_id", user_id).execute()
+    )
+    return response.data or []
+
+
+async def bulk_apply_matching(
+    user_id: str,
+    match: dict,
+    *,
+    updates: dict | None = None,
+    delete: bool = False,
+    dry_run: bool = False,
+) -> int:
+    """
+    Delete or update (state / is_pinned / is_archived) every item matching `match`
+    in one statement (bulk_items_matching RPC). `match` keys are the items_matching
+    parameters without the p_ prefix; q must already be passed through ilike_term.
+    Only rows that change are updated; dry_run counts them without writing.
+    Returns the number of rows affected.
+    """
+    updates = updates or {}
+    params = {
+        "p_user_id": user_id,
+        "p_delete": delete,
+        "p_set_state": updates.get("state"),
+        "p_set_is_pinned": updates.get("is_pinned"),
+        "p_set_is_archived": updates.get("is_archived"),
+        "p_dry_run": dry_run,
+        **{f"p_{key}": value for key, value in match.items()},
+    }
+    response = await get_supabase().rpc("bulk_items_matching", params).execute()
+    return response.data or 0
+
+
+async def search(
+    user_id: str,
+    query: str,
+    *,
+    filters: dict,
+    tag_names: list[str] | None = None,
+    match_all: bool = False,
+    limit: int = 50,
+    offset: int = 0,
+    select: str = ITEM_WITH_TAGS,
+) -> list[dict]:
+    """
+    Ranked full-text search (search_items RPC, websearch syntax) with the same filters
+    as list_items. Returns rows (projected by `select`, which must include id) in
+    relevance order, each with search_rank, title_highlight and content_highlight added.
+    """
+    sb = get_supabase()
+    params = {
+        "p_user_id": user_id,
+        "p_query": query,
+        "p_type": filters.get("type"),
+        "p_state": filters.get("state"),
+        "p_is_pinned": filters.get("is_pinned"),
+        "p_is_archived": filters.get("is_archived"),
+        "p_tag_names": tag_names,
+        "p_match_all": match_all,
+        "p_limit": limit,
+        "p_offset": offset,
+    }
+    hits = (await sb.rpc("search_items", params).execute()).data or []
+    if not hits:
+        return []
+
+    response = await (
+        sb.table("items")
+        .select(select)
+        .eq("user_id", user_id)
+        .in_("id", [h["id"] for h in hits])
+        .execute()
+    )
+    rows_by_id = {row["id"]: row for row in (response.data or [])}
+    results = []
+    for hit in hits:
+        row = rows_by_id.get(hit["id"])
+        if row is None:
+            continue  # deleted between the two calls
+        row["search_rank"] = hit["rank"]
+        row["title_highlight"] = hit["title_highlight"]
+        row["content_highlight"] = hit["content_highlight"]
+        results.append(row)
+    return results
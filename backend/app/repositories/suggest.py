@@ -0,0 +1,15 @@
+"""
+Typeahead data access (suggest RPC: title and tag-name prefix match in one call).
+"""
+
+from app.supabase_client import get_supabase
+
+
+async def by_prefix(user_id: str, prefix: str, limit: int) -> list[dict]:
+    """Rows of {kind: item|tag, id, label, item_type, is_pinned}, items and tags ranked pinned then recent."""
+    response = await (
+        get_supabase()
+        .rpc("suggest", {"p_user_id": user_id, "p_prefix": prefix, "p_limit": limit})
+        .execute()
+    )
+    return response.data or []
@@ -0,0 +1,69 @@
+"""
+Tags data access. All queries are scoped by user_id.
+"""
+
+from app.supabase_client import get_supabase
+
+
+async def get_owner(tag_id: str) -> str | None:
+    """Return the tag's user_id, or None if the tag does not exist."""
+    row = await get_supabase().table("tags").select("id, user_id").eq("id", tag_id).execute()
+    return row.data[0]["user_id"] if row.data else None
+
+
+async def list_with_counts(user_id: str) -> list[dict]:
+    """Tags with item_count, kept current by triggers on item_tags (migration 008)."""
+    response = await (
+        get_supabase()
+        .table("tags")
+        .select("id, name, user_id, created_at, item_count")
+        .eq("user_id", user_id)
+        .order("name")
+        .execute()
+    )
+    return response.data or []
+
+
+async def list_names(user_id: str) -> list[dict]:
+    """All {id, name} pairs for a user."""
+    response = await get_supabase().table("tags").select("id, name").eq("user_id", user_id).execute()
+    return response.data or []
+
+
+async def create(user_id: str, name: str) -> dict | None:
+    response = await get_supabase().table("tags").insert({"user_id": user_id, "name": name}).execute()
+    return response.data[0] if response.data else None
+
+
+async def upsert_many(user_id: str, names: list[str]) -> list[dict]:
+    """Create any missing tags in one statement; returns {id, name, ...} for every name."""
+    if not names:
+        return []
+    response = await (
+        get_supabase()
+        .table("tags")
+        .upsert([{"user_id": user_id, "name": n} for n in names], on_conflict="user_id,name")
+        .execute()
+    )
+    return response.data or []
+
+
+async def rename(tag_id: str, user_id: str, name: str) -> dict | None:
+    """User-scoped rename; None when the tag is missing or not owned."""
+    response = await (
+        get_supabase()
+        .table("tags")
+        .update({"name": name})
+        .eq("id", tag_id)
+        .eq("user_id", user_id)
+        .execute()
+    )
+    return response.data[0] if response.data else None
+
+
+async def delete(tag_id: str, user_id: str) -> bool:
+    """User-scoped delete; False when the tag is missing or not owned."""
+    response = await (
+        get_supabase().table("tags").delete().eq("id", tag_id).eq("user_id", user_id).execute()
+    )
+    return bool(response.data)
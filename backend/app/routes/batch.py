@@ -0,0 +1,219 @@
+"""
+Batch endpoint — several API calls in one HTTP request.
+
+Each operation is dispatched in-process to the existing routers with the caller's
+token, which is verified once for the whole batch. Operations run concurrently
+unless they depend on an earlier one, either through depends_on or by referencing
+its response as ${op_id.field} in the path or in a string body value, e.g.
+create an item, then attach tags to ${new.id}. Each result carries its own status
+and body; errors use the same {detail, code?, request_id?} shape as the API.
+
+Each operation counts as one request for rate limiting: the batch takes one token
+per operation from the caller's ip and user buckets, and is rejected with 429
+before any operation runs when either bucket lacks them. Operations are recorded
+in the request metrics under their own route template.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from typing import Any, Literal
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from pydantic import BaseModel, Field
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+from app import encoding, metrics
+from app.auth import CurrentUser, get_current_user
+from app.errors import code_for_status, detail_message, error_body
+
+router = APIRouter()
+logger = logging.getLogger("buddhira")
+
+MAX_BATCH_OPERATIONS = 20
+MAX_BATCH_CONCURRENCY = 8
+# Streaming and recursive endpoints are not available inside a batch
+EXCLUDED_PATHS = ("/api/batch", "/api/items/export")
+REFERENCE = re.compile(r"\$\{([A-Za-z0-9_-]+)\.([A-Za-z0-9_.]+)\}")
+
+BatchMethod = Literal["GET", "POST", "PATCH", "DELETE"]
+
+
+class BatchOperation(BaseModel):
+    id: str | None = Field(None, min_length=1, max_length=64, pattern=r"^[A-Za-z0-9_-]+$")
+    method: BatchMethod = "GET"
+    path: str = Field(..., min_length=5, max_length=2048, pattern=r"^/api/")
+    body: Any = None
+    depends_on: list[str] = Field(default_factory=list)
+
+
+class BatchRequest(BaseModel):
+    operations: list[BatchOperation] = Field(..., min_length=1, max_length=MAX_BATCH_OPERATIONS)
+
+
+class _UnresolvedReference(Exception):
+    pass
+
+
+def _error(status_code: int, detail: str, code: str | None, request_id: str | None) -> dict:
+    return {"status": status_code, "body": error_body(detail, code, request_id)}
+
+
+def _references(op: BatchOperation) -> set[str]:
+    text = op.path + (orjson.dumps(op.body).decode() if op.body is not None else "")
+    return {m.group(1) for m in REFERENCE.finditer(text)}
+
+
+def _lookup(results: dict[str, dict], op_id: str, field: str) -> str:
+    value: Any = results[op_id]["body"]
+    for part in field.split("."):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            raise _UnresolvedReference(f"${{{op_id}.{field}}} not found in the response of {op_id}")
+    if isinstance(value, (dict, list)) or value is None:
+        raise _UnresolvedReference(f"${{{op_id}.{field}}} is not a scalar value")
+    return value if isinstance(value, str) else orjson.dumps(value).decode()
+
+
+def _resolve(value: Any, results: dict[str, dict]) -> Any:
+    if isinstance(value, str):
+        return REFERENCE.sub(lambda m: _lookup(results, m.group(1), m.group(2)), value)
+    if isinstance(value, list):
+        return [_resolve(v, results) for v in value]
+    if isinstance(value, dict):
+        return {k: _resolve(v, results) for k, v in value.items()}
+    return value
+
+
+async def _dispatch(request: Request, method: str, path: str, body: Any) -> dict:
+    """Run one operation through the app's router and collect its response."""
+    parent = request.scope
+    path, _, query = path.partition("?")
+    payload = orjson.dumps(body) if body is not None else b""
+    headers = [
+        (k, v) for k, v in parent["headers"]
+        if k not in (b"content-length", b"content-type", b"accept", b"accept-encoding", b"if-none-match")
+    ]
+    headers += [(b"content-length", str(len(payload)).encode()), (b"accept", b"application/json")]
+    if payload:
+        headers.append((b"content-type", b"application/json"))
+    scope = {
+        **{k: v for k, v in parent.items() if k not in ("route", "endpoint", "path_params", "router")},
+        "method": method,
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": headers,
+        "state": dict(parent.get("state", {})),  # request_id, bearer_token and the verified user
+    }
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    response: dict = {"status": 500, "headers": [], "body": b""}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = message.get("headers", [])
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    request_id = scope["state"].get("request_id")
+    encoding.negotiate("application/json")  # this operation's task only; the batch parses JSON
+    start = time.perf_counter()
+    metrics.request_started()
+    try:
+        await request.app.router(scope, receive, send)
+    except StarletteHTTPException as exc:  # unknown path or method
+        response["status"] = exc.status_code
+        return _error(exc.status_code, detail_message(exc), code_for_status(exc.status_code, exc), request_id)
+    except Exception:
+        logger.exception("Unhandled exception in batch operation %s %s", method, path)
+        response["status"] = status.HTTP_500_INTERNAL_SERVER_ERROR
+        return _error(status.HTTP_500_INTERNAL_SERVER_ERROR, "An error occurred", "internal_error", request_id)
+    finally:
+        metrics.request_finished(
+            method, getattr(scope.get("route"), "path", "unmatched"), response["status"], time.perf_counter() - start
+        )
+
+    content_type = next((v for k, v in response["headers"] if k == b"content-type"), b"")
+    data = response["body"]
+    if data and content_type.startswith(b"application/json"):
+        return {"status": response["status"], "body": orjson.loads(data)}
+    return {"status": response["status"], "body": data.decode("utf-8", "replace") if data else None}
+
+
+@router.post("")
+async def run_batch(
+    request: Request,
+    body: BatchRequest,
+    user: CurrentUser = Depends(get_current_user),
+):
+    ops = body.operations
+    op_ids = [op.id or str(i) for i, op in enumerate(ops)]
+    if len(set(op_ids)) != len(op_ids):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Operation ids must be unique")
+
+    dependencies: list[set[str]] = []
+    for i, op in enumerate(ops):
+        if op.path.split("?")[0].rstrip("/").startswith(EXCLUDED_PATHS):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{op.path} is not available in a batch",
+            )
+        deps = set(op.depends_on) | _references(op)
+        unknown = deps - set(op_ids[:i])
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Operation {op_ids[i]} can only depend on earlier operations: {', '.join(sorted(unknown))}",
+            )
+        dependencies.append(deps)
+
+    limiter = getattr(request.state, "rate_limiter", None)
+    if limiter is not None and len(ops) > 1:
+        await limiter.charge(request.scope["state"], len(ops) - 1)  # the batch request took the first
+
+    request_id = getattr(request.state, "request_id", None)
+    results: dict[str, dict] = {}
+    done = {op_id: asyncio.Event() for op_id in op_ids}
+    limit = asyncio.Semaphore(MAX_BATCH_CONCURRENCY)
+
+    async def run(i: int) -> None:
+        op, op_id = ops[i], op_ids[i]
+        try:
+            for dep in dependencies[i]:
+                await done[dep].wait()
+            failed = sorted(d for d in dependencies[i] if results[d]["status"] >= 400)
+            if failed:
+                results[op_id] = _error(
+                    status.HTTP_424_FAILED_DEPENDENCY,
+                    f"Dependency failed: {', '.join(failed)}",
+                    "failed_dependency",
+                    request_id,
+                )
+                return
+            try:
+                path = _resolve(op.path, results)
+                op_body = _resolve(op.body, results)
+            except _UnresolvedReference as exc:
+                results[op_id] = _error(status.HTTP_400_BAD_REQUEST, str(exc), "invalid_reference", request_id)
+                return
+            async with limit:
+                results[op_id] = await _dispatch(request, op.method, path, op_body)
+        finally:
+            done[op_id].set()
+
+    await asyncio.gather(*(run(i) for i in range(len(ops))))
+    return {"results": [{"id": op_id, **results[op_id]} for op_id in op_ids]}
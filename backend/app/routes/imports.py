@@ -0,0 +1,83 @@
+"""
+Background imports — upload NDJSON (one ImportItem per line), poll the job.
+
+For imports too large for POST /api/items/import: the body is streamed to disk and
+processed in chunks by the import worker pool, so the request returns immediately.
+"""
+
+import uuid
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+
+from app import import_jobs
+from app.auth import CurrentUser, get_current_user
+from app.config import settings
+from app.repositories import import_jobs as import_jobs_repo
+
+router = APIRouter()
+
+
+def _parse_ts(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _job_view(job: dict) -> dict:
+    started = _parse_ts(job.get("started_at"))
+    finished = _parse_ts(job.get("finished_at"))
+    processed = job.get("committed_rows") or 0
+    rows_per_second = None
+    if started is not None:
+        elapsed = ((finished or datetime.now(timezone.utc)) - started).total_seconds()
+        rows_per_second = round(processed / elapsed, 1) if elapsed > 0 else None
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "total_rows": job.get("total_rows") or 0,
+        "processed_rows": processed,
+        "imported_count": job.get("imported_count") or 0,
+        "attached_tag_links": job.get("attached_tag_links") or 0,
+        "error_count": job.get("error_count") or 0,
+        "errors": job.get("errors") or [],
+        "failure": job.get("failure"),
+        "rows_per_second": rows_per_second,
+        "created_at": job.get("created_at"),
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at"),
+    }
+
+
+@router.post("", status_code=status.HTTP_202_ACCEPTED)
+async def create_import(request: Request, user: CurrentUser = Depends(get_current_user)):
+    """Spool the NDJSON body and queue it; poll GET /api/imports/{id} for progress."""
+    job_id = str(uuid.uuid4())
+    try:
+        total_rows = await import_jobs.spool_upload(job_id, request.stream())
+    except import_jobs.UploadTooLarge:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Import too large (max {settings.import_max_bytes} bytes)",
+        )
+    if total_rows == 0:
+        import_jobs.discard(job_id)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Import is empty")
+    try:
+        job = await import_jobs.submit(job_id, user.id, total_rows)
+    except RuntimeError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Background imports are not available",
+        )
+    return _job_view(job)
+
+
+@router.get("/{job_id}")
+async def get_import(job_id: str, user: CurrentUser = Depends(get_current_user)):
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import job not found")
+    job = await import_jobs_repo.get(job_id, user.id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import job not found")
+    return _job_view(job)
@@ -3,23 +3,35 @@ Item ↔ Tag associations.
 
 Attach and detach tags from items. Both the item and tag must belong
 to the authenticated user. Returns 403 when resource exists but belongs to another user.
+
+Ownership is enforced inside the main statement; the 404 vs 403 lookup only runs
+on the miss path, so the happy path is a single round trip.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from pydantic import BaseModel
 
+from app import read_cache
 from app.auth import CurrentUser, get_current_user
-from app.supabase_client import get_supabase
+from app.conditional import render, respond
+from app.repositories import item_tags as item_tags_repo
+from app.repositories import items as items_repo
+from app.repositories import tags as tags_repo
 
 router = APIRouter()
 
 
-def _ensure_resource_owned(sb, table: str, resource_id: str, user_id: str, name: str) -> None:
-    """Raise 404 if resource does not exist, 403 if it belongs to another user."""
-    row = sb.table(table).select("id, user_id").eq("id", resource_id).execute()
-    if not row.data or len(row.data) == 0:
+_OWNER_LOOKUPS = {"items": items_repo.get_owner, "tags": tags_repo.get_owner}
+
+
+async def _ensure_resource_owned(table: str, resource_id: str, user_id: str, name: str) -> None:
+    """Raise 404 if resource does not exist, 403 if it belongs to another user. Miss path only."""
+    owner = await _OWNER_LOOKUPS[table](resource_id)
+    if owner is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"{name} not found")
-    if row.data[0]["user_id"] != user_id:
+    if owner != user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=f"You do not have access to this {name.lower()}",
@@ -33,17 +45,12 @@ class ItemTagBody(BaseModel):
 # ── List tags for an item ──────────────────────────────────────────────────
 
 @router.get("/{item_id}/tags")
-async def list_item_tags(item_id: str, user: CurrentUser = Depends(get_current_user)):
-    sb = get_supabase()
-    _ensure_resource_owned(sb, "items", item_id, user.id, "Item")
-
-    response = (
-        sb.table("item_tags")
-        .select("tag_id, tags(id, name)")
-        .eq("item_id", item_id)
-        .execute()
-    )
-    return response.data
+async def list_item_tags(item_id: str, request: Request, user: CurrentUser = Depends(get_current_user)):
+    tags = await item_tags_repo.list_for_item(item_id, user.id)
+    if tags is None:
+        await _ensure_resource_owned("items", item_id, user.id, "Item")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
+    return respond(request, render(tags))
 
 
 # ── Attach tag to item ─────────────────────────────────────────────────────
@@ -54,16 +61,16 @@ async def add_tag_to_item(
     body: ItemTagBody,
     user: CurrentUser = Depends(get_current_user),
 ):
-    sb = get_supabase()
-    _ensure_resource_owned(sb, "items", item_id, user.id, "Item")
-    _ensure_resource_owned(sb, "tags", body.tag_id, user.id, "Tag")
-
-    response = (
-        sb.table("item_tags")
-        .upsert({"item_id": item_id, "tag_id": body.tag_id})
-        .execute()
-    )
-    return response.data[0] if response.data else {"item_id": item_id, "tag_id": body.tag_id}
+    link = await item_tags_repo.attach_owned(user.id, item_id, body.tag_id)
+    read_cache.bump(user.id)
+    if link is None:
+        # Independent lookups: run both ownership checks concurrently
+        await asyncio.gather(
+            _ensure_resource_owned("items", item_id, user.id, "Item"),
+            _ensure_resource_owned("tags", body.tag_id, user.id, "Tag"),
+        )
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
+    return link
 
 
 # ── Detach tag from item ───────────────────────────────────────────────────
@@ -74,15 +81,8 @@ async def remove_tag_from_item(
     tag_id: str,
     user: CurrentUser = Depends(get_current_user),
 ):
-    sb = get_supabase()
-    _ensure_resource_owned(sb, "items", item_id, user.id, "Item")
-
-    response = (
-        sb.table("item_tags")
-        .delete()
-        .eq("item_id", item_id)
-        .eq("tag_id", tag_id)
-        .execute()
-    )
-    if not response.data:
+    detached = await item_tags_repo.detach_owned(user.id, item_id, tag_id)
+    read_cache.bump(user.id)
+    if not detached:
+        await _ensure_resource_owned("items", item_id, user.id, "Item")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tag not attached to item")
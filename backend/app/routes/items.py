@@ -4,29 +4,63 @@ Items CRUD — notes, links, and snippets.
 All queries use the service-role client and filter by user_id.
 """
 
-import re
+import base64
+import binascii
+import json
+import logging
+import uuid
+import zlib
+from collections.abc import AsyncIterator
 from datetime import datetime, timezone
-from typing import Literal
+from typing import Annotated, Literal, NoReturn
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
+from app import read_cache, search_index
 from app.auth import CurrentUser, get_current_user
-from app.supabase_client import get_supabase
+from app.conditional import render, respond
+from app.items_service import (
+    MAX_CONTENT,
+    MAX_TITLE,
+    MAX_URL,
+    MAX_WHY,
+    ImportItem,
+    ItemState,
+    ItemType,
+    enforce_archive_rules,
+    import_batch,
+    normalized_tag,
+)
+from app.repositories import item_tags as item_tags_repo
+from app.repositories import items as items_repo
+from app.routes.tags import MAX_TAG_NAME
 
 router = APIRouter()
+logger = logging.getLogger("buddhira")
 
-ItemType = Literal["note", "link", "snippet"]
-ItemState = Literal["inbox", "active", "archive"]
 SortMode = Literal["smart", "created_desc", "updated_desc"]
+PaginationMode = Literal["offset", "cursor"]
+ExportFormat = Literal["json", "ndjson"]
+TagMatch = Literal["any", "all"]
 BulkAction = Literal["archive", "unarchive", "pin", "unpin", "activate", "inbox", "delete"]
+ItemView = Literal["summary", "full"]
 
-MAX_TITLE = 500
-MAX_CONTENT = 50_000
-MAX_URL = 2_048
-MAX_WHY = 1_000
 MAX_IMPORT_ITEMS = 1000
 MAX_BULK_IDS = 200
+MAX_BULK_TAGS = 50
+BULK_UPDATES: dict[str, dict[str, object]] = {
+    "archive": {"is_archived": True},
+    "unarchive": {"is_archived": False},
+    "pin": {"is_pinned": True},
+    "unpin": {"is_pinned": False},
+    "activate": {"state": "active"},
+    "inbox": {"state": "inbox"},
+}
+# Accepted by list_items fields=: item columns, the excerpt, flattened tag names, full tag embed
+LIST_FIELDS = (*items_repo.ITEM_COLUMNS, "content_excerpt", "tag_names", "item_tags")
 
 
 class ItemCreate(BaseModel):
@@ -54,270 +88,474 @@ class BulkItemsBody(BaseModel):
     action: BulkAction
 
 
-class ImportItem(BaseModel):
-    type: ItemType
-    title: str | None = Field(None, max_length=MAX_TITLE)
-    content: str | None = Field(None, max_length=MAX_CONTENT)
-    url: str | None = Field(None, max_length=MAX_URL)
-    state: ItemState = "inbox"
-    why_this_matters: str | None = Field(None, max_length=MAX_WHY)
-    is_pinned: bool = False
-    is_archived: bool = False
-    tags: list[str] = Field(default_factory=list)
+class BulkFilter(BaseModel):
+    """The list_items filters, plus created/updated ranges (after inclusive, before exclusive)."""
 
+    type: ItemType | None = None
+    state: ItemState | None = None
+    tag: list[str] | None = Field(None, max_length=MAX_BULK_TAGS)
+    match: TagMatch = "any"
+    is_pinned: bool | None = None
+    is_archived: bool | None = None
+    q: str | None = Field(None, max_length=MAX_TITLE)
+    created_after: datetime | None = None
+    created_before: datetime | None = None
+    updated_after: datetime | None = None
+    updated_before: datetime | None = None
 
-class ImportPayload(BaseModel):
-    version: int | None = 1
-    items: list[ImportItem] = Field(default_factory=list)
+
+class BulkFilterBody(BaseModel):
+    action: BulkAction
+    filter: BulkFilter
+    dry_run: bool = False
 
 
-def enforce_archive_rules(data: dict) -> dict:
-    """Keep state and is_archived in sync."""
-    is_archived = data.get("is_archived")
-    state = data.get("state")
+TagName = Annotated[str, Field(min_length=1, max_length=MAX_TAG_NAME)]
 
-    if is_archived is True:
-        data["state"] = "archive"
-    elif state == "archive":
-        data["is_archived"] = True
-    elif state is not None and state != "archive":
-        data["is_archived"] = False
 
-    return data
+class BulkTagsBody(BaseModel):
+    ids: list[str] = Field(..., min_length=1, max_length=MAX_BULK_IDS)
+    add_tag_ids: list[str] = Field(default_factory=list, max_length=MAX_BULK_TAGS)
+    add_tag_names: list[TagName] = Field(default_factory=list, max_length=MAX_BULK_TAGS)
+    remove_tag_ids: list[str] = Field(default_factory=list, max_length=MAX_BULK_TAGS)
+    remove_tag_names: list[TagName] = Field(default_factory=list, max_length=MAX_BULK_TAGS)
 
 
-def _ensure_item_owned(sb, item_id: str, user_id: str) -> None:
-    """Raise 404 if item does not exist, 403 if it belongs to another user."""
-    row = sb.table("items").select("id, user_id").eq("id", item_id).execute()
-    if not row.data or len(row.data) == 0:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
-    if row.data[0]["user_id"] != user_id:
+class ImportPayload(BaseModel):
+    version: int | None = 1
+    items: list[ImportItem] = Field(default_factory=list)
+
+
+async def _raise_item_miss(item_id: str, user_id: str) -> NoReturn:
+    """
+    Miss path after a user-scoped statement touched no row.
+    Raise 403 if the item belongs to another user, otherwise 404.
+    """
+    owner = await items_repo.get_owner(item_id)
+    if owner is not None and owner != user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You do not have access to this item",
         )
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
+
+
+def _encode_cursor(sort: SortMode, row: dict) -> str:
+    """Opaque cursor: the last row's sort key, bound to the sort mode."""
+    values = [row.get(c) for c in items_repo.KEYSET_COLUMNS[sort]]
+    raw = json.dumps({"sort": sort, "after": values}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _cursor_value(column: str, value):
+    """Validate one keyset value against its column and return it in canonical form."""
+    if column == "is_pinned":
+        if not isinstance(value, bool):
+            raise ValueError(column)
+        return value
+    if not isinstance(value, str):
+        raise ValueError(column)
+    if column == "id":
+        return str(uuid.UUID(value))
+    return datetime.fromisoformat(value).isoformat()  # created_at / updated_at
+
+
+def _decode_cursor(cursor: str, sort: SortMode) -> list:
+    """Return keyset values from a cursor; 400 if malformed or issued for another sort."""
+    columns = items_repo.KEYSET_COLUMNS[sort]
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        values = data["after"]
+        if data.get("sort") != sort or not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("cursor")
+        return [_cursor_value(c, v) for c, v in zip(columns, values)]
+    except (binascii.Error, ValueError, TypeError, KeyError, AttributeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor") from None
+
+
+def _list_projection(view: ItemView, fields: list[str] | None, sort: SortMode) -> tuple[str, bool]:
+    """
+    PostgREST select for list_items, and whether to flatten item_tags into tag_names.
+    Sparse fields always include id and the sort key, so cursors keep working.
+    """
+    if fields is None:
+        if view == "full":
+            return items_repo.ITEM_WITH_TAGS, False
+        return items_repo.ITEM_SUMMARY, True
+    columns = [f for f in fields if f not in ("tag_names", "item_tags")]
+    for column in ("id", *items_repo.KEYSET_COLUMNS[sort]):
+        if column not in columns:
+            columns.append(column)
+    if "item_tags" in fields:
+        columns.append("item_tags(tag_id, tags(id, name))")
+    elif "tag_names" in fields:
+        columns.append("item_tags(tags(name))")
+    return ", ".join(columns), "tag_names" in fields
+
+
+def _parse_fields(fields: str | None) -> list[str] | None:
+    if fields is None:
+        return None
+    names = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in names if f not in LIST_FIELDS]
+    if unknown or not names:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}" if unknown else "fields must not be empty",
+        )
+    return names
 
 
-def _normalized_tag(name: str) -> str:
-    return name.strip().lower()
-
-
-def _order_items_query(query, sort: SortMode):
-    if sort == "created_desc":
-        return query.order("created_at", desc=True)
-    if sort == "updated_desc":
-        return query.order("updated_at", desc=True)
-    # default: smart ordering for inbox UX
-    return query.order("is_pinned", desc=True).order("created_at", desc=True)
+def _with_tag_names(rows: list[dict], keep_item_tags: bool) -> list[dict]:
+    for row in rows:
+        links = row.get("item_tags") if keep_item_tags else row.pop("item_tags", None)
+        row["tag_names"] = [link["tags"]["name"] for link in links or [] if link.get("tags")]
+    return rows
 
 
 @router.get("")
 async def list_items(
-    q: str | None = Query(None, description="Search title and content (case-insensitive)"),
+    request: Request,
+    q: str | None = Query(None, description="Substring match on title and content (case-insensitive)"),
+    search: str | None = Query(
+        None,
+        description='Ranked full-text search, websearch syntax ("phrase", -exclude, or); results add '
+        "search_rank and [[highlighted]] title_highlight/content_highlight",
+    ),
     type: ItemType | None = Query(None, description="Filter by item type"),
     state: ItemState | None = Query(None, description="Filter by state"),
-    tag: str | None = Query(None, description="Filter by tag name"),
+    tag: list[str] | None = Query(None, description="Filter by tag name (repeat for several tags)"),
+    match: TagMatch = Query("any", description="With several tags: any (OR) or all (AND)"),
     is_pinned: bool | None = Query(None, description="Filter pinned items"),
     is_archived: bool | None = Query(None, description="Filter archived items"),
     sort: SortMode = Query("smart", description="Sort mode"),
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
+    pagination: PaginationMode = Query(
+        "offset", description="offset returns a list; cursor returns {items, next_cursor}"
+    ),
+    cursor: str | None = Query(None, description="next_cursor from the previous page (implies cursor mode)"),
+    view: ItemView = Query(
+        "summary",
+        description="summary: content_excerpt and tag_names instead of content, why_this_matters and "
+        "item_tags; full: whole rows (GET /api/items/{id} is always full)",
+    ),
+    fields: str | None = Query(
+        None, description="Comma-separated fields to return (overrides view); id and sort keys always included"
+    ),
     user: CurrentUser = Depends(get_current_user),
 ):
-    sb = get_supabase()
-    query = sb.table("items").select("*, item_tags(tag_id, tags(id, name))").eq("user_id", user.id)
+    field_names = _parse_fields(fields)
+    select, flatten_tags = _list_projection(view, field_names, sort)
+    use_cursor = pagination == "cursor" or cursor is not None
+    after = _decode_cursor(cursor, sort) if cursor else None
+    search = search.strip() if search else None
+    if search and q:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Use either q or search, not both")
+    if search and use_cursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Search results are ranked; use offset pagination",
+        )
 
     # Default view: inbox non-archived unless filters are set.
-    has_any_filter = any(v is not None for v in [q, type, state, tag, is_pinned, is_archived])
+    has_any_filter = any(v is not None for v in [q, search, type, state, tag, is_pinned, is_archived])
+    filters: dict[str, object]
     if not has_any_filter:
-        query = query.eq("state", "inbox").eq("is_archived", False)
+        filters = {"state": "inbox", "is_archived": False}
     else:
-        if type is not None:
-            query = query.eq("type", type)
-        if state is not None:
-            query = query.eq("state", state)
-        if is_pinned is not None:
-            query = query.eq("is_pinned", is_pinned)
-        if is_archived is not None:
-            query = query.eq("is_archived", is_archived)
+        candidates = {"type": type, "state": state, "is_pinned": is_pinned, "is_archived": is_archived}
+        filters = {k: v for k, v in candidates.items() if v is not None}
+
+    tag_names = list(dict.fromkeys(t for t in (tag or []) if t)) or None
+
+    cache_key = (
+        "items", q, search, tuple(sorted(filters.items())), tuple(sorted(tag_names or ())),
+        match, sort, limit, offset, use_cursor, cursor, select, flatten_tags,
+    )
+    cached = read_cache.get(user.id, cache_key)
+    if cached is not None:
+        return respond(request, cached)
+    at_version = read_cache.version(user.id)
+
+    def finish(rows: list[dict], next_cursor: str | None = None) -> Response:
+        if flatten_tags:
+            _with_tag_names(rows, keep_item_tags=field_names is not None and "item_tags" in field_names)
+        value = {"items": rows, "next_cursor": next_cursor} if use_cursor else rows
+        rendered = render(value)
+        read_cache.put(user.id, cache_key, rendered, at_version)
+        return respond(request, rendered)
+
+    if search:
+        results = await items_repo.search(
+            user.id,
+            search,
+            filters=filters,
+            tag_names=tag_names,
+            match_all=match == "all",
+            limit=limit,
+            offset=offset,
+            select=select,
+        )
+        return finish(results)
 
+    # Optional in-process index narrows q to candidate ids; the database still applies q
+    item_ids: list[str] | None = None
     if q:
-        safe_q = re.sub(r"[%_\\(),.]", "", q).strip()
-        if safe_q:
-            query = query.or_(f"title.ilike.%{safe_q}%,content.ilike.%{safe_q}%")
-
-    if tag:
-        tag_row = sb.table("tags").select("id").eq("user_id", user.id).eq("name", tag).execute()
-        if not tag_row.data:
-            return []
-        tag_id = tag_row.data[0]["id"]
-        tagged_items = sb.table("item_tags").select("item_id").eq("tag_id", tag_id).execute()
-        item_ids = [r["item_id"] for r in (tagged_items.data or [])]
-        if not item_ids:
-            return []
-        query = query.in_("id", item_ids)
-
-    query = _order_items_query(query, sort).range(offset, offset + limit - 1)
-    response = query.execute()
-    return response.data
+        item_ids = await search_index.lookup(user.id, q)
+
+    rows: list[dict] = []
+    if item_ids is None or item_ids:
+        rows = await items_repo.list_items(
+            user.id,
+            filters=filters,
+            q=q,
+            item_ids=item_ids,
+            tag_names=tag_names,
+            match_all=match == "all",
+            sort=sort,
+            # One extra row tells us whether another page exists
+            limit=limit + 1 if use_cursor else limit,
+            offset=0 if use_cursor else offset,
+            after=after,
+            select=select,
+        )
+
+    if not use_cursor:
+        return finish(rows)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(sort, rows[-1])
+    return finish(rows, next_cursor)
+
+
+def _bulk_updates(action: BulkAction) -> dict[str, object]:
+    """Column updates for a non-delete bulk action, with archive rules applied."""
+    updates = BULK_UPDATES.get(action)
+    if updates is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported bulk action")
+    return enforce_archive_rules(dict(updates))
 
 
 @router.post("/bulk")
 async def bulk_update_items(body: BulkItemsBody, user: CurrentUser = Depends(get_current_user)):
-    sb = get_supabase()
     ids = list(dict.fromkeys(body.ids))  # dedupe while preserving order
 
     if body.action == "delete":
-        deleted = (
-            sb.table("items")
-            .delete()
-            .in_("id", ids)
-            .eq("user_id", user.id)
-            .execute()
-        )
-        return {"action": body.action, "count": len(deleted.data or []), "item_ids": ids}
-
-    updates: dict[str, object]
-    if body.action == "archive":
-        updates = {"is_archived": True}
-    elif body.action == "unarchive":
-        updates = {"is_archived": False}
-    elif body.action == "pin":
-        updates = {"is_pinned": True}
-    elif body.action == "unpin":
-        updates = {"is_pinned": False}
-    elif body.action == "activate":
-        updates = {"state": "active"}
-    elif body.action == "inbox":
-        updates = {"state": "inbox"}
-    else:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported bulk action")
+        deleted = await items_repo.bulk_delete(ids, user.id)
+        read_cache.bump(user.id)
+        search_index.on_delete(user.id, [r["id"] for r in deleted if "id" in r])
+        return {"action": body.action, "count": len(deleted), "item_ids": ids}
 
-    updates = enforce_archive_rules(updates)
-    response = (
-        sb.table("items")
-        .update(updates)
-        .in_("id", ids)
-        .eq("user_id", user.id)
-        .execute()
-    )
+    updated = await items_repo.bulk_update(ids, user.id, _bulk_updates(body.action))
+    read_cache.bump(user.id)
     return {
         "action": body.action,
-        "count": len(response.data or []),
-        "item_ids": [r["id"] for r in (response.data or []) if "id" in r],
+        "count": len(updated),
+        "item_ids": [r["id"] for r in updated if "id" in r],
     }
 
 
-@router.get("/export")
-async def export_items(user: CurrentUser = Depends(get_current_user)):
-    sb = get_supabase()
-    response = (
-        sb.table("items")
-        .select("*, item_tags(tag_id, tags(id, name))")
-        .eq("user_id", user.id)
-        .order("created_at", desc=True)
-        .execute()
+@router.post("/bulk/filter")
+async def bulk_update_items_by_filter(body: BulkFilterBody, user: CurrentUser = Depends(get_current_user)):
+    """
+    Apply a bulk action to every item matching a filter, in one statement and without
+    an id list or MAX_BULK_IDS cap. Updates only touch rows that change; dry_run
+    returns that count without writing. At least one filter is required.
+    """
+    f = body.filter
+    q = None
+    if f.q is not None:
+        q = items_repo.ilike_term(f.q)
+        if not q:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="q has no searchable characters")
+    ranges = {
+        "created_after": f.created_after,
+        "created_before": f.created_before,
+        "updated_after": f.updated_after,
+        "updated_before": f.updated_before,
+    }
+    match: dict[str, object] = {
+        "type": f.type,
+        "state": f.state,
+        "is_pinned": f.is_pinned,
+        "is_archived": f.is_archived,
+        "q": q,
+        "tag_names": list(dict.fromkeys(t for t in (f.tag or []) if t)) or None,
+        **{key: value.isoformat() if value else None for key, value in ranges.items()},
+    }
+    if all(value is None for value in match.values()):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="At least one filter is required")
+    match["match_all"] = f.match == "all"
+
+    delete = body.action == "delete"
+    count = await items_repo.bulk_apply_matching(
+        user.id,
+        match,
+        updates=None if delete else _bulk_updates(body.action),
+        delete=delete,
+        dry_run=body.dry_run,
     )
+    if count and not body.dry_run:
+        read_cache.bump(user.id)
+        if delete:
+            search_index.invalidate(user.id)
+    return {"action": body.action, "dry_run": body.dry_run, "count": count}
+
+
+@router.post("/bulk/tags")
+async def bulk_update_item_tags(body: BulkTagsBody, user: CurrentUser = Depends(get_current_user)):
+    """
+    Add and remove tags (by id or name) on many items in one call. Tags named in
+    add_tag_names are created if missing. Every item and tag id is ownership-checked
+    first; if any is missing or not owned, nothing is changed.
+    """
+    ids = list(dict.fromkeys(body.ids))
+    add_ids = list(dict.fromkeys(body.add_tag_ids))
+    remove_ids = list(dict.fromkeys(body.remove_tag_ids))
+    add_names = list(dict.fromkeys(n for n in map(normalized_tag, body.add_tag_names) if n))
+    remove_names = list(dict.fromkeys(n for n in map(normalized_tag, body.remove_tag_names) if n))
+    if not (add_ids or add_names or remove_ids or remove_names):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No tags to add or remove")
+    if set(add_ids) & set(remove_ids) or set(add_names) & set(remove_names):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A tag cannot be both added and removed",
+        )
 
-    items: list[dict] = []
-    for row in response.data or []:
-        tag_names = [
-            it.get("tags", {}).get("name")
-            for it in (row.get("item_tags") or [])
-            if it.get("tags", {}).get("name")
-        ]
-        items.append({
-            "type": row.get("type"),
-            "title": row.get("title"),
-            "content": row.get("content"),
-            "url": row.get("url"),
-            "state": row.get("state"),
-            "why_this_matters": row.get("why_this_matters"),
-            "is_pinned": row.get("is_pinned", False),
-            "is_archived": row.get("is_archived", False),
-            "created_at": row.get("created_at"),
-            "updated_at": row.get("updated_at"),
-            "tags": tag_names,
-        })
+    result = await item_tags_repo.bulk_apply(
+        user.id,
+        ids,
+        add_tag_ids=add_ids,
+        add_tag_names=add_names,
+        remove_tag_ids=remove_ids,
+        remove_tag_names=remove_names,
+    )
+    if "missing_items" in result:
+        for key, code, detail in (
+            ("forbidden_items", status.HTTP_403_FORBIDDEN, "You do not have access to these items"),
+            ("forbidden_tags", status.HTTP_403_FORBIDDEN, "You do not have access to these tags"),
+            ("missing_items", status.HTTP_404_NOT_FOUND, "Items not found"),
+            ("missing_tags", status.HTTP_404_NOT_FOUND, "Tags not found"),
+        ):
+            if result[key]:
+                raise HTTPException(status_code=code, detail=f"{detail}: {', '.join(result[key])}")
+
+    read_cache.bump(user.id)
+    return {
+        "count": len(ids),
+        "item_ids": ids,
+        "attached": result.get("attached", 0),
+        "detached": result.get("detached", 0),
+        "created_tags": result.get("created_tags", []),
+    }
 
+
+def _export_row(row: dict) -> dict:
+    tag_names = [
+        it.get("tags", {}).get("name")
+        for it in (row.get("item_tags") or [])
+        if it.get("tags", {}).get("name")
+    ]
     return {
-        "version": 1,
-        "exported_at": datetime.now(timezone.utc).isoformat(),
-        "item_count": len(items),
-        "items": items,
+        "type": row.get("type"),
+        "title": row.get("title"),
+        "content": row.get("content"),
+        "url": row.get("url"),
+        "state": row.get("state"),
+        "why_this_matters": row.get("why_this_matters"),
+        "is_pinned": row.get("is_pinned", False),
+        "is_archived": row.get("is_archived", False),
+        "created_at": row.get("created_at"),
+        "updated_at": row.get("updated_at"),
+        "tags": tag_names,
+    }
+
+
+async def _export_chunks(
+    fmt: ExportFormat,
+    first_page: list[dict] | None,
+    pages: AsyncIterator[list[dict]],
+) -> AsyncIterator[bytes]:
+    """Serialize one page at a time; only the current page is ever held in memory."""
+    count = 0
+    if fmt == "json":
+        exported_at = datetime.now(timezone.utc).isoformat()
+        yield b'{"version":1,"exported_at":' + orjson.dumps(exported_at) + b',"items":['
+
+    async def all_pages():
+        if first_page:
+            yield first_page
+        async for page in pages:
+            yield page
+
+    try:
+        async for page in all_pages():
+            lines = [orjson.dumps(_export_row(row)) for row in page]
+            if fmt == "ndjson":
+                yield b"\n".join(lines) + b"\n"
+            else:
+                yield (b"," if count else b"") + b",".join(lines)
+            count += len(lines)
+    except Exception:
+        # Headers are already sent; log and cut the stream so the client sees a truncated body
+        logger.exception("Export stream failed after %s items", count)
+        raise
+
+    if fmt == "json":
+        yield f'],"item_count":{count}}}'.encode()
+
+
+async def _gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    async for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+@router.get("/export")
+async def export_items(
+    format: ExportFormat = Query("json", description="json ({version: 1, items, item_count}) or ndjson"),
+    gzip: bool = Query(False, description="Compress on the fly (Content-Encoding: gzip)"),
+    user: CurrentUser = Depends(get_current_user),
+):
+    """
+    Stream every item as JSON or NDJSON, paging the table by keyset so memory stays
+    flat regardless of item count. The first page is read before the response
+    starts, so early database errors still get the normal error shape.
+    """
+    pages = items_repo.iter_export_pages(user.id)
+    first_page = await anext(pages, None)
+
+    chunks = _export_chunks(format, first_page, pages)
+    extension = "json" if format == "json" else "ndjson"
+    headers = {
+        "Content-Disposition": (
+            f'attachment; filename="buddhira-export-{datetime.now(timezone.utc).date()}.{extension}"'
+        ),
     }
+    if gzip:
+        chunks = _gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+
+    media_type = "application/json" if format == "json" else "application/x-ndjson"
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
 
 
 @router.post("/import")
 async def import_items(payload: ImportPayload, user: CurrentUser = Depends(get_current_user)):
-    sb = get_supabase()
-
     if len(payload.items) > MAX_IMPORT_ITEMS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Too many items in one import (max {MAX_IMPORT_ITEMS})",
         )
 
-    existing_tags = (
-        sb.table("tags").select("id, name").eq("user_id", user.id).execute().data or []
-    )
-    tag_map: dict[str, str] = {t["name"]: t["id"] for t in existing_tags}
-
-    imported_count = 0
-    attached_tag_links = 0
-
-    for item in payload.items:
-        row = {
-            "user_id": user.id,
-            "type": item.type,
-            "title": item.title,
-            "content": item.content,
-            "url": item.url,
-            "state": item.state,
-            "why_this_matters": item.why_this_matters,
-            "is_pinned": item.is_pinned,
-            "is_archived": item.is_archived,
-        }
-        row = enforce_archive_rules(row)
-
-        create_res = sb.table("items").insert(row).execute()
-        if not create_res.data:
-            continue
-
-        imported_count += 1
-        item_id = create_res.data[0]["id"]
-
-        for raw_tag in item.tags:
-            tag_name = _normalized_tag(raw_tag)
-            if not tag_name:
-                continue
-
-            tag_id = tag_map.get(tag_name)
-            if not tag_id:
-                create_tag = (
-                    sb.table("tags")
-                    .upsert({"user_id": user.id, "name": tag_name}, on_conflict="user_id,name")
-                    .execute()
-                )
-                if create_tag.data:
-                    tag_id = create_tag.data[0]["id"]
-                    tag_map[tag_name] = tag_id
-                else:
-                    tag_lookup = (
-                        sb.table("tags")
-                        .select("id")
-                        .eq("user_id", user.id)
-                        .eq("name", tag_name)
-                        .execute()
-                    )
-                    if tag_lookup.data:
-                        tag_id = tag_lookup.data[0]["id"]
-                        tag_map[tag_name] = tag_id
-
-            if tag_id:
-                sb.table("item_tags").upsert({"item_id": item_id, "tag_id": tag_id}).execute()
-                attached_tag_links += 1
-
+    imported_count, attached_tag_links = await import_batch(user.id, payload.items)
     return {
         "imported_count": imported_count,
         "attached_tag_links": attached_tag_links,
@@ -325,23 +563,15 @@ async def import_items(payload: ImportPayload, user: CurrentUser = Depends(get_c
 
 
 @router.get("/{item_id}")
-async def get_item(item_id: str, user: CurrentUser = Depends(get_current_user)):
-    sb = get_supabase()
-    _ensure_item_owned(sb, item_id, user.id)
-    response = (
-        sb.table("items")
-        .select("*, item_tags(tag_id, tags(id, name))")
-        .eq("id", item_id)
-        .eq("user_id", user.id)
-        .single()
-        .execute()
-    )
-    return response.data
+async def get_item(item_id: str, request: Request, user: CurrentUser = Depends(get_current_user)):
+    item = await items_repo.get(item_id, user.id)
+    if item is None:
+        await _raise_item_miss(item_id, user.id)
+    return respond(request, render(item))
 
 
 @router.post("", status_code=status.HTTP_201_CREATED)
 async def create_item(body: ItemCreate, user: CurrentUser = Depends(get_current_user)):
-    sb = get_supabase()
     row = body.model_dump(exclude_none=True)
     row["user_id"] = user.id
 
@@ -350,27 +580,34 @@ async def create_item(body: ItemCreate, user: CurrentUser = Depends(get_current_
     row.setdefault("is_pinned", False)
     row = enforce_archive_rules(row)
 
-    response = sb.table("items").insert(row).execute()
-    if not response.data:
+    created = await items_repo.insert(row)
+    read_cache.bump(user.id)
+    if not created:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to create item")
-    return response.data[0]
+    search_index.on_upsert(user.id, created)
+    return created
 
 
 @router.patch("/{item_id}")
 async def update_item(item_id: str, body: ItemUpdate, user: CurrentUser = Depends(get_current_user)):
-    sb = get_supabase()
-    _ensure_item_owned(sb, item_id, user.id)
     updates = body.model_dump(exclude_none=True)
     if not updates:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No fields to update")
 
     updates = enforce_archive_rules(updates)
-    response = sb.table("items").update(updates).eq("id", item_id).eq("user_id", user.id).execute()
-    return response.data[0]
+    item = await items_repo.update(item_id, user.id, updates)
+    read_cache.bump(user.id)
+    if item is None:
+        await _raise_item_miss(item_id, user.id)
+    if "title" in updates or "content" in updates:
+        search_index.on_upsert(user.id, item)
+    return item
 
 
 @router.delete("/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_item(item_id: str, user: CurrentUser = Depends(get_current_user)):
-    sb = get_supabase()
-    _ensure_item_owned(sb, item_id, user.id)
-    sb.table("items").delete().eq("id", item_id).eq("user_id", user.id).execute()
+    deleted = await items_repo.delete(item_id, user.id)
+    read_cache.bump(user.id)
+    if not deleted:
+        await _raise_item_miss(item_id, user.id)
+    search_index.on_delete(user.id, [item_id])
@@ -0,0 +1,74 @@
+"""
+Typeahead suggestions — item titles and tag names by prefix.
+
+Cheaper than list_items/list_tags for autocomplete: no content, one RPC backed by
+prefix indexes, plus a short-lived per-user cache so fast typists and repeated
+prefixes skip the round trip. Writes are not reflected until the entry expires.
+"""
+
+import time
+from collections import OrderedDict
+
+from fastapi import APIRouter, Depends, Query
+
+from app.auth import CurrentUser, get_current_user
+from app.config import settings
+from app.repositories import suggest as suggest_repo
+
+router = APIRouter()
+
+MAX_PREFIX = 100
+
+# (user_id, normalized prefix, limit) -> (expires_at, response)
+_cache: "OrderedDict[tuple[str, str, int], tuple[float, dict]]" = OrderedDict()
+
+
+def _cache_get(key: tuple[str, str, int]) -> dict | None:
+    entry = _cache.get(key)
+    if entry is None:
+        return None
+    if entry[0] <= time.monotonic():
+        del _cache[key]
+        return None
+    _cache.move_to_end(key)
+    return entry[1]
+
+
+def _cache_put(key: tuple[str, str, int], value: dict) -> None:
+    _cache[key] = (time.monotonic() + settings.suggest_cache_ttl_seconds, value)
+    _cache.move_to_end(key)
+    while len(_cache) > settings.suggest_cache_max_entries:
+        _cache.popitem(last=False)
+
+
+@router.get("")
+async def suggest(
+    prefix: str = Query(..., min_length=1, max_length=MAX_PREFIX, description="Case-insensitive prefix"),
+    limit: int = Query(8, ge=1, le=20, description="Max titles and max tags returned"),
+    user: CurrentUser = Depends(get_current_user),
+):
+    normalized = prefix.strip().lower()
+    if not normalized:
+        return {"titles": [], "tags": []}
+
+    key = (user.id, normalized, limit)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    titles: list[dict] = []
+    tags: list[dict] = []
+    for row in await suggest_repo.by_prefix(user.id, normalized, limit):
+        if row["kind"] == "item":
+            titles.append({
+                "id": row["id"],
+                "title": row["label"],
+                "type": row["item_type"],
+                "is_pinned": row["is_pinned"],
+            })
+        else:
+            tags.append({"id": row["id"], "name": row["label"]})
+
+    result = {"titles": titles, "tags": tags}
+    _cache_put(key, result)
+    return result
@@ -4,11 +4,15 @@ Tags CRUD.
 Each user has their own set of tags (unique per user_id + name).
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import NoReturn
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from pydantic import BaseModel, Field
 
+from app import read_cache
 from app.auth import CurrentUser, get_current_user
-from app.supabase_client import get_supabase
+from app.conditional import render, respond
+from app.repositories import tags as tags_repo
 
 router = APIRouter()
 
@@ -28,80 +32,60 @@ class TagUpdate(BaseModel):
 # ── List tags (with item counts) ────────────────────────────────────────────
 
 @router.get("")
-async def list_tags(user: CurrentUser = Depends(get_current_user)):
-    sb = get_supabase()
-    response = (
-        sb.table("tags")
-        .select("*, item_tags(count)")
-        .eq("user_id", user.id)
-        .order("name")
-        .execute()
-    )
-    # Flatten the count from [{count: N}] to a plain integer
-    tags = []
-    for tag in response.data or []:
-        item_count = 0
-        if tag.get("item_tags") and len(tag["item_tags"]) > 0:
-            item_count = tag["item_tags"][0].get("count", 0)
-        tags.append({
-            "id": tag["id"],
-            "name": tag["name"],
-            "user_id": tag["user_id"],
-            "created_at": tag["created_at"],
-            "item_count": item_count,
-        })
-    return tags
+async def list_tags(request: Request, user: CurrentUser = Depends(get_current_user)):
+    cached = read_cache.get(user.id, ("tags",))
+    if cached is not None:
+        return respond(request, cached)
+    at_version = read_cache.version(user.id)
+
+    rendered = render(await tags_repo.list_with_counts(user.id))
+    read_cache.put(user.id, ("tags",), rendered, at_version)
+    return respond(request, rendered)
 
 
 # ── Create tag ──────────────────────────────────────────────────────────────
 
 @router.post("", status_code=status.HTTP_201_CREATED)
 async def create_tag(body: TagCreate, user: CurrentUser = Depends(get_current_user)):
-    sb = get_supabase()
-    response = (
-        sb.table("tags")
-        .insert({"user_id": user.id, "name": body.name})
-        .execute()
-    )
-    if not response.data:
+    created = await tags_repo.create(user.id, body.name)
+    read_cache.bump(user.id)
+    if not created:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to create tag")
-    return response.data[0]
+    return created
 
 
 # ── Helpers ─────────────────────────────────────────────────────────────────
 
-def _ensure_tag_owned(sb, tag_id: str, user_id: str) -> None:
-    """Raise 404 if tag does not exist, 403 if it belongs to another user."""
-    row = sb.table("tags").select("id, user_id").eq("id", tag_id).execute()
-    if not row.data or len(row.data) == 0:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tag not found")
-    if row.data[0]["user_id"] != user_id:
+async def _raise_tag_miss(tag_id: str, user_id: str) -> NoReturn:
+    """
+    Miss path after a user-scoped statement touched no row.
+    Raise 403 if the tag belongs to another user, otherwise 404.
+    """
+    owner = await tags_repo.get_owner(tag_id)
+    if owner is not None and owner != user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You do not have access to this tag",
         )
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tag not found")
 
 
 # ── Update tag ──────────────────────────────────────────────────────────────
 
 @router.patch("/{tag_id}")
 async def update_tag(tag_id: str, body: TagUpdate, user: CurrentUser = Depends(get_current_user)):
-    sb = get_supabase()
-    _ensure_tag_owned(sb, tag_id, user.id)
-    response = (
-        sb.table("tags")
-        .update({"name": body.name})
-        .eq("id", tag_id)
-        .eq("user_id", user.id)
-        .execute()
-    )
-    return response.data[0]
+    tag = await tags_repo.rename(tag_id, user.id, body.name)
+    read_cache.bump(user.id)
+    if tag is None:
+        await _raise_tag_miss(tag_id, user.id)
+    return tag
 
 
 # ── Delete tag ──────────────────────────────────────────────────────────────
 
 @router.delete("/{tag_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_tag(tag_id: str, user: CurrentUser = Depends(get_current_user)):
-    sb = get_supabase()
-    _ensure_tag_owned(sb, tag_id, user.id)
-    sb.table("tags").delete().eq("id", tag_id).eq("user_id", user.id).execute()
+    deleted = await tags_repo.delete(tag_id, user.id)
+    read_cache.bump(user.id)
+    if not deleted:
+        await _raise_tag_miss(tag_id, user.id)
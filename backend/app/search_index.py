@@ -0,0 +1,247 @@
+"""
+Optional in-process search index for `q` on GET /api/items.
+
+`q` is a case-insensitive substring match on title and content (ilike). The index
+only narrows it down: one trigram inverted index per active user over the lowercased
+title and content. An item containing q contains every trigram of q, so intersecting
+those postings yields a superset of the matches; the database then applies the same
+ilike to just those ids. Results are therefore exactly the fallback query's, whether
+the index is off, cold or over SEARCH_INDEX_MAX_CANDIDATES. Terms shorter than three
+characters go straight to the database.
+
+Built lazily on the first search and updated incrementally by item writes. Postings
+are compact uint32 arrays of local doc numbers; deletes are tombstones, compacted
+once they outnumber live docs. Nothing else is kept per doc but its id. Whole user
+indexes are evicted LRU under SEARCH_INDEX_MAX_MB, measured with sys.getsizeof on
+the strings, arrays and tables actually held.
+
+Enabled with SEARCH_INDEX_ENABLED=true. Per worker: each gunicorn worker keeps its
+own copy, and writes served by another worker are not seen, so keep it off when
+running more than one worker.
+"""
+
+import asyncio
+import logging
+import sys
+from array import array
+from collections import OrderedDict
+
+from app.config import settings
+from app.repositories import items as items_repo
+
+logger = logging.getLogger("buddhira")
+
+_GRAM = 3
+
+
+def _fold(text: str) -> str:
+    """
+    Lowercase the way ilike compares, one character for one: Python's full mapping
+    turns U+0130 into "i" plus a combining dot and picks a final sigma by context.
+    Applied to documents and queries alike, so a match under ilike is still a match.
+    """
+    return text.lower().replace("i\u0307", "i").replace("\u03c2", "\u03c3")
+
+
+def _grams(*texts: str | None) -> set[str]:
+    out: set[str] = set()
+    for text in texts:  # separately: q has to match within title or within content
+        if text:
+            folded = _fold(text)
+            out.update(folded[i:i + _GRAM] for i in range(len(folded) - _GRAM + 1))
+    return out
+
+
+class _UserIndex:
+    """Trigram index for one user's items."""
+
+    def __init__(self) -> None:
+        self.postings: dict[str, array] = {}
+        self.doc_ids: list[str | None] = []  # doc number -> item id (None = tombstone)
+        self.doc_of: dict[str, int] = {}  # item id -> live doc number
+        self.dead = 0
+        self._held = 0  # bytes of the keys, item ids and postings arrays
+
+    @property
+    def bytes(self) -> int:
+        tables = sys.getsizeof(self.postings) + sys.getsizeof(self.doc_ids) + sys.getsizeof(self.doc_of)
+        return self._held + tables
+
+    def _add(self, item_id: str, grams: set[str]) -> None:
+        doc = len(self.doc_ids)
+        self.doc_ids.append(item_id)
+        self.doc_of[item_id] = doc
+        self._held += sys.getsizeof(item_id)
+        for gram in grams:
+            plist = self.postings.get(gram)
+            if plist is None:
+                plist = self.postings[gram] = array("I")
+                self._held += sys.getsizeof(gram) + sys.getsizeof(plist)
+            before = sys.getsizeof(plist)
+            plist.append(doc)
+            self._held += sys.getsizeof(plist) - before
+
+    def upsert(self, item_id: str, title: str | None, content: str | None) -> None:
+        """Index a new or edited item."""
+        self.remove(item_id)
+        self._add(item_id, _grams(title, content))
+
+    def remove(self, item_id: str) -> None:
+        doc = self.doc_of.pop(item_id, None)
+        if doc is not None:
+            self.doc_ids[doc] = None
+            self.dead += 1
+            self._held -= sys.getsizeof(item_id)
+            if self.dead > len(self.doc_of):
+                self._compact()
+
+    def _compact(self) -> None:
+        """Drop tombstones: renumber live docs and filter every postings array."""
+        renumber = {doc: n for n, doc in enumerate(d for d, i in enumerate(self.doc_ids) if i is not None)}
+        postings: dict[str, array] = {}
+        held = 0
+        for gram, plist in self.postings.items():
+            kept = array("I", (renumber[doc] for doc in plist if doc in renumber))
+            if kept:
+                postings[gram] = kept
+                held += sys.getsizeof(gram) + sys.getsizeof(kept)
+        self.postings = postings
+        self.doc_ids = [i for i in self.doc_ids if i is not None]
+        self.doc_of = {item_id: n for n, item_id in enumerate(self.doc_ids)}
+        self.dead = 0
+        self._held = held + sum(sys.getsizeof(i) for i in self.doc_ids)
+
+    def lookup(self, grams: set[str]) -> list[str]:
+        """Ids of live items whose title or content holds every trigram."""
+        lists = []
+        for gram in grams:
+            plist = self.postings.get(gram)
+            if plist is None:
+                return []
+            lists.append(plist)
+        lists.sort(key=len)  # start from the most selective
+        docs = set(lists[0])
+        for plist in lists[1:]:
+            docs.intersection_update(plist)
+            if not docs:
+                return []
+        return [item_id for doc in docs if (item_id := self.doc_ids[doc]) is not None]
+
+
+_indexes: "OrderedDict[str, _UserIndex]" = OrderedDict()
+_generation: dict[str, int] = {}
+_builds: dict[str, asyncio.Task] = {}  # one in-flight build per user
+_stats = {"hits": 0, "builds": 0, "fallbacks": 0, "evictions": 0}
+
+
+def enabled() -> bool:
+    return settings.search_index_enabled
+
+
+def _bump(user_id: str) -> None:
+    """Mark any in-flight build for this user as stale."""
+    _generation[user_id] = _generation.get(user_id, 0) + 1
+
+
+def _evict() -> None:
+    cap = settings.search_index_max_mb * 1024 * 1024
+    total = sum(ix.bytes for ix in _indexes.values())
+    while _indexes and total > cap:
+        user_id, ix = _indexes.popitem(last=False)
+        total -= ix.bytes
+        _stats["evictions"] += 1
+        logger.info("search_index evicted user_id=%s bytes=%s", user_id, ix.bytes)
+
+
+async def _run_build(user_id: str) -> _UserIndex | None:
+    try:
+        if user_id in _indexes:
+            return _indexes[user_id]
+        generation = _generation.get(user_id, 0)
+        ix = _UserIndex()
+        async for row in items_repo.iter_search_documents(user_id):
+            ix.upsert(row["id"], row.get("title"), row.get("content"))
+        if _generation.get(user_id, 0) != generation:
+            return None  # a write landed mid-build; rebuild on the next search
+        _indexes[user_id] = ix
+        _stats["builds"] += 1
+        _evict()
+        return _indexes.get(user_id)
+    finally:
+        _builds.pop(user_id, None)
+
+
+async def _build(user_id: str) -> _UserIndex | None:
+    """Build the user's index; concurrent searches share one build."""
+    task = _builds.get(user_id)
+    if task is None:
+        task = _builds[user_id] = asyncio.create_task(_run_build(user_id))
+    return await asyncio.shield(task)
+
+
+async def lookup(user_id: str, q: str) -> list[str] | None:
+    """
+    Candidate item ids for q: a superset of the items whose title or content contains
+    q, to be filtered with the same ilike in the database. None when the index cannot
+    answer (disabled, term under three characters, build raced a write, or more
+    candidates than SEARCH_INDEX_MAX_CANDIDATES) and the database should search alone.
+    """
+    if not enabled():
+        return None
+    grams = _grams(items_repo.ilike_term(q))
+    if not grams:
+        return None
+    ix = _indexes.get(user_id)
+    if ix is None:
+        try:
+            ix = await _build(user_id)
+        except Exception:
+            logger.exception("search_index build failed user_id=%s", user_id)
+            ix = None
+    if ix is None:
+        _stats["fallbacks"] += 1
+        return None
+    _indexes.move_to_end(user_id)
+    ids = ix.lookup(grams)
+    if len(ids) > settings.search_index_max_candidates:
+        _stats["fallbacks"] += 1
+        return None
+    _stats["hits"] += 1
+    return ids
+
+
+def on_upsert(user_id: str, row: dict) -> None:
+    """Apply a created or edited item (row from PostgREST) to the user's index."""
+    if not enabled():
+        return
+    _bump(user_id)
+    ix = _indexes.get(user_id)
+    if ix is not None and row.get("id"):
+        ix.upsert(row["id"], row.get("title"), row.get("content"))
+        _evict()
+
+
+def on_delete(user_id: str, item_ids: list[str]) -> None:
+    if not enabled():
+        return
+    _bump(user_id)
+    ix = _indexes.get(user_id)
+    if ix is not None:
+        for item_id in item_ids:
+            ix.remove(item_id)
+
+
+def invalidate(user_id: str) -> None:
+    """Drop the user's index (e.g. after a bulk delete); rebuilt on next search."""
+    if not enabled():
+        return
+    _bump(user_id)
+    _indexes.pop(user_id, None)
+
+
+def stats() -> dict:
+    return {
+        **_stats,
+        "users": len(_indexes),
+        "bytes": sum(ix.bytes for ix in _indexes.values()),
+    }
@@ -1,8 +1,73 @@
-from supabase import create_client, Client
+"""
+Process-wide async PostgREST client.
 
+One client per worker, created in the FastAPI lifespan and closed on shutdown.
+Calls reuse a bounded keep-alive pool (HTTP/2 when the server offers it) and are
+awaited, so a slow query never blocks the event loop for other requests.
+"""
+
+import httpx
+from postgrest import AsyncPostgrestClient
+from postgrest.utils import AsyncClient
+
+from app import metrics
 from app.config import settings
 
+_client: AsyncPostgrestClient | None = None
+
+
+def _pooled_session(base_url: str, headers: httpx.Headers | dict[str, str]) -> AsyncClient:
+    """HTTP session for PostgREST with pool limits and timeouts from settings, timed per call."""
+    return AsyncClient(
+        base_url=base_url,
+        headers=headers,
+        timeout=httpx.Timeout(
+            settings.supabase_timeout_seconds,
+            connect=settings.supabase_connect_timeout_seconds,
+        ),
+        limits=httpx.Limits(
+            max_connections=settings.supabase_pool_max_connections,
+            max_keepalive_connections=settings.supabase_pool_max_keepalive,
+            keepalive_expiry=settings.supabase_pool_keepalive_expiry_seconds,
+        ),
+        http2=True,
+        follow_redirects=True,
+        event_hooks={
+            "request": [metrics.postgrest_request_started],
+            "response": [metrics.postgrest_response],
+        },
+    )
+
+
+class _PooledPostgrestClient(AsyncPostgrestClient):
+    """AsyncPostgrestClient whose session is built pooled (no default session to close)."""
+
+    def create_session(self, base_url, headers, timeout, verify=True, proxy=None) -> AsyncClient:
+        return _pooled_session(base_url, headers)
+
+
+def init_supabase() -> AsyncPostgrestClient:
+    """Create the shared client (idempotent). Called from the app lifespan."""
+    global _client
+    if _client is None:
+        if not settings.supabase_url or not settings.service_role_key:
+            raise RuntimeError("Supabase not configured (set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY)")
+        key = settings.service_role_key
+        _client = _PooledPostgrestClient(
+            f"{settings.supabase_url.rstrip('/')}/rest/v1",
+            headers={"apiKey": key, "Authorization": f"Bearer {key}"},
+        )
+    return _client
+
+
+async def close_supabase() -> None:
+    """Close pooled connections on shutdown."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
 
-def get_supabase() -> Client:
-    """Get Supabase client instance (uses SUPABASE_SERVICE_ROLE_KEY or SUPABASE_KEY)."""
-    return create_client(settings.supabase_url, settings.service_role_key)
+def get_supabase() -> AsyncPostgrestClient:
+    """Get the shared PostgREST client (uses SUPABASE_SERVICE_ROLE_KEY or SUPABASE_KEY)."""
+    return init_supabase()
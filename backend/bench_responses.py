@@ -0,0 +1,135 @@
+"""
+Benchmark: response serialization time and bytes on the wire.
+
+Compares the old encoding path (jsonable_encoder + stdlib json, uncompressed) with
+the current one (orjson; gzip / brotli / MessagePack as negotiated) on realistic
+list_items pages and an export. No server or database needed.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python bench_responses.py [--rows 200] [--repeat 50]
+"""
+
+import argparse
+import json
+import random
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from app.config import settings
+from app.encoding import packb
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+WORDS = (
+    "idea note link python deploy cache index query latency token review draft "
+    "design api backend frontend tag inbox archive snippet reading list aws devops "
+    "postgres supabase render vercel bug fix refactor test metric trace"
+).split()
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def make_rows(count: int, seed: int = 7) -> list[dict]:
+    """Full item rows shaped like PostgREST returns them (ITEM_WITH_TAGS)."""
+    rng = random.Random(seed)
+    now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    user_id = str(uuid.UUID(int=rng.getrandbits(128)))
+    tags = [{"id": str(uuid.UUID(int=rng.getrandbits(128))), "name": w} for w in WORDS[:12]]
+    rows = []
+    for i in range(count):
+        created = now - timedelta(minutes=i * 37)
+        item_type = rng.choice(["note", "link", "snippet"])
+        rows.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "user_id": user_id,
+            "type": item_type,
+            "title": _text(rng, rng.randint(3, 10)).capitalize(),
+            "content": _text(rng, rng.randint(20, 400)),
+            "url": f"https://example.com/{i}" if item_type == "link" else None,
+            "state": rng.choice(["inbox", "active"]),
+            "why_this_matters": _text(rng, rng.randint(0, 25)) or None,
+            "is_pinned": rng.random() < 0.05,
+            "is_archived": False,
+            "created_at": created.isoformat(),
+            "updated_at": (created + timedelta(hours=rng.randint(0, 48))).isoformat(),
+            "item_tags": [{"tag_id": t["id"], "tags": t} for t in rng.sample(tags, rng.randint(0, 4))],
+        })
+    return rows
+
+
+def summarize(rows: list[dict]) -> list[dict]:
+    """The view=summary projection of the same rows."""
+    dropped = ("content", "why_this_matters", "item_tags")
+    return [
+        {
+            **{k: v for k, v in row.items() if k not in dropped},
+            "content_excerpt": (row["content"] or "")[:200] or None,
+            "tag_names": [link["tags"]["name"] for link in row["item_tags"]],
+        }
+        for row in rows
+    ]
+
+
+def _timed(fn, repeat: int) -> tuple[float, bytes]:
+    out = fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000, out
+
+
+def bench(label: str, value, repeat: int) -> None:
+    old_ms, old_body = _timed(
+        lambda: json.dumps(jsonable_encoder(value), ensure_ascii=False, allow_nan=False,
+                           separators=(",", ":")).encode("utf-8"),
+        repeat,
+    )
+    new_ms, new_body = _timed(lambda: orjson.dumps(value), repeat)
+    mp_ms, mp_body = _timed(lambda: packb(value), repeat)
+    gz_ms, gz_body = _timed(
+        lambda: zlib.compress(new_body, settings.compression_gzip_level, wbits=31), repeat
+    )
+
+    print(f"\n{label}")
+    print(f"  {'encoding':<34}{'ms':>9}{'bytes':>11}")
+    print(f"  {'before: jsonable_encoder + json':<34}{old_ms:>9.2f}{len(old_body):>11,}")
+    print(f"  {'orjson':<34}{new_ms:>9.2f}{len(new_body):>11,}")
+    print(f"  {'orjson + gzip':<34}{new_ms + gz_ms:>9.2f}{len(gz_body):>11,}")
+    if brotli is not None:
+        br_ms, br_body = _timed(
+            lambda: brotli.compress(new_body, quality=settings.compression_brotli_quality), repeat
+        )
+        print(f"  {'orjson + brotli':<34}{new_ms + br_ms:>9.2f}{len(br_body):>11,}")
+    print(f"  {'msgpack':<34}{mp_ms:>9.2f}{len(mp_body):>11,}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200, help="rows per list page (max limit is 200)")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    bench(f"list_items view=full, {args.rows} rows", rows, args.repeat)
+    bench(f"list_items view=summary, {args.rows} rows", summarize(rows), args.repeat)
+    bench("list_items default page, 50 rows summary", summarize(rows[:50]), args.repeat)
+    export = make_rows(2000, seed=11)
+    bench("export, 2000 rows", {"version": 1, "items": export, "item_count": len(export)}, max(1, args.repeat // 10))
+    if brotli is None:
+        print("\n(brotli not installed: gzip only)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,32 @@
 import asyncio
+import hmac
 import logging
 import os
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 
-from fastapi import Depends, FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.auth import CurrentUser, get_current_user
+from app import import_jobs, jwks, metrics, rate_limit
 from app.config import settings
+from app.encoding import NegotiatedResponse, ResponseEncodingMiddleware
 from app.errors import (
     generic_exception_handler,
     http_exception_handler,
     validation_exception_handler,
 )
 from app.middleware import RateLimitMiddleware, RequestLoggingMiddleware
+from app.routes.batch import router as batch_router
+from app.routes.imports import router as imports_router
 from app.routes.item_tags import router as item_tags_router
 from app.routes.items import router as items_router
+from app.routes.suggest import router as suggest_router
 from app.routes.tags import router as tags_router
+from app.supabase_client import close_supabase, get_supabase, init_supabase
 
 logging.basicConfig(
     level=logging.INFO,
@@ -43,10 +51,35 @@ if settings.sentry_dsn:
     except Exception:
         logger.exception("Failed to initialize Sentry")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Per worker: prefetch JWKS keys, create the pooled Supabase client and start the
+    import workers and the metrics snapshot writer; stop them and close the rate-limit
+    store on shutdown.
+    """
+    await metrics.start()
+    await jwks.start()
+    if settings.supabase_url and settings.service_role_key:
+        try:
+            init_supabase()
+            await import_jobs.start()
+        except Exception:
+            logger.exception("Failed to initialize Supabase client")
+    yield
+    await import_jobs.stop()
+    await jwks.stop()
+    await close_supabase()
+    await rate_limit.close_stores()
+    await metrics.stop()
+
+
 app = FastAPI(
     title="Buddhira API",
     description="Backend API for Buddhira - powered by FastAPI & Supabase",
     version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=NegotiatedResponse,
 )
 
 # Single error format so frontend toasts never break
@@ -62,6 +95,7 @@ app.add_middleware(
     allow_headers=["Authorization", "Content-Type"],
 )
 app.add_middleware(RateLimitMiddleware)
+app.add_middleware(ResponseEncodingMiddleware)
 app.add_middleware(RequestLoggingMiddleware)
 
 
@@ -71,10 +105,9 @@ async def root():
     return {"message": "Buddhira API", "status": "running"}
 
 
-def _health_db_check_sync() -> bool:
-    """Synchronous DB ping for use in executor with timeout."""
-    from app.supabase_client import get_supabase
-    get_supabase().table("items").select("id").limit(1).execute()
+async def _health_db_check() -> bool:
+    """Cheap DB ping on the shared async client."""
+    await get_supabase().table("items").select("id").limit(1).execute()
     return True
 
 
@@ -82,7 +115,7 @@ def _health_db_check_sync() -> bool:
 async def health():
     """
     Unauthenticated, cheap health check for Render and warmup.
-    No JWT. DB check runs in a thread with a 2s timeout; timeout or error → degraded.
+    No JWT. DB check is awaited with a 2s timeout; timeout or error → degraded.
     Returns 200 with status "healthy" or "degraded" so Render stays green.
     Returns 500 only when the app cannot function at all (missing Supabase config).
     """
@@ -102,11 +135,7 @@ async def health():
 
     db_ok = False
     try:
-        loop = asyncio.get_event_loop()
-        await asyncio.wait_for(
-            loop.run_in_executor(None, _health_db_check_sync),
-            timeout=2.0,
-        )
+        await asyncio.wait_for(_health_db_check(), timeout=2.0)
         db_ok = True
     except asyncio.TimeoutError:
         logger.warning("Health check: database check timed out (2s)")
@@ -123,6 +152,19 @@ async def health():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    """
+    Prometheus scrape endpoint for all workers of this server (see app/metrics.py).
+    No JWT; when METRICS_TOKEN is set, requires Authorization: Bearer <METRICS_TOKEN>.
+    """
+    if settings.metrics_token:
+        token = request.state.bearer_token or ""
+        if not hmac.compare_digest(token.encode(), settings.metrics_token.encode()):
+            raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(await metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/me", tags=["auth"])
 async def me(user: CurrentUser = Depends(get_current_user)):
     """Return the currently authenticated user (quick auth test)."""
@@ -132,3 +174,6 @@ async def me(user: CurrentUser = Depends(get_current_user)):
 app.include_router(items_router, prefix="/api/items", tags=["items"])
 app.include_router(tags_router, prefix="/api/tags", tags=["tags"])
 app.include_router(item_tags_router, prefix="/api/items", tags=["item-tags"])
+app.include_router(imports_router, prefix="/api/imports", tags=["imports"])
+app.include_router(suggest_router, prefix="/api/suggest", tags=["suggest"])
+app.include_router(batch_router, prefix="/api/batch", tags=["batch"])
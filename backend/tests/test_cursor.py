@@ -0,0 +1,83 @@
+"""
+GET /api/items cursors: encode/decode round trips per sort mode, and 400 for
+cursors that were tampered with or issued for another sort.
+"""
+
+import base64
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.routes.items import _decode_cursor, _encode_cursor
+
+ROW = {
+    "id": "0b6e7a52-3c1f-4d0e-9a57-2f7f4c1d8e90",
+    "is_pinned": True,
+    "created_at": "2025-03-01T12:30:45.123456+00:00",
+    "updated_at": "2025-03-02T08:00:00+00:00",
+    "title": "ignored",
+}
+
+
+def cursor_of(data) -> str:
+    raw = data if isinstance(data, bytes) else json.dumps(data).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+@pytest.mark.parametrize(
+    "sort, expected",
+    [
+        ("smart", [True, ROW["created_at"], ROW["id"]]),
+        ("created_desc", [ROW["created_at"], ROW["id"]]),
+        ("updated_desc", [ROW["updated_at"], ROW["id"]]),
+    ],
+)
+def test_round_trip(sort, expected):
+    cursor = _encode_cursor(sort, ROW)
+    assert "=" not in cursor  # URL-safe, unpadded
+    assert _decode_cursor(cursor, sort) == expected
+
+
+def test_round_trip_canonicalizes_values():
+    row = {**ROW, "id": ROW["id"].upper(), "is_pinned": False, "created_at": "2025-03-01T12:30:45+00:00"}
+    assert _decode_cursor(_encode_cursor("smart", row), "smart") == [
+        False, "2025-03-01T12:30:45+00:00", ROW["id"],
+    ]
+
+
+def test_cursor_for_another_sort_is_rejected():
+    for issued, used in [("smart", "created_desc"), ("created_desc", "updated_desc"), ("updated_desc", "smart")]:
+        with pytest.raises(HTTPException) as exc:
+            _decode_cursor(_encode_cursor(issued, ROW), used)
+        assert exc.value.status_code == 400
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not base64!",
+        cursor_of(b"not json"),
+        cursor_of(b"[1, 2]"),
+        cursor_of({"sort": "created_desc"}),
+        cursor_of({"sort": "created_desc", "after": "2025-03-01"}),
+        cursor_of({"sort": "created_desc", "after": [ROW["created_at"]]}),
+        cursor_of({"sort": "created_desc", "after": [ROW["created_at"], ROW["id"], "extra"]}),
+        cursor_of({"sort": "created_desc", "after": [ROW["created_at"], "not-a-uuid"]}),
+        cursor_of({"sort": "created_desc", "after": [ROW["created_at"], None]}),
+        cursor_of({"sort": "created_desc", "after": ["2025-03-01),id.gt.(x", ROW["id"]]}),
+        cursor_of({"sort": "created_desc", "after": [1740832245, ROW["id"]]}),
+        _encode_cursor("created_desc", ROW)[:-6],
+    ],
+)
+def test_tampered_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as exc:
+        _decode_cursor(cursor, "created_desc")
+    assert exc.value.status_code == 400
+    assert exc.value.detail == "Invalid cursor"
+
+
+def test_pinned_flag_must_be_a_boolean():
+    for pinned in ("true", 1, None):
+        with pytest.raises(HTTPException):
+            _decode_cursor(cursor_of({"sort": "smart", "after": [pinned, ROW["created_at"], ROW["id"]]}), "smart")
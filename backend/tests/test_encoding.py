@@ -0,0 +1,128 @@
+"""
+ResponseEncodingMiddleware on a small app: MessagePack negotiation, the compression
+size threshold, streamed br/gzip and weak ETags on 304s.
+"""
+
+import gzip
+
+import msgpack
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.conditional import render, respond
+from app.encoding import MSGPACK, NegotiatedResponse, ResponseEncodingMiddleware, brotli
+
+ROWS = [{"id": str(i), "title": f"note {i}", "tags": ["a", "b"]} for i in range(50)]
+
+
+def make_client() -> TestClient:
+    app = FastAPI(default_response_class=NegotiatedResponse)
+    app.add_middleware(ResponseEncodingMiddleware, minimum_size=200)
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/rows")
+    async def rows():
+        return ROWS
+
+    @app.get("/conditional")
+    async def conditional(request: Request):
+        return respond(request, render(ROWS))
+
+    @app.get("/stream")
+    async def stream():
+        async def lines():
+            for row in ROWS:
+                yield render(row).body + b"\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    return TestClient(app)
+
+
+def test_msgpack_negotiated_from_route_data():
+    client = make_client()
+    r = client.get("/rows", headers={"Accept": MSGPACK, "Accept-Encoding": "identity"})
+    assert r.headers["content-type"] == MSGPACK
+    assert msgpack.unpackb(r.content) == ROWS
+    assert "Accept" in r.headers["vary"]
+
+    r = client.get("/conditional", headers={"Accept": MSGPACK, "Accept-Encoding": "identity"})
+    assert r.headers["content-type"] == MSGPACK
+    assert msgpack.unpackb(r.content) == ROWS
+
+
+def test_json_wins_unless_msgpack_is_preferred():
+    client = make_client()
+    for accept in ("application/json, application/msgpack;q=0.5", "*/*", None):
+        headers = {"Accept-Encoding": "identity", **({"Accept": accept} if accept else {})}
+        r = client.get("/rows", headers=headers)
+        assert r.headers["content-type"] == "application/json"
+        assert r.json() == ROWS
+
+
+def test_small_bodies_are_not_compressed():
+    client = make_client()
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    assert small.json() == {"ok": True}
+    assert "Accept-Encoding" in small.headers["vary"]
+
+    big = client.get("/rows", headers={"Accept-Encoding": "gzip"})
+    assert big.headers["content-encoding"] == "gzip"
+    assert big.json() == ROWS
+
+
+def test_compressed_content_length_matches_wire_bytes():
+    client = make_client()
+    with client.stream("GET", "/rows", headers={"Accept-Encoding": "gzip"}) as r:
+        raw = b"".join(r.iter_raw())
+    assert int(r.headers["content-length"]) == len(raw)
+    assert gzip.decompress(raw) == render(ROWS).body
+
+
+@pytest.mark.parametrize("coding", ["gzip", pytest.param("br", marks=pytest.mark.skipif(brotli is None, reason="brotli not installed"))])
+def test_streamed_response_is_compressed_chunk_by_chunk(coding):
+    client = make_client()
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": coding}) as r:
+        raw = b"".join(r.iter_raw())
+    assert r.headers["content-encoding"] == coding
+    assert "content-length" not in r.headers
+    body = gzip.decompress(raw) if coding == "gzip" else brotli.decompress(raw)
+    assert body == b"".join(render(row).body + b"\n" for row in ROWS)
+
+
+def test_etag_is_weak_when_a_coding_is_negotiated_and_matches_on_304():
+    client = make_client()
+    r = client.get("/conditional", headers={"Accept-Encoding": "gzip"})
+    etag = r.headers["etag"]
+    assert etag == "W/" + render(ROWS).etag
+
+    not_modified = client.get("/conditional", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+    assert not_modified.content == b""
+
+    # Without a coding the validator stays strong, and a weak one still matches
+    plain = client.get("/conditional", headers={"Accept-Encoding": "identity"})
+    assert plain.headers["etag"] == render(ROWS).etag
+    assert client.get("/conditional", headers={"Accept-Encoding": "identity", "If-None-Match": etag}).status_code == 304
+
+
+def test_msgpack_etag_differs_from_json_and_revalidates():
+    client = make_client()
+    as_json = client.get("/conditional", headers={"Accept-Encoding": "identity"})
+    as_msgpack = client.get("/conditional", headers={"Accept": MSGPACK, "Accept-Encoding": "identity"})
+    assert as_json.headers["etag"] != as_msgpack.headers["etag"]
+
+    r = client.get(
+        "/conditional",
+        headers={"Accept": MSGPACK, "Accept-Encoding": "identity", "If-None-Match": as_msgpack.headers["etag"]},
+    )
+    assert r.status_code == 304
+    assert r.headers["etag"] == as_msgpack.headers["etag"]
+    assert "Accept" in r.headers["vary"]
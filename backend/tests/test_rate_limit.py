@@ -0,0 +1,222 @@
+"""
+Rate-limit stores against local stand-ins: fakeredis (with Lua) for the Redis
+store, a temp file for the shared-memory store.
+"""
+
+import asyncio
+import time
+
+import fakeredis
+import pytest
+
+from app.middleware import RateLimitMiddleware, RequestLoggingMiddleware, _rate_limit_headers
+from app.rate_limit import MemoryRateLimitStore, RedisRateLimitStore, SharedMemoryRateLimitStore
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def redis_store() -> RedisRateLimitStore:
+    return RedisRateLimitStore("", client=fakeredis.FakeAsyncRedis())
+
+
+def test_redis_burst_then_429_with_retry_after():
+    async def scenario():
+        store = redis_store()
+        results = [await store.hit("ip:1", 3, 60.0) for _ in range(4)]
+        await store.close()
+        return results
+
+    results = run(scenario())
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert [r.remaining for r in results[:3]] == [2, 1, 0]
+    denied = results[3]
+    # 3 tokens per 60s: the next token is ~20s away
+    assert denied.retry_after == pytest.approx(20.0, abs=0.5)
+    headers = dict(_rate_limit_headers(denied))
+    assert headers[b"retry-after"] == b"20"
+    assert headers[b"x-ratelimit-remaining"] == b"0"
+
+
+def test_redis_refills_over_time():
+    async def scenario():
+        store = redis_store()
+        for _ in range(2):
+            await store.hit("user:u", 2, 0.2)
+        blocked = await store.hit("user:u", 2, 0.2)
+        await asyncio.sleep(0.12)  # 2 tokens per 0.2s: one token back after 0.1s
+        refilled = await store.hit("user:u", 2, 0.2)
+        other = await store.hit("user:v", 2, 0.2)
+        await store.close()
+        return blocked, refilled, other
+
+    blocked, refilled, other = run(scenario())
+    assert not blocked.allowed
+    assert refilled.allowed
+    assert other.allowed and other.remaining == 1
+
+
+def test_redis_uses_one_script_call_per_hit():
+    async def scenario():
+        client = fakeredis.FakeAsyncRedis()
+        store = RedisRateLimitStore("", client=client)
+        await store.hit("ip:1", 5, 60.0)
+        await store.hit("ip:1", 5, 60.0)
+        ttl = await client.pttl("buddhira:rl:ip:1")
+        keys = await client.keys("*")
+        await store.close()
+        return ttl, keys
+
+    ttl, keys = run(scenario())
+    assert keys == [b"buddhira:rl:ip:1"]
+    assert 0 < ttl <= 60_000
+
+
+def test_cost_takes_all_tokens_or_none(tmp_path):
+    async def scenario(store):
+        first = await store.hit("ip:1", 5, 60.0, 4)  # a batch of four operations
+        denied = await store.hit("ip:1", 5, 60.0, 2)
+        single = await store.hit("ip:1", 5, 60.0)
+        await store.close()
+        return first, denied, single
+
+    for store in (redis_store(), SharedMemoryRateLimitStore(str(tmp_path / "rl"), slots=8)):
+        first, denied, single = run(scenario(store))
+        assert first.allowed and first.remaining == 1
+        # The denied batch takes nothing; one more token is 12s away at 5 per 60s
+        assert not denied.allowed and denied.remaining == 1
+        assert denied.retry_after == pytest.approx(12.0, abs=0.5)
+        assert single.allowed and single.remaining == 0
+
+
+def test_redis_unreachable_allows_request():
+    class Down:
+        def register_script(self, script):
+            async def call(**kwargs):
+                raise ConnectionError("down")
+            return call
+
+        async def aclose(self):
+            pass
+
+    result = run(RedisRateLimitStore("", client=Down()).hit("ip:1", 5, 60.0))
+    assert result.allowed and result.remaining == 5
+
+
+def test_shared_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "rl")
+
+    async def scenario():
+        # Two instances on one file stand in for two gunicorn workers
+        a = SharedMemoryRateLimitStore(path, slots=64)
+        b = SharedMemoryRateLimitStore(path, slots=64)
+        results = [await a.hit("ip:1", 3, 60.0), await b.hit("ip:1", 3, 60.0), await a.hit("ip:1", 3, 60.0)]
+        results.append(await b.hit("ip:1", 3, 60.0))
+        other = await b.hit("ip:2", 3, 60.0)
+        await a.close()
+        await b.close()
+        return results, other
+
+    results, other = run(scenario())
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert results[3].retry_after == pytest.approx(20.0, abs=0.5)
+    assert other.allowed and other.remaining == 2
+
+
+def test_shared_store_refills_and_reuses_slots(tmp_path):
+    async def scenario():
+        store = SharedMemoryRateLimitStore(str(tmp_path / "rl"), slots=8)
+        for _ in range(2):
+            await store.hit("ip:1", 2, 0.2)
+        blocked = await store.hit("ip:1", 2, 0.2)
+        await asyncio.sleep(0.12)
+        refilled = await store.hit("ip:1", 2, 0.2)
+        # More keys than slots: the table stays fixed-size and keeps answering
+        many = [await store.hit(f"user:{i}", 2, 0.2) for i in range(100)]
+        await store.close()
+        return blocked, refilled, many
+
+    blocked, refilled, many = run(scenario())
+    assert not blocked.allowed
+    assert refilled.allowed
+    assert all(r.allowed for r in many)
+
+
+def test_shared_store_waits_for_lock_without_blocking_loop(tmp_path):
+    import fcntl
+    import os
+
+    path = str(tmp_path / "rl")
+
+    async def scenario():
+        store = SharedMemoryRateLimitStore(path, slots=8)
+        holder = os.open(path, os.O_RDWR)  # another "worker" holding the lock
+        fcntl.flock(holder, fcntl.LOCK_EX)
+        task = asyncio.create_task(store.hit("ip:1", 2, 60.0))
+        ticks = 0
+        start = time.monotonic()
+        while time.monotonic() - start < 0.05:
+            await asyncio.sleep(0.005)  # the loop keeps running while hit() waits
+            ticks += 1
+        assert not task.done()
+        fcntl.flock(holder, fcntl.LOCK_UN)
+        os.close(holder)
+        result = await task
+        await store.close()
+        return ticks, result
+
+    ticks, result = run(scenario())
+    assert ticks >= 5
+    assert result.allowed
+
+
+@pytest.mark.parametrize("cache_entries", [0, 100])
+def test_user_limit_applies_whether_or_not_tokens_are_cached(monkeypatch, cache_entries):
+    """The user bucket is charged once per request, before routing or after verification."""
+    import jwt
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from fastapi import Depends, FastAPI, HTTPException
+    from fastapi.testclient import TestClient
+
+    from app import auth, jwks
+    from app.auth import CurrentUser, get_current_user
+    from app.config import settings
+    from app.errors import http_exception_handler
+
+    private_key = ec.generate_private_key(ec.SECP256R1())
+
+    class SigningKey:
+        key = private_key.public_key()
+
+    async def signing_key(kid):
+        return SigningKey()
+
+    monkeypatch.setattr(jwks, "get_signing_key", signing_key)
+    monkeypatch.setattr(settings, "auth_token_cache_max_entries", cache_entries)
+    auth.clear_token_cache()
+
+    app = FastAPI()
+    app.add_exception_handler(HTTPException, http_exception_handler)
+    store = MemoryRateLimitStore()
+    app.add_middleware(RateLimitMiddleware, max_requests=100, max_user_requests=3, store=store)
+    app.add_middleware(RequestLoggingMiddleware)
+
+    @app.get("/me")
+    async def me(user: CurrentUser = Depends(get_current_user)):
+        return {"id": user.id}
+
+    def token(sub: str) -> str:
+        claims = {"sub": sub, "aud": settings.jwt_audience, "exp": int(time.time()) + 60}
+        return jwt.encode(claims, private_key, algorithm="ES256")
+
+    client = TestClient(app)
+    alice = {"Authorization": f"Bearer {token('alice')}"}
+    statuses = [client.get("/me", headers=alice).status_code for _ in range(4)]
+    assert statuses == [200, 200, 200, 429]
+    denied = client.get("/me", headers=alice)
+    assert denied.json()["code"] == "rate_limited"
+    assert int(denied.headers["retry-after"]) >= 1
+    # Another user on the same IP has their own bucket
+    assert client.get("/me", headers={"Authorization": f"Bearer {token('bob')}"}).status_code == 200
+    auth.clear_token_cache()
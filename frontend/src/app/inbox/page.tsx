@@ -7,7 +7,7 @@ import { apiFetch, getApiBaseUrl, warmupHealth } from "@/lib/api";
 import { useToast } from "@/components/Toast";
 import { useRequireAuth } from "@/hooks/useRequireAuth";
 import { supabase } from "@/lib/supabaseClient";
-import type { Item, ItemState, ItemType, TagWithCount } from "@/lib/types";
+import type { ItemSummary, ItemState, ItemType, TagWithCount } from "@/lib/types";
 import {
   Search,
   Plus,
@@ -79,8 +79,8 @@ function InboxSkeletonRows({ rows = 4 }: { rows?: number }) {
   );
 }
 
-function applyPatchToItem(item: Item, patch: Record<string, unknown>): Item {
-  const updated = { ...item, ...patch } as Item;
+function applyPatchToItem(item: ItemSummary, patch: Record<string, unknown>): ItemSummary {
+  const updated = { ...item, ...patch } as ItemSummary;
   if (patch.is_archived === true) {
     updated.state = "archive";
     updated.is_archived = true;
@@ -101,7 +101,7 @@ function InboxContent() {
   const searchParams = useSearchParams();
   const { toast } = useToast();
 
-  const [items, setItems] = useState<Item[]>([]);
+  const [items, setItems] = useState<ItemSummary[]>([]);
   const [tags, setTags] = useState<TagWithCount[]>([]);
   const [loading, setLoading] = useState(true);
   const [loadingMore, setLoadingMore] = useState(false);
@@ -152,7 +152,7 @@ function InboxContent() {
       params.set("offset", String(offset));
 
       try {
-        const data = await apiFetch<Item[]>(`/api/items?${params.toString()}`);
+        const data = await apiFetch<ItemSummary[]>(`/api/items?${params.toString()}`);
         const next = data ?? [];
         setHasMore(next.length === PAGE_SIZE);
         setItems((prev) => (append ? [...prev, ...next] : next));
@@ -191,8 +191,8 @@ function InboxContent() {
     else setSelectedIds(visibleIds);
   }
 
-  function itemTags(item: Item): string[] {
-    return (item.item_tags ?? []).map((it) => it.tags?.name).filter(Boolean);
+  function itemTags(item: ItemSummary): string[] {
+    return item.tag_names ?? [];
   }
 
   function resetFilters() {
@@ -320,7 +320,7 @@ function InboxContent() {
   const pinned = items.filter((i) => i.is_pinned);
   const rest = items.filter((i) => !i.is_pinned);
 
-  const renderList = (list: Item[]) => (
+  const renderList = (list: ItemSummary[]) => (
     <ul className="divide-y divide-zinc-200 rounded-lg border border-zinc-200 bg-white dark:divide-zinc-700 dark:border-zinc-700 dark:bg-zinc-900">
       {list.map((item) => (
         <li key={item.id} className="group flex items-start gap-3 px-4 py-3">
@@ -347,7 +347,7 @@ function InboxContent() {
               <span className={`rounded px-1.5 py-0.5 text-xs font-medium ${STATE_COLORS[item.state]}`}>{STATE_LABELS[item.state]}</span>
             </div>
             <p className="mt-0.5 truncate text-base font-semibold text-zinc-900 dark:text-zinc-100">{item.title || "Untitled"}</p>
-            {item.content && <p className="mt-0.5 truncate text-sm text-zinc-500 dark:text-zinc-400">{item.content.slice(0, 120)}</p>}
+            {item.content_excerpt && <p className="mt-0.5 truncate text-sm text-zinc-500 dark:text-zinc-400">{item.content_excerpt.slice(0, 120)}</p>}
             {itemTags(item).length > 0 && (
               <div className="mt-1.5 flex flex-wrap gap-1">
                 {itemTags(item).map((tag) => (
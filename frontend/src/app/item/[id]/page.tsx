@@ -2,7 +2,7 @@
 
 import { useEffect, useState } from "react";
 import { useParams, useRouter } from "next/navigation";
-import { apiFetch } from "@/lib/api";
+import { apiBatch, apiFetch } from "@/lib/api";
 import { useToast } from "@/components/Toast";
 import { useRequireAuth } from "@/hooks/useRequireAuth";
 import type { Item, ItemState, ItemType, TagWithCount } from "@/lib/types";
@@ -48,14 +48,31 @@ export default function ItemDetailPage() {
   const [allTags, setAllTags] = useState<TagWithCount[]>([]);
   const [tagInput, setTagInput] = useState("");
 
+  function showItem(data: Item) {
+    setItem(data);
+    setTitle(data.title ?? "");
+    setContent(data.content ?? "");
+    setUrl(data.url ?? "");
+    setWhyThisMatters(data.why_this_matters ?? "");
+  }
+
   async function fetchItem() {
     try {
-      const data = await apiFetch<Item>(`/api/items/${id}`);
-      setItem(data);
-      setTitle(data.title ?? "");
-      setContent(data.content ?? "");
-      setUrl(data.url ?? "");
-      setWhyThisMatters(data.why_this_matters ?? "");
+      showItem(await apiFetch<Item>(`/api/items/${id}`));
+    } catch {
+      setError("Item not found");
+    } finally {
+      setLoading(false);
+    }
+  }
+
+  /** Item and tag list in one round trip. */
+  async function loadItemAndTags() {
+    try {
+      const [itemResult, tagsResult] = await apiBatch([{ path: `/api/items/${id}` }, { path: "/api/tags" }]);
+      if (itemResult.status !== 200) throw new Error("Item not found");
+      showItem(itemResult.body as Item);
+      if (tagsResult.status === 200) setAllTags(tagsResult.body as TagWithCount[]);
     } catch {
       setError("Item not found");
     } finally {
@@ -65,8 +82,7 @@ export default function ItemDetailPage() {
 
   useEffect(() => {
     if (!authChecking) {
-      fetchItem();
-      apiFetch<TagWithCount[]>("/api/tags").then(setAllTags).catch(() => {});
+      loadItemAndTags();
     }
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [id, authChecking]);
@@ -141,11 +157,12 @@ export default function ItemDetailPage() {
       setAllTags((prev) => [...prev, tag!]);
     }
     try {
-      await apiFetch(`/api/items/${id}/tags`, {
-        method: "POST",
-        body: JSON.stringify({ tag_id: tag.id }),
-      });
-      await fetchItem();
+      // Attach, then re-read the item with its tags, in one request
+      const [, itemResult] = await apiBatch([
+        { id: "attach", method: "POST", path: `/api/items/${id}/tags`, body: { tag_id: tag.id } },
+        { path: `/api/items/${id}`, depends_on: ["attach"] },
+      ]);
+      if (itemResult.status === 200) showItem(itemResult.body as Item);
     } catch {}
     setTagInput("");
   }
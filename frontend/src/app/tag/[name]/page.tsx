@@ -5,7 +5,7 @@ import { useParams, useRouter } from "next/navigation";
 import Link from "next/link";
 import { apiFetch } from "@/lib/api";
 import { useRequireAuth } from "@/hooks/useRequireAuth";
-import type { Item, ItemState, ItemType } from "@/lib/types";
+import type { ItemSummary, ItemState, ItemType } from "@/lib/types";
 import {
   ArrowLeft, Hash, Pin, PinOff, Archive, ArchiveRestore,
   StickyNote, Link2, Code2, Tag, PackageOpen,
@@ -29,13 +29,13 @@ export default function TagItemsPage() {
   const tagName = decodeURIComponent(name);
   const router = useRouter();
 
-  const [items, setItems] = useState<Item[]>([]);
+  const [items, setItems] = useState<ItemSummary[]>([]);
   const [loading, setLoading] = useState(true);
   const [actioningId, setActioningId] = useState<string | null>(null);
 
   const fetchItems = useCallback(async () => {
     try {
-      const data = await apiFetch<Item[]>(`/api/items?tag=${encodeURIComponent(tagName)}&is_archived=false`);
+      const data = await apiFetch<ItemSummary[]>(`/api/items?tag=${encodeURIComponent(tagName)}&is_archived=false`);
       setItems(data);
     } catch {
       setItems([]);
@@ -60,8 +60,8 @@ export default function TagItemsPage() {
     }
   }
 
-  function itemTags(item: Item): string[] {
-    return (item.item_tags ?? []).map((it) => it.tags?.name).filter(Boolean);
+  function itemTags(item: ItemSummary): string[] {
+    return item.tag_names ?? [];
   }
 
   if (authChecking) {
@@ -112,9 +112,9 @@ export default function TagItemsPage() {
                 <p className="mt-0.5 truncate text-sm font-medium text-zinc-900 dark:text-zinc-100">
                   {item.title || "Untitled"}
                 </p>
-                {item.content && (
+                {item.content_excerpt && (
                   <p className="mt-0.5 truncate text-xs text-zinc-500 dark:text-zinc-400">
-                    {item.content.slice(0, 120)}
+                    {item.content_excerpt.slice(0, 120)}
                   </p>
                 )}
                 {itemTags(item).length > 0 && (
@@ -125,6 +125,34 @@ export async function apiFetch<T = unknown>(
   return run(false);
 }
 
+export interface BatchOperation {
+  id?: string;
+  method?: "GET" | "POST" | "PATCH" | "DELETE";
+  /** API path with query string; may reference earlier results as ${op_id.field}. */
+  path: string;
+  body?: unknown;
+  depends_on?: string[];
+}
+
+export interface BatchResult<T = unknown> {
+  id: string;
+  status: number;
+  body: T | ApiErrorBody | null;
+}
+
+/**
+ * Run several API calls in one request (POST /api/batch): one auth check, independent
+ * operations run concurrently on the server. Results come back in operation order,
+ * each with its own status; failed operations carry { detail, code }.
+ */
+export async function apiBatch(operations: BatchOperation[]): Promise<BatchResult[]> {
+  const { results } = await apiFetch<{ results: BatchResult[] }>("/api/batch", {
+    method: "POST",
+    body: JSON.stringify({ operations }),
+  });
+  return results;
+}
+
 /**
  * Call GET /health in the background to wake the backend (e.g. Render free tier).
  * Uses plain fetch (not apiFetch) so it never triggers the retry toast — warmup stays silent.
@@ -27,6 +27,12 @@ export interface Item {
   item_tags?: ItemTag[];
 }
 
+/** Row returned by GET /api/items (default view=summary). */
+export interface ItemSummary extends Omit<Item, "content" | "why_this_matters" | "item_tags"> {
+  content_excerpt: string | null;
+  tag_names: string[];
+}
+
 export interface TagWithCount {
   id: string;
   name: string;
@@ -0,0 +1,45 @@
+-- Buddhira — single-round-trip item_tags writes with ownership enforced in the statement.
+-- Run after 001_initial_schema.sql. Safe to re-run (create or replace).
+-- The API calls these with the service-role key and passes the JWT subject as p_user_id.
+
+-- =============================================================================
+-- attach_item_tag: link only when both the item and the tag belong to p_user_id.
+-- Returns the link row (existing or new); returns no row when either is missing or not owned.
+-- =============================================================================
+
+create or replace function public.attach_item_tag(p_user_id uuid, p_item_id uuid, p_tag_id uuid)
+returns setof public.item_tags
+language sql
+as $$
+  insert into public.item_tags (item_id, tag_id)
+  select i.id, t.id
+  from public.items i
+  join public.tags t on t.id = p_tag_id and t.user_id = p_user_id
+  where i.id = p_item_id and i.user_id = p_user_id
+  on conflict (item_id, tag_id) do update set item_id = excluded.item_id
+  returning *;
+$$;
+
+-- =============================================================================
+-- detach_item_tag: unlink only when the item belongs to p_user_id.
+-- Returns the removed row; returns no row when nothing was removed.
+-- =============================================================================
+
+create or replace function public.detach_item_tag(p_user_id uuid, p_item_id uuid, p_tag_id uuid)
+returns setof public.item_tags
+language sql
+as $$
+  delete from public.item_tags it
+  using public.items i
+  where it.item_id = p_item_id
+    and it.tag_id = p_tag_id
+    and i.id = it.item_id
+    and i.user_id = p_user_id
+  returning it.*;
+$$;
+
+-- Only the backend (service role) may call these; p_user_id is trusted input from the verified JWT.
+revoke execute on function public.attach_item_tag(uuid, uuid, uuid) from public, anon, authenticated;
+revoke execute on function public.detach_item_tag(uuid, uuid, uuid) from public, anon, authenticated;
+grant execute on function public.attach_item_tag(uuid, uuid, uuid) to service_role;
+grant execute on function public.detach_item_tag(uuid, uuid, uuid) to service_role;
@@ -0,0 +1,16 @@
+-- Buddhira — indexes for keyset (cursor) pagination on GET /api/items and export.
+-- Run after 002. Safe to re-run (if not exists).
+-- Each index is user_id followed by exactly the sort key that items_page (013) compares
+-- as a row value, so the page after a cursor is an index range seek.
+
+-- sort=smart: (is_pinned, created_at, id) after the cursor. Replaces the 001 index
+-- without the id tie-breaker, which it covers.
+create index if not exists idx_items_user_pinned_created_at_id
+  on public.items (user_id, is_pinned desc, created_at desc, id desc);
+drop index if exists public.idx_items_user_pinned_created_at;
+
+-- sort=created_desc (and export): (created_at, id) after the cursor
+create index if not exists idx_items_user_created_at_id on public.items (user_id, created_at desc, id desc);
+
+-- sort=updated_desc: (updated_at, id) after the cursor
+create index if not exists idx_items_user_updated_at_id on public.items (user_id, updated_at desc, id desc);
@@ -0,0 +1,34 @@
+-- Buddhira — multi-tag filter for GET /api/items in one statement.
+-- Run after 003. Safe to re-run (create or replace).
+-- Returns setof items so PostgREST can still embed item_tags and apply the usual
+-- filters, search, ordering and keyset/offset paging on top of the RPC result.
+-- language sql + stable lets the planner inline it and push those filters down.
+
+create or replace function public.items_with_tags(
+  p_user_id uuid,
+  p_tag_names text[],
+  p_match_all boolean default false
+)
+returns setof public.items
+language sql
+stable
+as $$
+  select i.*
+  from public.items i
+  where i.user_id = p_user_id
+    and i.id in (
+      select it.item_id
+      from public.tags t
+      join public.item_tags it on it.tag_id = t.id
+      where t.user_id = p_user_id
+        and t.name = any (p_tag_names)
+      group by it.item_id
+      -- match=any: at least one tag; match=all: every distinct requested name
+      having not p_match_all
+          or count(*) = (select count(distinct n) from unnest(p_tag_names) as n)
+    );
+$$;
+
+-- Only the backend (service role) may call this; p_user_id is trusted input from the verified JWT.
+revoke execute on function public.items_with_tags(uuid, text[], boolean) from public, anon, authenticated;
+grant execute on function public.items_with_tags(uuid, text[], boolean) to service_role;
@@ -0,0 +1,124 @@
+-- Buddhira — ranked full-text search over items (GET /api/items?search=...).
+-- Run after 004. Safe to re-run.
+-- The weighted tsvector lives in a side table kept in sync by a trigger, so
+-- `select *` on items (list, get, create/update responses) does not carry it.
+
+-- =============================================================================
+-- Document: title (A) > why_this_matters (B) > content (C) > url (D)
+-- =============================================================================
+
+create or replace function public.item_search_document(i public.items)
+returns tsvector
+language sql
+immutable
+as $$
+  select setweight(to_tsvector('english', coalesce(i.title, '')), 'A')
+      || setweight(to_tsvector('english', coalesce(i.why_this_matters, '')), 'B')
+      || setweight(to_tsvector('english', coalesce(i.content, '')), 'C')
+      || setweight(to_tsvector('simple', coalesce(i.url, '')), 'D');
+$$;
+
+create table if not exists public.item_search (
+  item_id  uuid primary key references public.items(id) on delete cascade,
+  user_id  uuid not null,
+  document tsvector not null
+);
+
+comment on table public.item_search is 'Weighted tsvector per item, maintained by items_sync_search. Backend-only.';
+
+create index if not exists idx_item_search_document on public.item_search using gin (document);
+create index if not exists idx_item_search_user_id on public.item_search (user_id);
+
+-- No policies: only the service role (backend) reads it.
+alter table public.item_search enable row level security;
+
+-- =============================================================================
+-- Trigger: keep item_search in sync on insert and on edits to searchable columns
+-- =============================================================================
+
+create or replace function public.sync_item_search()
+returns trigger language plpgsql as $$
+begin
+  insert into public.item_search (item_id, user_id, document)
+  values (new.id, new.user_id, public.item_search_document(new))
+  on conflict (item_id) do update
+    set user_id = excluded.user_id,
+        document = excluded.document;
+  return null;
+end;
+$$;
+
+drop trigger if exists items_sync_search on public.items;
+create trigger items_sync_search
+  after insert or update of title, content, why_this_matters, url on public.items
+  for each row execute function public.sync_item_search();
+
+-- Backfill existing rows
+insert into public.item_search (item_id, user_id, document)
+select i.id, i.user_id, public.item_search_document(i)
+from public.items i
+on conflict (item_id) do nothing;
+
+-- =============================================================================
+-- search_items: websearch syntax ("phrase", -exclude, or), ranked by ts_rank.
+-- Applies the same optional filters as list_items. Highlights are computed only
+-- for the returned page; matches are wrapped in [[ ]] (plain text, not HTML).
+-- =============================================================================
+
+create or replace function public.search_items(
+  p_user_id uuid,
+  p_query text,
+  p_type text default null,
+  p_state text default null,
+  p_is_pinned boolean default null,
+  p_is_archived boolean default null,
+  p_tag_names text[] default null,
+  p_match_all boolean default false,
+  p_limit integer default 50,
+  p_offset integer default 0
+)
+returns table (id uuid, rank real, title_highlight text, content_highlight text)
+language sql
+stable
+as $$
+  with q as (
+    select websearch_to_tsquery('english', p_query) as query
+  ),
+  hits as (
+    select i.id, ts_rank(s.document, q.query) as rank
+    from public.item_search s
+    join public.items i on i.id = s.item_id
+    cross join q
+    where s.user_id = p_user_id
+      and s.document @@ q.query
+      and (p_type is null or i.type = p_type)
+      and (p_state is null or i.state = p_state)
+      and (p_is_pinned is null or i.is_pinned = p_is_pinned)
+      and (p_is_archived is null or i.is_archived = p_is_archived)
+      and (
+        p_tag_names is null
+        or i.id in (select t.id from public.items_with_tags(p_user_id, p_tag_names, p_match_all) t)
+      )
+    order by rank desc, i.id
+    limit p_limit offset p_offset
+  )
+  select
+    h.id,
+    h.rank,
+    ts_headline('english', coalesce(i.title, ''), q.query, 'HighlightAll=true, StartSel=[[, StopSel=]]'),
+    ts_headline(
+      'english',
+      coalesce(i.content, i.why_this_matters, ''),
+      q.query,
+      'MaxFragments=2, MaxWords=24, MinWords=8, StartSel=[[, StopSel=]]'
+    )
+  from hits h
+  join public.items i on i.id = h.id
+  cross join q
+  order by h.rank desc, h.id;
+$$;
+
+revoke execute on function public.search_items(uuid, text, text, text, boolean, boolean, text[], boolean, integer, integer)
+  from public, anon, authenticated;
+grant execute on function public.search_items(uuid, text, text, text, boolean, boolean, text[], boolean, integer, integer)
+  to service_role;
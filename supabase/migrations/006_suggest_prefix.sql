@@ -0,0 +1,58 @@
+-- Buddhira — typeahead for GET /api/suggest (item titles and tag names by prefix).
+-- Run after 005. Safe to re-run.
+-- Prefix match is a range scan on lower(x) in "C" collation, so a btree index serves
+-- it even when the pattern is a bind parameter (LIKE 'p%' would need a constant).
+
+create index if not exists idx_items_user_title_prefix
+  on public.items (user_id, (lower(title) collate "C"));
+
+create index if not exists idx_tags_user_name_prefix
+  on public.tags (user_id, (lower(name) collate "C"));
+
+-- =============================================================================
+-- suggest: up to p_limit non-archived item titles (pinned first, then most recently
+-- updated) and up to p_limit tag names starting with p_prefix (case-insensitive).
+-- Tags rank the same way: tags on a pinned item first, then by their most recently
+-- updated item, then by how many items use them; unused tags last, by name.
+-- =============================================================================
+
+create or replace function public.suggest(p_user_id uuid, p_prefix text, p_limit integer default 8)
+returns table (kind text, id uuid, label text, item_type text, is_pinned boolean)
+language sql
+stable
+as $$
+  with bounds as (
+    select lower(p_prefix) collate "C" as lo,
+           (lower(p_prefix) || chr(1114111)) collate "C" as hi
+  )
+  (
+    select 'item', i.id, i.title, i.type, i.is_pinned
+    from public.items i, bounds b
+    where i.user_id = p_user_id
+      and lower(i.title) collate "C" >= b.lo
+      and lower(i.title) collate "C" < b.hi
+      and not i.is_archived
+    order by i.is_pinned desc, i.updated_at desc
+    limit p_limit
+  )
+  union all
+  (
+    select 'tag', t.id, t.name, null, null
+    from public.tags t
+    cross join bounds b
+    left join lateral (
+      select bool_or(i.is_pinned) as pinned, max(i.updated_at) as last_used, count(*) as uses
+      from public.item_tags it
+      join public.items i on i.id = it.item_id
+      where it.tag_id = t.id
+    ) u on true
+    where t.user_id = p_user_id
+      and lower(t.name) collate "C" >= b.lo
+      and lower(t.name) collate "C" < b.hi
+    order by u.pinned desc nulls last, u.last_used desc nulls last, u.uses desc, lower(t.name) collate "C"
+    limit p_limit
+  );
+$$;
+
+revoke execute on function public.suggest(uuid, text, integer) from public, anon, authenticated;
+grant execute on function public.suggest(uuid, text, integer) to service_role;
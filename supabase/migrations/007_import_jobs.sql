@@ -0,0 +1,38 @@
+-- Buddhira — background import jobs (POST /api/imports, GET /api/imports/{job_id}).
+-- Run after 006. Safe to re-run.
+-- One row per job; the backend updates it after every committed chunk, so a job
+-- interrupted by a restart resumes from committed_rows.
+
+create table if not exists public.import_jobs (
+  id                 uuid primary key,
+  user_id            uuid not null,
+  status             text not null default 'queued' check (status in ('queued','running','completed','failed')),
+  total_rows         integer not null default 0,
+  committed_rows     integer not null default 0,
+  imported_count     integer not null default 0,
+  attached_tag_links integer not null default 0,
+  error_count        integer not null default 0,
+  errors             jsonb not null default '[]'::jsonb,
+  failure            text,
+  started_at         timestamptz,
+  finished_at        timestamptz,
+  created_at         timestamptz not null default now(),
+  updated_at         timestamptz not null default now()
+);
+
+comment on table public.import_jobs is 'Background import progress. errors holds the first per-row errors: [{line, detail}].';
+
+create index if not exists idx_import_jobs_user_created_at on public.import_jobs (user_id, created_at desc);
+create index if not exists idx_import_jobs_status on public.import_jobs (status) where status in ('queued','running');
+
+drop trigger if exists import_jobs_set_updated_at on public.import_jobs;
+create trigger import_jobs_set_updated_at
+  before update on public.import_jobs
+  for each row execute function public.set_updated_at();
+
+alter table public.import_jobs enable row level security;
+
+drop policy if exists import_jobs_owner on public.import_jobs;
+create policy import_jobs_owner on public.import_jobs
+  for select
+  using (user_id = auth.uid());
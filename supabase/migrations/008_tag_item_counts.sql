@@ -0,0 +1,86 @@
+-- Buddhira — materialized per-tag item counts for GET /api/tags.
+-- Run after 007. Safe to re-run.
+-- tags.item_count is kept up to date by statement-level triggers on item_tags, so
+-- list_tags reads plain columns through idx_tags_user_name instead of counting
+-- item_tags for every tag on every call. Counts include archived items, as before.
+
+alter table public.tags add column if not exists item_count integer not null default 0;
+
+-- =============================================================================
+-- Triggers: one UPDATE per statement, grouped by tag (bulk attach, cascade deletes)
+-- =============================================================================
+
+create or replace function public.item_tags_count_inserted()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+  update public.tags t
+  set item_count = t.item_count + n.cnt
+  from (select tag_id, count(*)::integer as cnt from new_rows group by tag_id) n
+  where t.id = n.tag_id;
+  return null;
+end;
+$$;
+
+create or replace function public.item_tags_count_deleted()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+  update public.tags t
+  set item_count = greatest(t.item_count - o.cnt, 0)
+  from (select tag_id, count(*)::integer as cnt from old_rows group by tag_id) o
+  where t.id = o.tag_id;
+  return null;
+end;
+$$;
+
+drop trigger if exists item_tags_count_insert on public.item_tags;
+create trigger item_tags_count_insert
+  after insert on public.item_tags
+  referencing new table as new_rows
+  for each statement execute function public.item_tags_count_inserted();
+
+drop trigger if exists item_tags_count_delete on public.item_tags;
+create trigger item_tags_count_delete
+  after delete on public.item_tags
+  referencing old table as old_rows
+  for each statement execute function public.item_tags_count_deleted();
+
+-- =============================================================================
+-- reconcile_tag_item_counts: recount from item_tags and fix any drifted tag
+-- (all users when p_user_id is null). Returns the number of tags corrected.
+-- e.g. schedule nightly with pg_cron: select public.reconcile_tag_item_counts();
+-- =============================================================================
+
+create or replace function public.reconcile_tag_item_counts(p_user_id uuid default null)
+returns integer
+language sql
+as $$
+  with actual as (
+    select t.id, count(it.tag_id)::integer as cnt
+    from public.tags t
+    left join public.item_tags it on it.tag_id = t.id
+    where p_user_id is null or t.user_id = p_user_id
+    group by t.id
+  ),
+  fixed as (
+    update public.tags t
+    set item_count = a.cnt
+    from actual a
+    where t.id = a.id and t.item_count <> a.cnt
+    returning 1
+  )
+  select count(*)::integer from fixed;
+$$;
+
+revoke execute on function public.reconcile_tag_item_counts(uuid) from public, anon, authenticated;
+grant execute on function public.reconcile_tag_item_counts(uuid) to service_role;
+
+-- Backfill existing tags
+select public.reconcile_tag_item_counts();
@@ -0,0 +1,13 @@
+-- Buddhira — content excerpt for summary item lists.
+-- Run after 008. Safe to re-run.
+-- PostgREST exposes a function taking a row of public.items as a computed column,
+-- so GET /api/items (view=summary) selects content_excerpt and the first 200
+-- characters are cut in the database instead of shipping whole notes to the API.
+
+create or replace function public.content_excerpt(public.items)
+returns text
+language sql
+immutable
+as $$
+  select left($1.content, 200);
+$$;
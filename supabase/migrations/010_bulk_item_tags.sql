@@ -0,0 +1,125 @@
+-- Buddhira — add/remove tags across many items in one call (POST /api/items/bulk/tags).
+-- Run after 009. Safe to re-run (create or replace).
+-- The API calls this with the service-role key and passes the JWT subject as p_user_id.
+
+-- =============================================================================
+-- bulk_item_tags: one transaction that
+--   1. checks every referenced item and tag id in a single query; if any is
+--      missing or belongs to another user, returns {missing_*, forbidden_*} and
+--      writes nothing
+--   2. creates tags for add names that do not exist yet
+--   3. links every item to every added tag (one insert; existing links kept)
+--   4. unlinks every removed tag from every item (one delete)
+-- Returns {attached, detached, created_tags, add_tag_ids, remove_tag_ids}.
+-- Tag names are matched as given; the API lower-cases and trims them first.
+-- =============================================================================
+
+create or replace function public.bulk_item_tags(
+  p_user_id uuid,
+  p_item_ids uuid[],
+  p_add_tag_ids uuid[] default '{}',
+  p_add_tag_names text[] default '{}',
+  p_remove_tag_ids uuid[] default '{}',
+  p_remove_tag_names text[] default '{}'
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+  v_missing_items uuid[];
+  v_forbidden_items uuid[];
+  v_missing_tags uuid[];
+  v_forbidden_tags uuid[];
+  v_created jsonb;
+  v_add uuid[];
+  v_remove uuid[];
+  v_attached integer := 0;
+  v_detached integer := 0;
+begin
+  select
+    coalesce(array_agg(r.id) filter (where r.kind = 'item' and r.owner is null), '{}'),
+    coalesce(array_agg(r.id) filter (where r.kind = 'item' and r.owner <> p_user_id), '{}'),
+    coalesce(array_agg(r.id) filter (where r.kind = 'tag' and r.owner is null), '{}'),
+    coalesce(array_agg(r.id) filter (where r.kind = 'tag' and r.owner <> p_user_id), '{}')
+  into v_missing_items, v_forbidden_items, v_missing_tags, v_forbidden_tags
+  from (
+    select 'item' as kind, ref.id, i.user_id as owner
+    from unnest(p_item_ids) as ref(id)
+    left join public.items i on i.id = ref.id
+    union all
+    select 'tag', ref.id, t.user_id
+    from unnest(p_add_tag_ids || p_remove_tag_ids) as ref(id)
+    left join public.tags t on t.id = ref.id
+  ) r;
+
+  if cardinality(v_missing_items) + cardinality(v_forbidden_items)
+     + cardinality(v_missing_tags) + cardinality(v_forbidden_tags) > 0 then
+    return jsonb_build_object(
+      'missing_items', to_jsonb(v_missing_items),
+      'forbidden_items', to_jsonb(v_forbidden_items),
+      'missing_tags', to_jsonb(v_missing_tags),
+      'forbidden_tags', to_jsonb(v_forbidden_tags)
+    );
+  end if;
+
+  with created as (
+    insert into public.tags (user_id, name)
+    select distinct p_user_id, n from unnest(p_add_tag_names) as n
+    on conflict (user_id, name) do nothing
+    returning id, name
+  )
+  select coalesce(jsonb_agg(jsonb_build_object('id', id, 'name', name)), '[]'::jsonb)
+  into v_created
+  from created;
+
+  select coalesce(array_agg(distinct t.id), '{}') into v_add
+  from public.tags t
+  where t.user_id = p_user_id
+    and (t.id = any(p_add_tag_ids) or t.name = any(p_add_tag_names));
+
+  select coalesce(array_agg(distinct t.id), '{}') into v_remove
+  from public.tags t
+  where t.user_id = p_user_id
+    and (t.id = any(p_remove_tag_ids) or t.name = any(p_remove_tag_names));
+
+  if cardinality(v_add) > 0 then
+    with inserted as (
+      insert into public.item_tags (item_id, tag_id)
+      select i.id, a.tag_id
+      from public.items i
+      cross join unnest(v_add) as a(tag_id)
+      where i.id = any(p_item_ids) and i.user_id = p_user_id
+      on conflict (item_id, tag_id) do nothing
+      returning 1
+    )
+    select count(*)::integer into v_attached from inserted;
+  end if;
+
+  if cardinality(v_remove) > 0 then
+    with deleted as (
+      delete from public.item_tags it
+      using public.items i
+      where it.item_id = any(p_item_ids)
+        and it.tag_id = any(v_remove)
+        and i.id = it.item_id
+        and i.user_id = p_user_id
+      returning 1
+    )
+    select count(*)::integer into v_detached from deleted;
+  end if;
+
+  return jsonb_build_object(
+    'attached', v_attached,
+    'detached', v_detached,
+    'created_tags', v_created,
+    'add_tag_ids', to_jsonb(v_add),
+    'remove_tag_ids', to_jsonb(v_remove)
+  );
+end;
+$$;
+
+-- Only the backend (service role) may call this; p_user_id is trusted input from the verified JWT.
+revoke execute on function public.bulk_item_tags(uuid, uuid[], uuid[], text[], uuid[], text[])
+  from public, anon, authenticated;
+grant execute on function public.bulk_item_tags(uuid, uuid[], uuid[], text[], uuid[], text[])
+  to service_role;
@@ -0,0 +1,147 @@
+-- Buddhira — bulk actions selected by filter (POST /api/items/bulk/filter).
+-- Run after 010. Safe to re-run (create or replace).
+-- The API calls these with the service-role key and passes the JWT subject as p_user_id.
+
+-- =============================================================================
+-- items_matching: a user's items matching the GET /api/items filter set, plus
+-- created/updated ranges (after = inclusive, before = exclusive). Null = no filter.
+-- p_q must already be stripped of LIKE wildcards (the API does this).
+-- language sql + stable so it inlines into the statements below.
+-- =============================================================================
+
+create or replace function public.items_matching(
+  p_user_id uuid,
+  p_type text default null,
+  p_state text default null,
+  p_is_pinned boolean default null,
+  p_is_archived boolean default null,
+  p_q text default null,
+  p_tag_names text[] default null,
+  p_match_all boolean default false,
+  p_created_after timestamptz default null,
+  p_created_before timestamptz default null,
+  p_updated_after timestamptz default null,
+  p_updated_before timestamptz default null
+)
+returns setof public.items
+language sql
+stable
+as $$
+  select i.*
+  from public.items i
+  where i.user_id = p_user_id
+    and (p_type is null or i.type = p_type)
+    and (p_state is null or i.state = p_state)
+    and (p_is_pinned is null or i.is_pinned = p_is_pinned)
+    and (p_is_archived is null or i.is_archived = p_is_archived)
+    and (p_q is null or i.title ilike '%' || p_q || '%' or i.content ilike '%' || p_q || '%')
+    and (p_created_after is null or i.created_at >= p_created_after)
+    and (p_created_before is null or i.created_at < p_created_before)
+    and (p_updated_after is null or i.updated_at >= p_updated_after)
+    and (p_updated_before is null or i.updated_at < p_updated_before)
+    and (
+      p_tag_names is null
+      or i.id in (
+        select it.item_id
+        from public.tags t
+        join public.item_tags it on it.tag_id = t.id
+        where t.user_id = p_user_id
+          and t.name = any (p_tag_names)
+        group by it.item_id
+        having not p_match_all
+            or count(*) = (select count(distinct n) from unnest(p_tag_names) as n)
+      )
+    );
+$$;
+
+-- =============================================================================
+-- bulk_items_matching: delete, or set state / is_pinned / is_archived on, every
+-- matching item in one statement. Only rows that actually change are updated.
+-- With p_dry_run nothing is written. Returns the number of rows affected (or
+-- that would be).
+-- =============================================================================
+
+create or replace function public.bulk_items_matching(
+  p_user_id uuid,
+  p_delete boolean default false,
+  p_set_state text default null,
+  p_set_is_pinned boolean default null,
+  p_set_is_archived boolean default null,
+  p_dry_run boolean default false,
+  p_type text default null,
+  p_state text default null,
+  p_is_pinned boolean default null,
+  p_is_archived boolean default null,
+  p_q text default null,
+  p_tag_names text[] default null,
+  p_match_all boolean default false,
+  p_created_after timestamptz default null,
+  p_created_before timestamptz default null,
+  p_updated_after timestamptz default null,
+  p_updated_before timestamptz default null
+)
+returns integer
+language plpgsql
+as $$
+declare
+  v_count integer;
+begin
+  if p_dry_run then
+    select count(*)::integer into v_count
+    from public.items_matching(
+      p_user_id, p_type, p_state, p_is_pinned, p_is_archived, p_q, p_tag_names, p_match_all,
+      p_created_after, p_created_before, p_updated_after, p_updated_before
+    ) m
+    where p_delete
+       or (p_set_state is not null and m.state is distinct from p_set_state)
+       or (p_set_is_pinned is not null and m.is_pinned is distinct from p_set_is_pinned)
+       or (p_set_is_archived is not null and m.is_archived is distinct from p_set_is_archived);
+    return v_count;
+  end if;
+
+  if p_delete then
+    delete from public.items i
+    using public.items_matching(
+      p_user_id, p_type, p_state, p_is_pinned, p_is_archived, p_q, p_tag_names, p_match_all,
+      p_created_after, p_created_before, p_updated_after, p_updated_before
+    ) m
+    where i.id = m.id and i.user_id = p_user_id;
+    get diagnostics v_count = row_count;
+    return v_count;
+  end if;
+
+  update public.items i
+  set state = coalesce(p_set_state, i.state),
+      is_pinned = coalesce(p_set_is_pinned, i.is_pinned),
+      is_archived = coalesce(p_set_is_archived, i.is_archived)
+  from public.items_matching(
+    p_user_id, p_type, p_state, p_is_pinned, p_is_archived, p_q, p_tag_names, p_match_all,
+    p_created_after, p_created_before, p_updated_after, p_updated_before
+  ) m
+  where i.id = m.id
+    and i.user_id = p_user_id
+    and (
+      (p_set_state is not null and i.state is distinct from p_set_state)
+      or (p_set_is_pinned is not null and i.is_pinned is distinct from p_set_is_pinned)
+      or (p_set_is_archived is not null and i.is_archived is distinct from p_set_is_archived)
+    );
+  get diagnostics v_count = row_count;
+  return v_count;
+end;
+$$;
+
+-- Only the backend (service role) may call these; p_user_id is trusted input from the verified JWT.
+revoke execute on function public.items_matching(
+  uuid, text, text, boolean, boolean, text, text[], boolean, timestamptz, timestamptz, timestamptz, timestamptz
+) from public, anon, authenticated;
+grant execute on function public.items_matching(
+  uuid, text, text, boolean, boolean, text, text[], boolean, timestamptz, timestamptz, timestamptz, timestamptz
+) to service_role;
+revoke execute on function public.bulk_items_matching(
+  uuid, boolean, text, boolean, boolean, boolean, text, text, boolean, boolean, text, text[], boolean,
+  timestamptz, timestamptz, timestamptz, timestamptz
+) from public, anon, authenticated;
+grant execute on function public.bulk_items_matching(
+  uuid, boolean, text, boolean, boolean, boolean, text, text, boolean, boolean, text, text[], boolean,
+  timestamptz, timestamptz, timestamptz, timestamptz
+) to service_role;
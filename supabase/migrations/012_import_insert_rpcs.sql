@@ -0,0 +1,67 @@
+-- Buddhira — batched import inserts (POST /api/items/import, background imports).
+-- Run after 011. Safe to re-run (create or replace).
+-- The API calls these with the service-role key. Rows carry their own ids, and rows
+-- or links that already exist are skipped, so retrying a chunk is safe. Each returns
+-- how many of the supplied rows are stored afterwards, inserted now or by an earlier
+-- attempt at the same chunk, so a retried chunk reports the same count as a clean
+-- first try (no rows are sent back).
+
+-- =============================================================================
+-- import_items: insert a batch of items for p_user_id in one statement.
+-- p_items: [{id, type, title, content, url, state, why_this_matters, is_pinned, is_archived}]
+-- =============================================================================
+
+create or replace function public.import_items(p_user_id uuid, p_items jsonb)
+returns integer
+language plpgsql
+as $$
+declare
+  v_count integer;
+begin
+  insert into public.items (id, user_id, type, title, content, url, state, why_this_matters, is_pinned, is_archived)
+  select r.id, p_user_id, r.type, r.title, r.content, r.url, coalesce(r.state, 'inbox'),
+         r.why_this_matters, coalesce(r.is_pinned, false), coalesce(r.is_archived, false)
+  from jsonb_to_recordset(p_items) as r(
+    id uuid, type text, title text, content text, url text, state text,
+    why_this_matters text, is_pinned boolean, is_archived boolean
+  )
+  on conflict (id) do nothing;
+
+  select count(*)::integer into v_count
+  from public.items i
+  where i.user_id = p_user_id
+    and i.id in (select (e ->> 'id')::uuid from jsonb_array_elements(p_items) as e);
+  return v_count;
+end;
+$$;
+
+-- =============================================================================
+-- attach_item_tags: insert {item_id, tag_id} links in one statement. The caller
+-- has already resolved both ids for the same user (import).
+-- =============================================================================
+
+create or replace function public.attach_item_tags(p_links jsonb)
+returns integer
+language plpgsql
+as $$
+declare
+  v_count integer;
+begin
+  insert into public.item_tags (item_id, tag_id)
+  select r.item_id, r.tag_id
+  from jsonb_to_recordset(p_links) as r(item_id uuid, tag_id uuid)
+  on conflict (item_id, tag_id) do nothing;
+
+  select count(*)::integer into v_count
+  from public.item_tags it
+  join (select distinct r.item_id, r.tag_id from jsonb_to_recordset(p_links) as r(item_id uuid, tag_id uuid)) l
+    on l.item_id = it.item_id and l.tag_id = it.tag_id;
+  return v_count;
+end;
+$$;
+
+-- Only the backend (service role) may call these; p_user_id is trusted input from the verified JWT.
+revoke execute on function public.import_items(uuid, jsonb) from public, anon, authenticated;
+grant execute on function public.import_items(uuid, jsonb) to service_role;
+revoke execute on function public.attach_item_tags(jsonb) from public, anon, authenticated;
+grant execute on function public.attach_item_tags(jsonb) to service_role;
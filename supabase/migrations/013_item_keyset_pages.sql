@@ -0,0 +1,86 @@
+-- Buddhira — keyset pages for GET /api/items (cursor mode) and GET /api/items/export.
+-- Run after 012 (and 003 for the indexes). Safe to re-run (create or replace).
+-- The API calls this with the service-role key and passes the JWT subject as p_user_id.
+--
+-- The page after a cursor is selected with one row-value comparison on the sort key,
+-- e.g. (created_at, id) < (p_after_at, p_after_id). Postgres turns that into an index
+-- range seek on the matching 003 index (Index Cond, not Filter), so page N costs the
+-- same as page 1. The expanded form PostgREST filters can express
+-- (c1 < v1 or (c1 = v1 and c2 < v2) ...) is only a filter: the scan starts at the top
+-- of the index and discards every row before the cursor.
+
+-- =============================================================================
+-- items_page: up to p_limit of a user's items strictly after the cursor, in sort
+-- order, with the GET /api/items filters (items_matching, 011) and an optional id
+-- restriction (search index candidates). Returns setof items so PostgREST can
+-- embed item_tags and apply the select projection on top.
+-- p_sort: smart (is_pinned, created_at, id), created_desc (created_at, id) or
+-- updated_desc (updated_at, id), all descending. p_after_pinned is only used by
+-- smart; p_after_at is created_at or updated_at to match.
+-- =============================================================================
+
+create or replace function public.items_page(
+  p_user_id uuid,
+  p_sort text,
+  p_after_pinned boolean,
+  p_after_at timestamptz,
+  p_after_id uuid,
+  p_limit integer,
+  p_type text default null,
+  p_state text default null,
+  p_is_pinned boolean default null,
+  p_is_archived boolean default null,
+  p_q text default null,
+  p_tag_names text[] default null,
+  p_match_all boolean default false,
+  p_ids uuid[] default null
+)
+returns setof public.items
+language plpgsql
+stable
+-- Plan every call with its actual arguments: a generic plan cannot drop the unused
+-- (p_x is null or ...) filters and falls back to scanning all of the user's rows.
+set plan_cache_mode = force_custom_plan
+as $$
+begin
+  if p_sort = 'created_desc' then
+    return query
+      select m.*
+      from public.items_matching(
+        p_user_id, p_type, p_state, p_is_pinned, p_is_archived, p_q, p_tag_names, p_match_all
+      ) m
+      where (m.created_at, m.id) < (p_after_at, p_after_id)
+        and (p_ids is null or m.id = any (p_ids))
+      order by m.created_at desc, m.id desc
+      limit p_limit;
+  elsif p_sort = 'updated_desc' then
+    return query
+      select m.*
+      from public.items_matching(
+        p_user_id, p_type, p_state, p_is_pinned, p_is_archived, p_q, p_tag_names, p_match_all
+      ) m
+      where (m.updated_at, m.id) < (p_after_at, p_after_id)
+        and (p_ids is null or m.id = any (p_ids))
+      order by m.updated_at desc, m.id desc
+      limit p_limit;
+  else
+    return query
+      select m.*
+      from public.items_matching(
+        p_user_id, p_type, p_state, p_is_pinned, p_is_archived, p_q, p_tag_names, p_match_all
+      ) m
+      where (m.is_pinned, m.created_at, m.id) < (p_after_pinned, p_after_at, p_after_id)
+        and (p_ids is null or m.id = any (p_ids))
+      order by m.is_pinned desc, m.created_at desc, m.id desc
+      limit p_limit;
+  end if;
+end;
+$$;
+
+-- Only the backend (service role) may call this; p_user_id is trusted input from the verified JWT.
+revoke execute on function public.items_page(
+  uuid, text, boolean, timestamptz, uuid, integer, text, text, boolean, boolean, text, text[], boolean, uuid[]
+) from public, anon, authenticated;
+grant execute on function public.items_page(
+  uuid, text, boolean, timestamptz, uuid, integer, text, text, boolean, boolean, text, text[], boolean, uuid[]
+) to service_role;